@@ -0,0 +1,271 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''Configurable alert rules, evaluated in the link process.
+
+Rules come from the alerts section of config.yaml:
+
+    alerts:
+      constants:
+        stall: 12
+      rules:
+        - name: LOW SPEED
+          when: airspeed < stall + 5
+          for: 2
+          hysteresis: 1
+          level: warning
+        - name: SINK RATE
+          when: climb < -5 and alt < 50
+        - name: GPS SATS
+          when: gps_sats < 6
+          level: caution
+
+A condition compares a signal with a number, or with another signal or
+constant plus an optional offset; conditions are joined with "and".
+Watched autopilot parameters are signals under their own name, as in
+"airspeed < ARSPD_FBW_MIN + 3".  Unknown identifiers and duplicate rule
+names are configuration errors.
+"for" delays raising, "clear" delays clearing and "hysteresis" moves the
+threshold away from the alerting side while the alert is active.  Only
+state transitions leave the engine, as Alert records.'''
+
+import math
+import operator
+
+from vehicle import Alert, Attitude, VFR_HUD, Global_Position_INT, NAV_Controller_Output, GPS_RAW_INT, EKF_STATUS, VIBRATION, FlightState, Terrain_Height, Param_Value
+
+OPERATORS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge, '==': operator.eq, '!=': operator.ne}
+
+# direction the threshold moves by the hysteresis while an alert is active
+HYSTERESIS_SIGN = {'<': 1, '<=': 1, '>': -1, '>=': -1, '==': 0, '!=': 0}
+
+LEVELS = {'advisory': Alert.ADVISORY, 'caution': Alert.CAUTION, 'warning': Alert.WARNING}
+
+# signals published by each record type, with the record decoding units
+RECORD_SIGNALS = {
+    Attitude: (('pitch', lambda r: math.degrees(r.pitch)),
+               ('roll', lambda r: math.degrees(r.roll))),
+    VFR_HUD: (('airspeed', lambda r: r.airspeed),
+              ('groundspeed', lambda r: r.groundspeed),
+              ('heading', lambda r: r.heading),
+              ('throttle', lambda r: r.throttle),
+              ('climb', lambda r: r.climbRate)),
+    Global_Position_INT: (('alt', lambda r: r.relAlt),
+                          ('alt_msl', lambda r: r.alt)),
+    NAV_Controller_Output: (('alt_error', lambda r: r.alt_error),
+                            ('aspd_error', lambda r: r.aspd_error),
+                            ('xtrack_error', lambda r: r.xtrack_error),
+                            ('wp_dist', lambda r: r.wp_dist)),
+    GPS_RAW_INT: (('gps_sats', lambda r: r.satellites_visible),
+                  ('gps_fix', lambda r: r.fix_type)),
+    EKF_STATUS: (('ekf', lambda r: r.healthy),),
+    VIBRATION: (('vibration', lambda r: r.level()),),
+    FlightState: (('armed', lambda r: 1 if r.arm_disarm else 0),),
+    Terrain_Height: (('agl', lambda r: r.agl),),
+}
+
+SIGNALS = frozenset(name for signals in RECORD_SIGNALS.values() for (name, getter) in signals)
+
+class RuleError(Exception):
+    '''invalid alert rule in the configuration'''
+    pass
+
+class Condition():
+    '''signal <op> operand [+|- offset], operand is a number or a signal'''
+    def __init__(self, signal, op, operand, offset):
+        self.signal = signal
+        self.op = op
+        self.operand = operand
+        self.offset = offset
+        self.compare = OPERATORS[op]
+        self.sign = HYSTERESIS_SIGN[op]
+
+    @staticmethod
+    def parse(text):
+        tokens = text.split()
+        if len(tokens) not in (3, 5) or tokens[1] not in OPERATORS:
+            raise RuleError("invalid condition '%s'" % text)
+        offset = 0.0
+        if len(tokens) == 5:
+            if tokens[3] not in ('+', '-'):
+                raise RuleError("invalid condition '%s'" % text)
+            try:
+                offset = float(tokens[4])
+            except ValueError:
+                raise RuleError("invalid offset in condition '%s'" % text)
+            if tokens[3] == '-':
+                offset = -offset
+        try:
+            operand = float(tokens[2])
+        except ValueError:
+            operand = tokens[2]
+        return Condition(tokens[0], tokens[1], operand, offset)
+
+    def signals(self):
+        if isinstance(self.operand, str):
+            return (self.signal, self.operand)
+        return (self.signal,)
+
+class Rule():
+    '''compiled alert rule'''
+    def __init__(self, name, conditions, level=Alert.WARNING, text=None, delay=0.0, clear_delay=0.0, hysteresis=0.0):
+        self.name = name
+        self.conditions = conditions
+        self.level = level
+        self.text = text if text is not None else name
+        self.delay = delay
+        self.clear_delay = clear_delay
+        self.hysteresis = hysteresis
+
+    @staticmethod
+    def from_config(cfg):
+        if 'name' not in cfg or 'when' not in cfg:
+            raise RuleError("alert rule needs name and when: %s" % (cfg,))
+        conditions = [Condition.parse(c) for c in str(cfg['when']).split(' and ')]
+        level = cfg.get('level', 'warning')
+        if level not in LEVELS:
+            raise RuleError("unknown alert level '%s'" % level)
+        numbers = []
+        for key in ('for', 'clear', 'hysteresis'):
+            try:
+                numbers.append(float(cfg.get(key, 0.0)))
+            except (TypeError, ValueError):
+                raise RuleError("alert rule '%s': %s is not a number" % (cfg['name'], key))
+        return Rule(str(cfg['name']), conditions, LEVELS[level], cfg.get('text'), *numbers)
+
+class AlertRules():
+    '''rules compiled once, shared by the engines of all vehicles
+
+    Signal names are resolved to slots of a flat value list and every slot
+    knows the rules that read it, so a new sample only re-evaluates the
+    rules depending on that signal.  Every identifier must be a record
+    signal, a constant or a watched parameter, and rule names must be
+    unique since the display keys alerts by name.'''
+    def __init__(self, rules, constants=None, params=()):
+        self.rules = rules
+        self.constants = dict(constants or {})
+        known = SIGNALS | set(self.constants) | set(params)
+        names = set()
+        for rule in rules:
+            if rule.name in names:
+                raise RuleError("duplicate alert rule name '%s'" % rule.name)
+            names.add(rule.name)
+            for cond in rule.conditions:
+                for signal in cond.signals():
+                    if signal not in known:
+                        raise RuleError("alert rule '%s': unknown signal '%s'" % (rule.name, signal))
+        self.slots = {}
+        for name in self.constants:
+            self._slot(name)
+        for rule in rules:
+            for cond in rule.conditions:
+                for signal in cond.signals():
+                    self._slot(signal)
+        self.dependents = [[] for i in range(len(self.slots))]
+        # conditions as (slot, compare, operand slot or None, number, sign)
+        self.compiled = []
+        for i, rule in enumerate(rules):
+            compiled = []
+            for cond in rule.conditions:
+                if isinstance(cond.operand, str):
+                    compiled.append((self.slots[cond.signal], cond.compare, self.slots[cond.operand], cond.offset, cond.sign))
+                else:
+                    compiled.append((self.slots[cond.signal], cond.compare, None, cond.operand + cond.offset, cond.sign))
+                for signal in cond.signals():
+                    if i not in self.dependents[self.slots[signal]]:
+                        self.dependents[self.slots[signal]].append(i)
+            self.compiled.append(tuple(compiled))
+
+    def _slot(self, name):
+        if name not in self.slots:
+            self.slots[name] = len(self.slots)
+        return self.slots[name]
+
+    @staticmethod
+    def from_config(cfg, params=()):
+        '''rules of the alerts section, params are the watched parameter names'''
+        if cfg is None:
+            return AlertRules([])
+        return AlertRules([Rule.from_config(r) for r in cfg.get('rules', [])], cfg.get('constants'), params)
+
+class AlertEngine():
+    '''alert state of one vehicle'''
+    def __init__(self, rules):
+        self._rules = rules
+        self._values = [float('nan')] * len(rules.slots)
+        self._active = [False] * len(rules.rules)
+        self._since = [None] * len(rules.rules)
+        self._pending = set()
+        for name, value in rules.constants.items():
+            self._values[rules.slots[name]] = float(value)
+
+    def _holds(self, i):
+        values = self._values
+        shift = self._rules.rules[i].hysteresis if self._active[i] else 0.0
+        for (slot, compare, operand, number, sign) in self._rules.compiled[i]:
+            threshold = number if operand is None else values[operand] + number
+            # nan never compares true, unknown signals keep alerts quiet
+            if not compare(values[slot], threshold + sign * shift):
+                return False
+        return True
+
+    def _check(self, i, now, transitions):
+        rule = self._rules.rules[i]
+        delay = rule.clear_delay if self._active[i] else rule.delay
+        if now < self._since[i]:
+            # a replay seeked backwards, the wait starts over
+            self._since[i] = now
+        if now - self._since[i] < delay:
+            return
+        self._active[i] = not self._active[i]
+        self._since[i] = None
+        self._pending.discard(i)
+        transitions.append(Alert(rule.name, rule.level, self._active[i], rule.text))
+
+    def _evaluate(self, i, now, transitions):
+        if self._holds(i) == self._active[i]:
+            if self._since[i] is not None:
+                self._since[i] = None
+                self._pending.discard(i)
+            return
+        if self._since[i] is None:
+            self._since[i] = now
+            self._pending.add(i)
+        self._check(i, now, transitions)
+
+    def update(self, signal, value, now, transitions):
+        '''store one sample and re-evaluate the rules reading it'''
+        slot = self._rules.slots.get(signal)
+        if slot is None:
+            return
+        self._values[slot] = value
+        for i in self._rules.dependents[slot]:
+            self._evaluate(i, now, transitions)
+
+    def update_record(self, obj, now):
+        '''feed a vehicle record, returns the resulting Alert transitions'''
+        transitions = []
+        if isinstance(obj, Param_Value):
+            # watched parameters are signals under their own name
+            self.update(obj.name, obj.value, now, transitions)
+            return transitions
+        for (signal, getter) in RECORD_SIGNALS.get(type(obj), ()):
+            self.update(signal, getter(obj), now, transitions)
+        return transitions
+
+    def tick(self, now):
+        '''raise or clear debounced rules whose delay ran out without new samples'''
+        transitions = []
+        for i in list(self._pending):
+            self._check(i, now, transitions)
+        return transitions
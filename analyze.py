@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''Headless batch analysis of a tlog archive.
+
+Every log is streamed through the same EKF and vibration classification
+the display uses, one log per worker process, and the per-flight
+summaries are written as columnar tables:
+
+    analyze.py [options] <dir or tlog> [...]
+'''
+
+from __future__ import print_function
+
+import os
+import sys
+import csv
+import mmap
+import optparse
+
+from multiprocessing import Pool, freeze_support, cpu_count
+
+from pymavlink import mavutil
+from pymavlink.dialects.v20 import ardupilotmega as mavlink
+
+from vehicle import EKF_STATUS, VIBRATION, GPS_RAW_INT
+from replay import scan_tlog
+
+# only these packets are decoded, everything else is skipped on its header
+WANTED_MSGIDS = frozenset([mavlink.MAVLINK_MSG_ID_HEARTBEAT,
+                           mavlink.MAVLINK_MSG_ID_EKF_STATUS_REPORT,
+                           mavlink.MAVLINK_MSG_ID_VIBRATION,
+                           mavlink.MAVLINK_MSG_ID_GPS_RAW_INT])
+
+EKF_STATES = ((EKF_STATUS.UNHEALTHY, 'ekf_unhealthy_s'),
+              (EKF_STATUS.CONST_POS, 'ekf_const_pos_s'),
+              (EKF_STATUS.HEALTHY, 'ekf_healthy_s'))
+
+GPS_STATES = ((0, 'gps_no_fix_s'),
+              (1, 'gps_2d_s'),
+              (2, 'gps_3d_s'))
+
+FLIGHT_COLUMNS = (['file', 'start_time', 'duration_s', 'messages'] +
+                  [name for state, name in EKF_STATES] +
+                  ['vibration_1_s', 'vibration_2_s', 'vibration_1_events', 'vibration_2_events'] +
+                  [name for state, name in GPS_STATES] +
+                  ['armed_s', 'mode_changes'])
+
+MODE_COLUMNS = ['file', 'time', 'offset_s', 'mode']
+
+def gps_state(fix_type):
+    if fix_type < GPS_RAW_INT.GPS_FIX_TYPE_2D_FIX:
+        return 0
+    elif fix_type == GPS_RAW_INT.GPS_FIX_TYPE_2D_FIX:
+        return 1
+    return 2
+
+class StateTimer():
+    '''time spent in each value of a piecewise constant state'''
+    def __init__(self):
+        self.durations = {}
+        self.entries = {}
+        self._state = None
+        self._since = None
+
+    def update(self, t, state):
+        if self._state is not None:
+            self.durations[self._state] = self.durations.get(self._state, 0.0) + (t - self._since)
+        if state != self._state:
+            self.entries[state] = self.entries.get(state, 0) + 1
+        self._state = state
+        self._since = t
+
+    def finish(self, t):
+        if self._state is not None:
+            self.update(t, self._state)
+
+    def duration(self, state):
+        return self.durations.get(state, 0.0)
+
+def analyze_file(path):
+    '''summarise one tlog, returns (flight row, mode rows)'''
+    name = os.path.basename(path)
+    ekf = StateTimer()
+    vibration = StateTimer()
+    gps = StateTimer()
+    armed = StateTimer()
+    modes = []
+    start = end = None
+    messages = 0
+    parser = mavlink.MAVLink(None)
+    parser.robust_parsing = True
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return (None, [])
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for (timestamp, offset, length, msgid) in scan_tlog(mm):
+                t = timestamp / 1e6
+                if start is None:
+                    start = t
+                end = t
+                messages += 1
+                if msgid not in WANTED_MSGIDS:
+                    continue
+                try:
+                    m = parser.decode(bytearray(mm[offset+8:offset+8+length]))
+                except mavlink.MAVError:
+                    continue
+                if m.get_type() == 'HEARTBEAT':
+                    if m.type == mavlink.MAV_TYPE_GCS:
+                        continue
+                    mode = mavutil.mode_string_v10(m)
+                    if len(modes) == 0 or modes[-1][3] != mode:
+                        modes.append([name, t, t - start, mode])
+                    armed.update(t, bool(m.base_mode & mavlink.MAV_MODE_FLAG_SAFETY_ARMED))
+                elif m.get_type() == 'EKF_STATUS_REPORT':
+                    ekf.update(t, EKF_STATUS.classify(m.flags))
+                elif m.get_type() == 'VIBRATION':
+                    vibration.update(t, VIBRATION(m).level())
+                elif m.get_type() == 'GPS_RAW_INT':
+                    gps.update(t, gps_state(m.fix_type))
+        finally:
+            mm.close()
+    if start is None:
+        return (None, [])
+    for timer in (ekf, vibration, gps, armed):
+        timer.finish(end)
+    row = {'file': name, 'start_time': start, 'duration_s': end - start, 'messages': messages}
+    for state, column in EKF_STATES:
+        row[column] = ekf.duration(state)
+    for state, column in GPS_STATES:
+        row[column] = gps.duration(state)
+    row['vibration_1_s'] = vibration.duration(1)
+    row['vibration_2_s'] = vibration.duration(2)
+    row['vibration_1_events'] = vibration.entries.get(1, 0)
+    row['vibration_2_events'] = vibration.entries.get(2, 0)
+    row['armed_s'] = armed.duration(True)
+    row['mode_changes'] = max(len(modes) - 1, 0)
+    return (row, modes)
+
+def _analyze_file(path):
+    try:
+        return (path, analyze_file(path), None)
+    except Exception as e:
+        return (path, (None, []), str(e))
+
+def find_tlogs(paths):
+    sized = []
+    for path in paths:
+        if os.path.isdir(path):
+            candidates = [os.path.join(root, name) for root, dirs, files in os.walk(path)
+                          for name in files if name.lower().endswith('.tlog')]
+        else:
+            candidates = [path]
+        for candidate in candidates:
+            try:
+                sized.append((os.path.getsize(candidate), candidate))
+            except OSError as e:
+                print("Skipping (%s): %s" % (candidate, e.strerror))
+    # biggest first so one large log does not end up last on a single core
+    sized.sort(key=lambda s: -s[0])
+    return [p for (size, p) in sized]
+
+def write_table(path, columns, rows, fmt):
+    if fmt == 'parquet':
+        import pyarrow
+        import pyarrow.parquet
+        table = pyarrow.table(dict((c, [row[i] for row in rows]) for i, c in enumerate(columns)))
+        pyarrow.parquet.write_table(table, path + '.parquet')
+    else:
+        with open(path + '.csv', 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(rows)
+
+def main():
+    parser = optparse.OptionParser("analyze.py [options] <dir or tlog> [...]")
+    parser.add_option("-o", "--output", dest="output", default=".", help="output directory")
+    parser.add_option("-j", "--jobs", dest="jobs", type="int", default=cpu_count(), help="worker processes")
+    parser.add_option("-f", "--format", dest="format", default="parquet", help="parquet or csv")
+    (opts, args) = parser.parse_args()
+    if len(args) == 0:
+        parser.print_help()
+        sys.exit(1)
+    if opts.format == 'parquet':
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            print("pyarrow not installed, writing csv")
+            opts.format = 'csv'
+
+    tlogs = find_tlogs(args)
+    print("Analyzing %u logs with %u workers" % (len(tlogs), opts.jobs))
+    flights = []
+    modes = []
+    pool = Pool(opts.jobs)
+    try:
+        for (path, (row, mode_rows), error) in pool.imap_unordered(_analyze_file, tlogs):
+            if error is not None:
+                print("Analysis of (%s) failed: %s" % (path, error))
+                continue
+            if row is None:
+                continue
+            flights.append([row[c] for c in FLIGHT_COLUMNS])
+            modes.extend(mode_rows)
+    finally:
+        pool.close()
+        pool.join()
+    flights.sort(key=lambda r: r[1])
+    modes.sort(key=lambda r: (r[0], r[1]))
+
+    if not os.path.isdir(opts.output):
+        os.makedirs(opts.output)
+    write_table(os.path.join(opts.output, 'flights'), FLIGHT_COLUMNS, flights, opts.format)
+    write_table(os.path.join(opts.output, 'modes'), MODE_COLUMNS, modes, opts.format)
+    print("Wrote %u flights and %u mode changes to %s" % (len(flights), len(modes), opts.output))
+
+if __name__ == '__main__':
+    freeze_support()
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''Microbenchmarks for the telemetry hot paths, no display needed.
+
+    bench.py [-o results.json] [-b baseline.json] [-t 1.25] [filter ...]
+
+Results are printed as JSON.  With a baseline every benchmark gets a
+ratio to the stored time and the exit status is 1 when any ratio is
+above the threshold.'''
+
+from __future__ import print_function
+
+import os
+import sys
+import json
+import time
+import pickle
+import timeit
+import random
+import platform
+import optparse
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from pymavlink.dialects.v20 import ardupilotmega as mavlink
+
+from vehicle import Attitude, VFR_HUD, Global_Position_INT, NAV_Controller_Output, GPS_RAW_INT, VIBRATION, EKF_STATUS, CMD_Ack, FlightState, WaypointInfo, MISSION_CURRENT, Status_Notify, Replay_Status, Alert, Command_Result, Terrain_Height, Terrain_Profile, Param_Value, Traffic
+
+BATCH_SIZE = 10 # records per pipe batch, what Link sends every 0.1 s
+
+def synthetic_messages():
+    '''one pymavlink message of every type the link decodes'''
+    return {
+        Attitude: mavlink.MAVLink_attitude_message(1000, 0.1, -0.05, 1.5, 0.01, 0.02, 0.03),
+        VFR_HUD: mavlink.MAVLink_vfr_hud_message(22.5, 23.1, 271, 55, 120.4, 1.2),
+        Global_Position_INT: mavlink.MAVLink_global_position_int_message(1000, -353632610, 1491652300, 584000, 120400, 100, -50, 20, 27100),
+        NAV_Controller_Output: mavlink.MAVLink_nav_controller_output_message(5.0, 2.0, 270, 268, 350, 1.5, 30.0, 2.0),
+        GPS_RAW_INT: mavlink.MAVLink_gps_raw_int_message(1000, 3, -353632610, 1491652300, 584000, 121, 200, 2250, 27100, 12),
+        VIBRATION: mavlink.MAVLink_vibration_message(1000, 0.2, 0.35, 0.1, 0, 0, 0),
+        CMD_Ack: mavlink.MAVLink_command_ack_message(mavlink.MAV_CMD_COMPONENT_ARM_DISARM, 0),
+    }
+
+def synthetic_records():
+    '''constructor arguments of every other record the link sends'''
+    item = mavlink.MAVLink_mission_item_message(1, 1, 3, 3, 16, 0, 1, 0, 0, 0, 0, -35.36, 149.16, 100)
+    contact = (0xabc123, 'TEST1234', 120.0, -80.0, 150.0, 90.0, 1)
+    return {
+        MISSION_CURRENT: (3, -35.36, 149.16, 100, MISSION_CURRENT.MAV_CMD_NAV_WAYPOINT),
+        FlightState: ('AUTO', 128, 1, 1),
+        EKF_STATUS: (EKF_STATUS.HEALTHY,),
+        WaypointInfo: (item,),
+        Status_Notify: (Status_Notify.WAYPOINT_RECEIVED,),
+        Replay_Status: (12.5, 600.0, 1.0, False),
+        Alert: ('LOW SPEED', Alert.WARNING, True, 'LOW SPEED'),
+        Command_Result: (1, mavlink.MAV_CMD_COMPONENT_ARM_DISARM, Command_Result.ACCEPTED),
+        Terrain_Height: (584.0, 120.4, 0.0),
+        Terrain_Profile: ([float(d) for d in range(0, 5000, 100)], [584.0] * 50),
+        Param_Value: ('ARSPD_FBW_MIN', 12.0),
+        Traffic: ([contact] * 5, [contact], 5),
+    }
+
+def synthetic_waypoints(count):
+    rnd = random.Random(count)
+    ret = {}
+    for seq in range(count):
+        m = mavlink.MAVLink_mission_item_message(1, 1, seq, 3, 16, 0, 1, 0, 0, 0, 0,
+                                                 -35.36 + rnd.uniform(-0.05, 0.05), 149.16 + rnd.uniform(-0.05, 0.05), 100)
+        ret[seq] = WaypointInfo(m)
+    return ret
+
+def synthetic_batch(messages):
+    batch = [cls(msg) for cls, msg in messages.items()]
+    batch.append(EKF_STATUS(EKF_STATUS.HEALTHY))
+    batch.append(FlightState('AUTO', 128, 1, 1))
+    batch.append(MISSION_CURRENT(3, -35.36, 149.16, 100, MISSION_CURRENT.MAV_CMD_NAV_WAYPOINT))
+    return batch[:BATCH_SIZE]
+
+def measure(stmt, number, repeat=5):
+    '''best seconds per call of stmt over repeat runs of number calls'''
+    return min(timeit.repeat(stmt, number=number, repeat=repeat)) / number
+
+class FakePipe():
+    '''hands prepared batches to update_mav like the link pipe would'''
+    def __init__(self, batches):
+        self._batches = list(batches)
+
+    def poll(self):
+        return len(self._batches) > 0
+
+    def recv(self):
+        return self._batches.pop()
+
+def bench_records(results):
+    messages = synthetic_messages()
+    for cls, msg in messages.items():
+        results['record.' + cls.__name__] = {'us': measure(lambda: cls(msg), 20000) * 1e6}
+    for cls, args in synthetic_records().items():
+        results['record.' + cls.__name__] = {'us': measure(lambda: cls(*args), 20000) * 1e6}
+
+def bench_transport(results):
+    batch = synthetic_batch(synthetic_messages())
+    data = pickle.dumps(batch, pickle.HIGHEST_PROTOCOL)
+    results['transport.pickle_batch'] = {
+        'us': measure(lambda: pickle.dumps(batch, pickle.HIGHEST_PROTOCOL), 5000) * 1e6,
+        'bytes': len(data), 'records': len(batch)}
+    results['transport.unpickle_batch'] = {'us': measure(lambda: pickle.loads(data), 5000) * 1e6,
+                                           'bytes': len(data), 'records': len(batch)}
+
+def bench_gui(results):
+    from PyQt5.QtGui import QGuiApplication
+    import mavpfd
+    from vehicle_status import Vehicle_Status
+
+    app = QGuiApplication.instance() or QGuiApplication(sys.argv[:1])
+    status = Vehicle_Status()
+    mavpfd.vehicle_status = status
+
+    batch = synthetic_batch(synthetic_messages())
+    objs = (batch * (1000 // len(batch) + 1))[:1000]
+    batches = [objs[i:i+BATCH_SIZE] for i in range(0, len(objs), BATCH_SIZE)]
+    results['update_mav.1000_objects'] = {'us': measure(lambda: mavpfd.update_mav(FakePipe(batches)), 50) * 1e6}
+    results['update_mav.1000_objects_no_coalesce'] = {'us': measure(lambda: [mavpfd.apply_mav(o) for o in objs], 50) * 1e6}
+
+    def setters():
+        status.pitch = 0.1
+        status.roll = 0.2
+        status.airspeed = 22.0
+        status.alt = 120.0
+        status.climbrate = 1.0
+    results['vehicle_status.setters'] = {'us': measure(setters, 5000) * 1e6, 'setters': 5}
+    received = []
+    status.airspeed_changed.connect(received.append)
+    results['vehicle_status.emit_connected'] = {'us': measure(lambda: status.airspeed_changed.emit(1.0), 20000) * 1e6}
+    status.airspeed_changed.disconnect(received.append)
+
+    status.lat = -35.36
+    status.lon = 149.16
+    for count in (10, 100, 1000):
+        status._wp_received = synthetic_waypoints(count)
+        status._wp_received_qml = {}
+        number = max(1, 2000 // count)
+        results['wp_received.%u' % count] = {'us': measure(status.wp_received, number) * 1e6}
+    del app
+
+BENCHMARKS = (('record', bench_records), ('transport', bench_transport), ('gui', bench_gui))
+
+def compare(results, baseline, threshold):
+    '''add ratio to baseline, return the names that regressed'''
+    regressed = []
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if base is None or base.get('us', 0) <= 0:
+            continue
+        result['baseline_us'] = base['us']
+        result['ratio'] = result['us'] / base['us']
+        if result['ratio'] > threshold:
+            regressed.append(name)
+    return regressed
+
+def main():
+    parser = optparse.OptionParser("bench.py [options] [filter ...]")
+    parser.add_option("-o", "--output", dest="output", default=None, help="write results to this json file")
+    parser.add_option("-b", "--baseline", dest="baseline", default=None, help="compare with this json file")
+    parser.add_option("-t", "--threshold", dest="threshold", type="float", default=1.25, help="ratio counted as regression")
+    (opts, args) = parser.parse_args()
+
+    results = {}
+    for name, bench in BENCHMARKS:
+        if len(args) == 0 or name in args:
+            bench(results)
+    for result in results.values():
+        result['us'] = round(result['us'], 3)
+
+    report = {'meta': {'python': platform.python_version(), 'machine': platform.machine(),
+                       'platform': platform.platform(), 'time': time.time()},
+              'results': results}
+    regressed = []
+    if opts.baseline is not None:
+        with open(opts.baseline) as f:
+            regressed = compare(results, json.load(f), opts.threshold)
+        report['regressed'] = regressed
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if opts.output is not None:
+        with open(opts.output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+    sys.exit(1 if len(regressed) > 0 else 0)
+
+if __name__ == '__main__':
+    main()
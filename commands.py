@@ -0,0 +1,126 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from collections import deque
+
+from pymavlink import mavutil
+
+from vehicle import Command_Result
+
+class PendingCommand():
+    '''COMMAND_LONG waiting for its COMMAND_ACK'''
+    def __init__(self, request_id, command, params, timeout, retries):
+        self.request_ids = [request_id]
+        self.command = command
+        self.params = params
+        self.timeout = timeout
+        self.retries = retries
+        self.confirmation = 0
+        self.sent = None
+
+class CommandQueue():
+    '''non-blocking COMMAND_LONG sender for one connection
+
+    COMMAND_ACK only names the command, so one command per command id is
+    in flight and later ones with the same id wait behind it.  A request
+    equal to one already queued joins it instead of being sent twice.
+    Unanswered commands are sent again with an incremented confirmation
+    until their retries run out.'''
+    TIMEOUT = 1.0
+    RETRIES = 3
+    # arming runs the pre-arm checks before it answers
+    TIMEOUTS = {mavutil.mavlink.MAV_CMD_COMPONENT_ARM_DISARM: 2.0}
+
+    def __init__(self):
+        self._inflight = {}
+        self._waiting = deque()
+
+    def __len__(self):
+        return len(self._inflight) + len(self._waiting)
+
+    def submit(self, request_id, command, params):
+        params = tuple(float(p) for p in params) + (0.0,) * (7 - len(params))
+        for pending in list(self._inflight.values()) + list(self._waiting):
+            if pending.command == command and pending.params == params:
+                pending.request_ids.append(request_id)
+                return
+        timeout = CommandQueue.TIMEOUTS.get(command, CommandQueue.TIMEOUT)
+        self._waiting.append(PendingCommand(request_id, command, params, timeout, CommandQueue.RETRIES))
+
+    def _results(self, pending, result):
+        return [Command_Result(request_id, pending.command, result) for request_id in pending.request_ids]
+
+    def poll(self, now, send):
+        '''send waiting commands and retries, returns Command_Result for timeouts'''
+        results = []
+        for command, pending in list(self._inflight.items()):
+            if now - pending.sent < pending.timeout:
+                continue
+            if pending.confirmation >= pending.retries:
+                del self._inflight[command]
+                results.extend(self._results(pending, Command_Result.TIMEOUT))
+                continue
+            pending.confirmation += 1
+            pending.sent = now
+            send(pending)
+        blocked = deque()
+        while len(self._waiting) > 0:
+            pending = self._waiting.popleft()
+            if pending.command in self._inflight:
+                blocked.append(pending)
+                continue
+            pending.sent = now
+            self._inflight[pending.command] = pending
+            send(pending)
+        self._waiting = blocked
+        return results
+
+    @staticmethod
+    def addressed(m, ours, vehicle):
+        '''whether a COMMAND_ACK comes from vehicle and is meant for ours,
+        both (system, component); target 0 is a broadcast or an autopilot
+        that does not fill the target fields'''
+        if m.get_srcSystem() != vehicle[0]:
+            return False
+        if vehicle[1] != 0 and m.get_srcComponent() != vehicle[1]:
+            return False
+        target_system = getattr(m, 'target_system', 0)
+        target_component = getattr(m, 'target_component', 0)
+        return target_system in (0, ours[0]) and target_component in (0, ours[1])
+
+    def handle_ack(self, m, now, ours, vehicle):
+        '''match a COMMAND_ACK, returns the finished Command_Results
+
+        ours is our (system, component), vehicle the (system, component)
+        the commands were sent to; acks for another ground station or
+        from another component are ignored.'''
+        pending = self._inflight.get(m.command)
+        if pending is None or not CommandQueue.addressed(m, ours, vehicle):
+            return []
+        if m.result == mavutil.mavlink.MAV_RESULT_IN_PROGRESS:
+            # accepted, wait a full timeout for the final ack
+            pending.sent = now
+            return []
+        del self._inflight[m.command]
+        return self._results(pending, m.result)
+
+    def cancel(self, result=None):
+        '''drop everything, e.g. when the connection closes'''
+        if result is None:
+            result = Command_Result.NO_LINK
+        results = []
+        for pending in list(self._inflight.values()) + list(self._waiting):
+            results.extend(self._results(pending, result))
+        self._inflight = {}
+        self._waiting = deque()
+        return results
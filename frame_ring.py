@@ -0,0 +1,123 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''Raw frames in a shared memory ring, no Qt needed to read them.
+
+The segment starts with a header, followed by slots holding one frame
+each:
+
+    header: magic 'MPFD', version, width, height, stride, slots (uint32),
+            frames written (uint64), time of the last frame (double)
+    slot:   frame number (uint64), time (double), stride * height bytes
+
+Pixels are 32 bit B, G, R, X in memory order (QImage.Format_RGB32 on a
+little endian machine).  Frame n, counting from 1, is in slot
+(n - 1) % slots.  The writer zeroes the slot frame number before it
+copies the pixels, so a reader that finds the same frame number before
+and after its copy got a whole frame.'''
+
+import struct
+from multiprocessing import shared_memory
+
+import numpy as np
+
+MAGIC = b'MPFD'
+VERSION = 1
+HEADER = struct.Struct('<4sIIIIIQd')
+SLOT_HEADER = struct.Struct('<Qd')
+
+class FrameRing():
+    '''writing end, owns the segment and removes it on close'''
+    def __init__(self, name, width, height, stride, slots=4):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.stride = stride
+        self._slots = slots
+        self._frame_size = stride * height
+        self._slot_size = SLOT_HEADER.size + self._frame_size
+        size = HEADER.size + slots * self._slot_size
+        try:
+            self._shm = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            # left behind by a writer that did not close
+            old = shared_memory.SharedMemory(name)
+            old.close()
+            old.unlink()
+            self._shm = shared_memory.SharedMemory(name, create=True, size=size)
+        self.count = 0
+        HEADER.pack_into(self._shm.buf, 0, MAGIC, VERSION, width, height, stride, slots, 0, 0.0)
+
+    def write(self, pixels, timestamp):
+        '''publish one frame, pixels is a buffer of stride * height bytes'''
+        self.count += 1
+        offset = HEADER.size + ((self.count - 1) % self._slots) * self._slot_size
+        buf = self._shm.buf
+        SLOT_HEADER.pack_into(buf, offset, 0, 0.0)
+        start = offset + SLOT_HEADER.size
+        buf[start:start + self._frame_size] = memoryview(pixels).cast('B')[:self._frame_size]
+        SLOT_HEADER.pack_into(buf, offset, self.count, timestamp)
+        struct.pack_into('<Qd', buf, HEADER.size - 16, self.count, timestamp)
+
+    def close(self):
+        self._shm.close()
+        self._shm.unlink()
+
+class FrameReader():
+    '''reading end, attaches to the segment of a running FrameRing'''
+    def __init__(self, name):
+        self._shm = shared_memory.SharedMemory(name)
+        try:
+            # the reader must not remove the segment when it exits
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self._shm._name, 'shared_memory')
+        except (ImportError, AttributeError, KeyError):
+            pass
+        (magic, version, self.width, self.height, self.stride, self.slots, count, t) = HEADER.unpack_from(self._shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            self._shm.close()
+            raise ValueError("%s is not a version %u frame ring" % (name, VERSION))
+        self._frame_size = self.stride * self.height
+        self._slot_size = SLOT_HEADER.size + self._frame_size
+
+    @property
+    def count(self):
+        '''frames written so far'''
+        return struct.unpack_from('<Q', self._shm.buf, HEADER.size - 16)[0]
+
+    def frame(self, number):
+        '''(time, height x width x 4 uint8 array) of frame number, None once overwritten'''
+        offset = HEADER.size + ((number - 1) % self.slots) * self._slot_size
+        buf = self._shm.buf
+        if SLOT_HEADER.unpack_from(buf, offset)[0] != number:
+            return None
+        start = offset + SLOT_HEADER.size
+        pixels = np.frombuffer(buf[start:start + self._frame_size], dtype=np.uint8).copy()
+        (check, t) = SLOT_HEADER.unpack_from(buf, offset)
+        if check != number:
+            return None
+        return (t, pixels.reshape(self.height, self.stride)[:, :self.width * 4].reshape(self.height, self.width, 4))
+
+    def latest(self):
+        '''(number, time, pixels) of the newest whole frame, or None'''
+        for attempt in range(3):
+            number = self.count
+            if number == 0:
+                return None
+            frame = self.frame(number)
+            if frame is not None:
+                return (number,) + frame
+        return None
+
+    def close(self):
+        self._shm.close()
@@ -0,0 +1,307 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''Frame timing instrumentation for the GUI process.
+
+Once attached to the QQuickWindow every frame records its interval,
+scene graph sync and render time, the Python time spent since the
+previous sync and the number of signals that could trigger bindings.
+Nothing is hooked or timed until then, and detach() unhooks it all again.
+Rolling percentiles are shown in an overlay and appended to a CSV file:
+
+    frame_stats:
+      overlay: true
+      file: frame_stats.csv
+      profile_seconds: 10
+
+F8 toggles the overlay, F9 runs cProfile on the GUI thread for
+profile_seconds and saves the result next to config.yaml.'''
+
+import csv
+import time
+import cProfile
+import threading
+
+import numpy as np
+from PyQt5 import QtCore
+
+from history import History
+
+# per frame: frame, sync, render, python (ms), signals (count)
+# per call: ingest, wp_received (ms)
+FIELDS = ('frame', 'sync', 'render', 'python', 'signals', 'ingest', 'wp_received')
+PERCENTILES = (50, 95, 99)
+WINDOW = 10.0 # seconds of frames the percentiles cover
+IDLE_GAP = 0.5 # seconds, longer frame intervals are the scene being idle
+REPORT_INTERVAL = 1000 # ms
+
+class FrameStats(QtCore.QObject):
+    '''rolling frame statistics, see the module docstring'''
+    changed = QtCore.pyqtSignal()
+
+    def __init__(self, filename=None, profile_seconds=10.0, parent=None):
+        QtCore.QObject.__init__(self, parent)
+        self._history = History(FIELDS, WINDOW, 120)
+        # the render thread appends frames while the GUI thread appends
+        # slot times and reads percentiles
+        self._lock = threading.Lock()
+        self._filename = filename
+        self._file = None
+        self._writer = None
+        self._profile_seconds = profile_seconds
+        self._profiler = None
+        self._target = None
+        self._window = None
+        self._sticky = False
+        self._counted = []
+        self._slot_timers = []
+        self._timed_slots = [] # (signal, untimed, timed)
+        self._overlay = False
+        self._text = ''
+        # written on the render thread
+        self._sync_start = None
+        self._render_start = None
+        self._last_swap = None
+        # written on the GUI thread, taken at every sync
+        self._python = 0.0
+        self._signals = 0
+        self._timer = QtCore.QTimer(self, interval=REPORT_INTERVAL)
+        self._timer.timeout.connect(self.report)
+
+    @property
+    def attached(self):
+        return self._window is not None
+
+    def set_window(self, window):
+        self._target = window
+
+    def attach(self, sticky=True):
+        '''hook the scene graph signals of the window, they may come from the
+        render thread, and start counting and timing; a sticky attach stays
+        when the overlay is turned off'''
+        if self._window is not None or self._target is None:
+            return
+        window = self._window = self._target
+        self._sticky = sticky
+        window.beforeSynchronizing.connect(self._before_sync, QtCore.Qt.DirectConnection)
+        window.afterSynchronizing.connect(self._after_sync, QtCore.Qt.DirectConnection)
+        window.beforeRendering.connect(self._before_render, QtCore.Qt.DirectConnection)
+        window.afterRendering.connect(self._after_render, QtCore.Qt.DirectConnection)
+        window.frameSwapped.connect(self._frame_swapped, QtCore.Qt.DirectConnection)
+        if self._filename is not None:
+            self._file = open(self._filename, 'a', newline='')
+            self._writer = csv.writer(self._file)
+            if self._file.tell() == 0:
+                self._writer.writerow(['time'] + ['%s_%s' % (field, p) for field in FIELDS for p in ('p50', 'p95', 'p99', 'max')])
+        for obj in self._counted:
+            self._connect_signals(obj, True)
+        for obj in self._slot_timers:
+            obj.set_slot_timer(self.add_python)
+        for (signal, untimed, timed) in self._timed_slots:
+            signal.disconnect(untimed)
+            signal.connect(timed)
+        self._timer.start()
+
+    def detach(self):
+        '''undo attach, the window and the registered objects run untimed'''
+        if self._window is None:
+            return
+        window = self._window
+        window.beforeSynchronizing.disconnect(self._before_sync)
+        window.afterSynchronizing.disconnect(self._after_sync)
+        window.beforeRendering.disconnect(self._before_render)
+        window.afterRendering.disconnect(self._after_render)
+        window.frameSwapped.disconnect(self._frame_swapped)
+        for obj in self._counted:
+            self._connect_signals(obj, False)
+        for obj in self._slot_timers:
+            obj.set_slot_timer(None)
+        for (signal, untimed, timed) in self._timed_slots:
+            signal.disconnect(timed)
+            signal.connect(untimed)
+        self._timer.stop()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
+        self._window = None
+        self._sticky = False
+        with self._lock:
+            self._history.clear()
+            self._python = 0.0
+            self._signals = 0
+        self._sync_start = None
+        self._render_start = None
+        self._last_swap = None
+
+    def count_signals(self, obj):
+        '''count every signal of obj while attached, they are what QML
+        bindings react to'''
+        self._counted.append(obj)
+        if self._window is not None:
+            self._connect_signals(obj, True)
+
+    def _connect_signals(self, obj, connect):
+        meta = obj.metaObject()
+        for i in range(meta.methodOffset(), meta.methodCount()):
+            method = meta.method(i)
+            if method.methodType() == method.Signal:
+                signal = getattr(obj, bytes(method.name()).decode())
+                if connect:
+                    signal.connect(self._count_signal)
+                else:
+                    signal.disconnect(self._count_signal)
+
+    def time_slots(self, obj):
+        '''hand obj.set_slot_timer the accounting while attached'''
+        self._slot_timers.append(obj)
+        if self._window is not None:
+            obj.set_slot_timer(self.add_python)
+
+    def connect_timed(self, signal, name, fn):
+        '''connect fn to signal, timed as name while attached; fn takes
+        none of the signal arguments'''
+        def untimed(*args):
+            return fn()
+        entry = (signal, untimed, self.timed(name, fn))
+        self._timed_slots.append(entry)
+        signal.connect(entry[2] if self._window is not None else untimed)
+
+    def _count_signal(self, *args):
+        with self._lock:
+            self._signals += 1
+
+    def add_python(self, name, seconds):
+        '''account Python time spent in a slot or handler'''
+        with self._lock:
+            self._python += seconds
+            if self._window is not None:
+                self._history.append(name, seconds * 1000.0, time.perf_counter())
+
+    def timed(self, name, fn):
+        '''fn wrapped to account its run time as name, for connecting to
+        signals whose arguments fn does not take'''
+        def wrapper(*args):
+            start = time.perf_counter()
+            try:
+                return fn()
+            finally:
+                self.add_python(name, time.perf_counter() - start)
+        return wrapper
+
+    def _before_sync(self):
+        # the GUI thread is blocked during sync, its counters are stable
+        now = time.perf_counter()
+        self._sync_start = now
+        with self._lock:
+            self._history.append('python', self._python * 1000.0, now)
+            self._history.append('signals', self._signals, now)
+            self._python = 0.0
+            self._signals = 0
+
+    def _after_sync(self):
+        if self._sync_start is not None:
+            now = time.perf_counter()
+            with self._lock:
+                self._history.append('sync', (now - self._sync_start) * 1000.0, now)
+
+    def _before_render(self):
+        self._render_start = time.perf_counter()
+
+    def _after_render(self):
+        if self._render_start is not None:
+            now = time.perf_counter()
+            with self._lock:
+                self._history.append('render', (now - self._render_start) * 1000.0, now)
+
+    def _frame_swapped(self):
+        now = time.perf_counter()
+        if self._last_swap is not None and now - self._last_swap < IDLE_GAP:
+            with self._lock:
+                self._history.append('frame', (now - self._last_swap) * 1000.0, now)
+        self._last_swap = now
+
+    def percentiles(self, field):
+        '''(p50, p95, p99, max) over the window, nan without samples'''
+        with self._lock:
+            # a window that does not wrap is a view of the ring
+            v = self._history.window(field, WINDOW, time.perf_counter())[1].copy()
+        if v.size == 0:
+            return (float('nan'),) * (len(PERCENTILES) + 1)
+        return tuple(float(p) for p in np.percentile(v, PERCENTILES)) + (float(v.max()),)
+
+    def report(self):
+        stats = dict((field, self.percentiles(field)) for field in FIELDS)
+        if self._writer is not None:
+            self._writer.writerow(['%.3f' % time.time()] + ['%.3f' % s for field in FIELDS for s in stats[field]])
+            self._file.flush()
+        if self._overlay:
+            lines = ['%-11s %6s %6s %6s %6s' % ('', 'p50', 'p95', 'p99', 'max')]
+            for field in FIELDS:
+                lines.append('%-11s %6.1f %6.1f %6.1f %6.1f' % ((field,) + stats[field]))
+            if self._profiler is not None:
+                lines.append('PROFILING')
+            self._text = '\n'.join(lines)
+            self.changed.emit()
+
+    def close(self):
+        self._timer.stop()
+        if self._profiler is not None:
+            self._save_profile()
+        self.detach()
+
+    @QtCore.pyqtProperty(bool, notify=changed)
+    def overlay(self):
+        return self._overlay
+
+    @QtCore.pyqtProperty(str, notify=changed)
+    def text(self):
+        return self._text
+
+    def set_overlay(self, visible):
+        self._overlay = visible
+        self.report()
+        self.changed.emit()
+
+    @QtCore.pyqtSlot()
+    def toggle_overlay(self):
+        '''F8, attaches for as long as the overlay shows unless frame_stats
+        is configured'''
+        if self._overlay:
+            self.set_overlay(False)
+            if not self._sticky:
+                self.detach()
+        else:
+            self.attach(False)
+            self.set_overlay(True)
+
+    @QtCore.pyqtSlot()
+    def profile(self):
+        '''profile the GUI thread for profile_seconds, saved as a pstats file'''
+        if self._profiler is not None:
+            return
+        print("Profiling GUI thread for %g s" % self._profile_seconds)
+        self._profiler = cProfile.Profile()
+        self._profiler.enable()
+        QtCore.QTimer.singleShot(int(self._profile_seconds * 1000), self._save_profile)
+        self.changed.emit()
+
+    def _save_profile(self):
+        if self._profiler is None:
+            return
+        self._profiler.disable()
+        filename = time.strftime('profile-%Y%m%d-%H%M%S.prof')
+        self._profiler.dump_stats(filename)
+        self._profiler = None
+        print("Profile saved to %s" % filename)
+        self.changed.emit()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''Render the PFD without a display, for recording and remote screens.
+
+    headless.py [-r 10] [-s 945x480] [-o frames] [-f png|jpg] [-q 90]
+                [-w 2] [-m mavpfd] [-n 4] [-d seconds] [--synthetic]
+
+PFD.qml is rendered offscreen by the software scene graph, so neither a
+display nor a GPU is needed.  Frames are taken at a fixed rate (see
+recorder.py) and written as an image sequence to the -o directory and/or
+published raw in the -m shared memory ring (see frame_ring.py).  Input
+comes from config.yaml like mavpfd.py, live or replay, or with
+--synthetic from a vehicle circling at a fixed point.'''
+
+from __future__ import print_function
+
+import os
+import sys
+import math
+import signal
+import optparse
+
+import yaml
+
+# must be set before Qt is loaded, an explicit environment still wins
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+os.environ.setdefault('QT_QUICK_BACKEND', 'software')
+
+import mavpfd
+from link import Link
+from vehicle import Attitude, VFR_HUD, Global_Position_INT, NAV_Controller_Output, GPS_RAW_INT, EKF_STATUS, FlightState
+from alerts import AlertRules, RuleError
+
+SYNTHETIC_RATE = 10 # records of each type per second
+SYNTHETIC_CENTRE = (-35.3632610, 149.1652300)
+SYNTHETIC_RADIUS = 300.0 # metres
+SYNTHETIC_SPEED = 22.0 # m/s
+
+def synthetic_records(t):
+    '''records of a vehicle circling SYNTHETIC_CENTRE t seconds after the start'''
+    from pymavlink.dialects.v20 import ardupilotmega as mavlink
+
+    angle = t * SYNTHETIC_SPEED / SYNTHETIC_RADIUS
+    heading = (math.degrees(angle) + 90.0) % 360.0
+    bank = math.atan(SYNTHETIC_SPEED * SYNTHETIC_SPEED / (SYNTHETIC_RADIUS * 9.81))
+    north = math.cos(angle) * SYNTHETIC_RADIUS
+    east = math.sin(angle) * SYNTHETIC_RADIUS
+    lat = SYNTHETIC_CENTRE[0] + math.degrees(north / 6378137.0)
+    lon = SYNTHETIC_CENTRE[1] + math.degrees(east / (6378137.0 * math.cos(math.radians(SYNTHETIC_CENTRE[0]))))
+    alt = 100.0 + 10.0 * math.sin(t / 10.0)
+    climb = math.cos(t / 10.0)
+    airspeed = SYNTHETIC_SPEED + 2.0 * math.sin(t / 4.0)
+    ms = int(t * 1000) & 0xffffffff
+    return [
+        Attitude(mavlink.MAVLink_attitude_message(ms, math.radians(3.0) + climb * 0.05, bank, math.radians(heading), 0, 0, 0)),
+        VFR_HUD(mavlink.MAVLink_vfr_hud_message(airspeed, SYNTHETIC_SPEED, int(heading), 55, alt + 584.0, climb)),
+        Global_Position_INT(mavlink.MAVLink_global_position_int_message(ms, int(lat * 1e7), int(lon * 1e7), int((alt + 584.0) * 1000),
+                                                                        int(alt * 1000), 0, 0, 0, int(heading * 100))),
+        NAV_Controller_Output(mavlink.MAVLink_nav_controller_output_message(math.degrees(bank), 3.0, int(heading), int(heading), 350,
+                                                                            -10.0 * math.sin(t / 10.0), 2.0, 0.0)),
+        GPS_RAW_INT(mavlink.MAVLink_gps_raw_int_message(ms * 1000, GPS_RAW_INT.GPS_FIX_TYPE_3D_FIX, int(lat * 1e7), int(lon * 1e7),
+                                                        int((alt + 584.0) * 1000), 121, 200, int(SYNTHETIC_SPEED * 100), int(heading * 100), 12)),
+        EKF_STATUS(EKF_STATUS.HEALTHY),
+        FlightState('FBWA', 128, 1, 1),
+    ]
+
+def parse_size(text):
+    (width, height) = text.lower().split('x')
+    return (int(width), int(height))
+
+if __name__ == '__main__':
+    from PyQt5.QtGui import QGuiApplication, QWindow
+    from PyQt5.QtCore import QTimer, QElapsedTimer
+
+    from frame_ring import FrameRing
+    from recorder import FrameRecorder
+
+    parser = optparse.OptionParser("headless.py [options]")
+    parser.add_option("-r", "--rate", type='float', default=10.0, help="frames per second")
+    parser.add_option("-s", "--size", default='945x480', help="frame size, WIDTHxHEIGHT")
+    parser.add_option("-o", "--output", default=None, help="directory for the image sequence")
+    parser.add_option("-f", "--format", default='png', choices=['png', 'jpg'], help="png or jpg")
+    parser.add_option("-q", "--quality", type='int', default=-1, help="encoder quality 0-100, default of the format")
+    parser.add_option("-w", "--workers", type='int', default=2, help="encoder threads")
+    parser.add_option("-m", "--shm", default=None, help="name of the shared memory frame ring")
+    parser.add_option("-n", "--slots", type='int', default=4, help="frames in the shared memory ring")
+    parser.add_option("-d", "--duration", type='float', default=None, help="seconds to record, default until interrupted")
+    parser.add_option("--synthetic", action='store_true', default=False, help="synthetic input instead of config.yaml")
+    (opts, args) = parser.parse_args()
+    if opts.output is None and opts.shm is None:
+        parser.error("nothing to produce, give -o and/or -m")
+    try:
+        (width, height) = parse_size(opts.size)
+    except ValueError:
+        parser.error("invalid size '%s'" % opts.size)
+
+    file = open('config.yaml')
+    yaml_reader = yaml.full_load(file.read())
+    file.close()
+    try:
+        AlertRules.from_config(yaml_reader.get('alerts'), Link.param_watch(yaml_reader))
+    except (RuleError, ValueError) as e:
+        print("Invalid alert rules: %s" % str(e))
+        sys.exit(1)
+
+    childProcess = None
+    parent_pipe_send = None
+    replay_speed = None
+    if not opts.synthetic:
+        (parm, replay_speed) = mavpfd.link_arguments(yaml_reader)
+        (childProcess, parent_pipe_recv, parent_pipe_send) = mavpfd.start_link(parm, yaml_reader)
+
+    app = QGuiApplication(sys.argv)
+    (engine, frame_stats) = mavpfd.create_scene(app, yaml_reader, parent_pipe_send, replay_speed)
+    window = engine.rootObjects()[0]
+    window.setVisibility(QWindow.Windowed)
+    window.resize(width, height)
+    # nobody can press buttons on a recording
+    window.setProperty('controlsVisible', False)
+
+    if opts.synthetic:
+        clock = QElapsedTimer()
+        clock.start()
+        def feed():
+            for obj in synthetic_records(clock.elapsed() / 1000.0):
+                mavpfd.apply_mav(obj)
+        watcher = QTimer(interval=int(1000 / SYNTHETIC_RATE))
+        frame_stats.connect_timed(watcher.timeout, 'ingest', feed)
+        watcher.start()
+        feed()
+    else:
+        watcher = mavpfd.watch_pipe(parent_pipe_recv, frame_stats)
+
+    ring = None
+    if opts.shm is not None:
+        # RGB32 rows are 4 byte pixels without padding
+        ring = FrameRing(opts.shm, width, height, width * 4, opts.slots)
+    recorder = FrameRecorder(window, opts.rate, opts.output, opts.format, opts.quality, opts.workers, ring)
+
+    def finish():
+        recorder.close()
+        # the scene goes before the objects its bindings read
+        engine.deleteLater()
+        if ring is not None:
+            ring.close()
+        if childProcess is not None:
+            childProcess.terminate()
+    app.aboutToQuit.connect(finish)
+    # Ctrl-C quits cleanly, the timer lets Python see the signal
+    signal.signal(signal.SIGINT, lambda *args: app.quit())
+    signal.signal(signal.SIGTERM, lambda *args: app.quit())
+    interrupt = QTimer(interval=200)
+    interrupt.timeout.connect(lambda: None)
+    interrupt.start()
+    if opts.duration is not None:
+        QTimer.singleShot(int(opts.duration * 1000), app.quit)
+
+    # the first frames wait for the resize to be rendered
+    QTimer.singleShot(100, recorder.start)
+    sys.exit(app.exec_())
@@ -0,0 +1,138 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import math
+import time
+
+import numpy as np
+
+class History():
+    '''Fixed memory history of numeric fields.
+
+    Every field owns one row of a preallocated (time, value) ring buffer,
+    so appending is O(1) and memory never grows.  The buffer holds
+    seconds * rate samples per field; faster input shortens the time span
+    that fits, it never allocates more.  Samples of a field are kept in
+    time order, so a window is found by bisecting the two halves of the
+    ring instead of scanning all of it.'''
+    def __init__(self, fields, seconds=10.0, rate=20.0):
+        self._fields = list(fields)
+        self._index = dict((name, i) for i, name in enumerate(self._fields))
+        self._seconds = seconds
+        self._capacity = int(math.ceil(seconds * rate))
+        self._time = np.full((len(self._fields), self._capacity), np.nan)
+        self._value = np.full((len(self._fields), self._capacity), np.nan)
+        self._head = [0] * len(self._fields)
+        self._count = [0] * len(self._fields)
+        self._latest_time = [float('nan')] * len(self._fields)
+
+    @property
+    def fields(self):
+        return list(self._fields)
+
+    @property
+    def seconds(self):
+        return self._seconds
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def clear(self):
+        for i in range(len(self._fields)):
+            self._clear_field(i)
+
+    def _clear_field(self, i):
+        self._time[i].fill(np.nan)
+        self._value[i].fill(np.nan)
+        self._head[i] = 0
+        self._count[i] = 0
+        self._latest_time[i] = float('nan')
+
+    def append(self, field, value, now=None):
+        '''store one sample, overwriting the oldest one'''
+        if now is None:
+            now = time.time()
+        i = self._index[field]
+        if now < self._latest_time[i]:
+            # the clock went backwards, like a replay seek; the ring is
+            # kept in time order so it can be bisected
+            self._clear_field(i)
+        head = self._head[i]
+        self._time[i, head] = now
+        self._value[i, head] = value
+        self._head[i] = (head + 1) % self._capacity
+        self._count[i] = min(self._count[i] + 1, self._capacity)
+        self._latest_time[i] = now
+
+    def latest(self, field):
+        '''(time, value) of the newest sample, nan if empty'''
+        i = self._index[field]
+        head = (self._head[i] - 1) % self._capacity
+        return (self._latest_time[i], float(self._value[i, head]))
+
+    def window(self, field, seconds=None, now=None):
+        '''(times, values) of the samples inside the window, oldest first.
+        The window ends at now, or at the newest sample of the field.'''
+        i = self._index[field]
+        if seconds is None:
+            seconds = self._seconds
+        if now is None:
+            now = self._latest_time[i]
+        head = self._head[i]
+        if self._count[i] < self._capacity:
+            halves = ((0, head),)
+        else:
+            # oldest samples from the head to the end, then the newest
+            halves = ((head, self._capacity), (0, head))
+        times = []
+        values = []
+        for (start, end) in halves:
+            t = self._time[i, start:end]
+            first = int(np.searchsorted(t, now - seconds, side='left'))
+            last = int(np.searchsorted(t, now, side='right'))
+            if last > first:
+                times.append(t[first:last])
+                values.append(self._value[i, start + first:start + last])
+        if len(times) == 1:
+            return (times[0], values[0])
+        if len(times) == 0:
+            return (np.zeros(0), np.zeros(0))
+        return (np.concatenate(times), np.concatenate(values))
+
+    def mean(self, field, seconds=None, now=None):
+        t, v = self.window(field, seconds, now)
+        if v.size == 0:
+            return float('nan')
+        return float(v.mean())
+
+    def minmax(self, field, seconds=None, now=None):
+        t, v = self.window(field, seconds, now)
+        if v.size == 0:
+            return (float('nan'), float('nan'))
+        return (float(v.min()), float(v.max()))
+
+    def slope(self, field, seconds=None, now=None):
+        '''least squares rate of change per second, 0 without enough data'''
+        t, v = self.window(field, seconds, now)
+        if v.size < 2:
+            return 0.0
+        t = t - t.mean()
+        denom = np.dot(t, t)
+        if denom <= 0:
+            return 0.0
+        return float(np.dot(t, v - v.mean()) / denom)
+
+    def trend(self, field, horizon=6.0, seconds=3.0, now=None):
+        '''change expected over the next horizon seconds at the current slope'''
+        return self.slope(field, seconds, now) * horizon
@@ -0,0 +1,642 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import math
+import time
+import random
+import threading
+
+from functools import partial
+
+from pymavlink import mavutil, mavwp
+
+from vehicle import Status_Notify, EKF_STATUS, VIBRATION, GPS_RAW_INT, Attitude, VFR_HUD, Global_Position_INT, NAV_Controller_Output, CMD_Ack, MISSION_CURRENT, FlightState, WaypointInfo, Replay_Control, Command_Request, Command_Result, Terrain_Height, Terrain_Profile
+from alerts import AlertRules, AlertEngine
+from commands import CommandQueue
+from terrain import Terrain
+from params import ParamCache
+from traffic import TrafficTable, TrafficMonitor
+
+# this module runs in the link process: it must not import PyQt5 or any
+# other GUI library, see mavpfd.py for the display side
+
+class Opener(object):
+    '''runs a blocking open on a daemon thread, the receive loop polls done'''
+    def __init__(self, connect):
+        self.result = None
+        self.error = None
+        self.done = False
+        self._abandoned = False
+        self._lock = threading.Lock()
+        thread = threading.Thread(target=self._run, args=(connect,))
+        thread.daemon = True
+        thread.start()
+
+    @staticmethod
+    def _discard(mav):
+        try:
+            mav.close()
+        except Exception:
+            pass
+
+    def _run(self, connect):
+        result = None
+        error = None
+        try:
+            result = connect()
+        except Exception as e:
+            error = str(e)
+        with self._lock:
+            if self._abandoned:
+                # the loop gave up on this attempt, nobody will read it
+                if result is not None:
+                    Opener._discard(result)
+                return
+            self.result = result
+            self.error = error
+            self.done = True
+
+    def abandon(self):
+        with self._lock:
+            self._abandoned = True
+            if self.done and self.result is not None:
+                Opener._discard(self.result)
+
+class Connection(object):
+    '''mavlink connection
+
+    The receive loop owns the connection state.  Opens run on an Opener
+    thread and only the loop picks up their result, closes happen in the
+    loop between reads, so nothing replaces or closes _mav while
+    recv_msg() uses it.  Failed or lost connections are retried after an
+    exponential backoff with jitter, liveness is the vehicle heartbeat.'''
+    CLOSED = 0 # waiting for the next attempt
+    OPENING = 1
+    OPEN = 2
+    OPEN_TIMEOUT = 15.0 # seconds an open may block before it is abandoned
+    BACKOFF_MIN = 1.0
+    BACKOFF_MAX = 30.0
+    BACKOFF_JITTER = 0.25
+
+    def __init__(self, addr):
+        self._addr = addr
+        self._state = Connection.CLOSED
+        self._opener = None
+        self._open_started = 0
+        self._opened = 0
+        self._next_attempt = 0
+        self._backoff = Connection.BACKOFF_MIN
+        self._last_packet_received = 0
+        self._last_heartbeat = 0
+        self._last_attitude_received = 0
+        self._last_vfr_hud_received = 0
+        self._last_global_position_int = 0
+        self._last_mav_controller_output = 0
+        self._last_gps_raw_int = 0
+        self._last_msg_send = 0
+        self._msglist = []
+        self._wplist = False
+        self._alerts = None
+        self._commands = CommandQueue()
+        self._params = None
+        self._traffic = None
+        self._position = None
+        self._last_traffic_send = 0
+        # streams are requested again after every reconnect
+        self._get_system_info = False
+
+    def clearMsgList(self):
+        # clean the msg list in function, cant clear it directly
+        self._msglist = []
+
+    def connect(self):
+        '''blocking open, runs on the Opener thread'''
+        return mavutil.mavlink_connection(self._addr, baud=115200)
+
+    def open(self, now):
+        '''hand a new open attempt to an Opener thread'''
+        print("Opening connection to %s" % (self._addr,))
+        self._opener = Opener(self.connect)
+        self._open_started = now
+        self._state = Connection.OPENING
+
+    def poll_open(self, now):
+        opener = self._opener
+        if opener.done:
+            self._opener = None
+            if opener.error is not None:
+                print("Connection to (%s) failed: %s" % (self._addr, opener.error))
+                self.retry_later(now)
+                return
+            self._mav = opener.result
+            self._state = Connection.OPEN
+            self._opened = now
+            self._last_packet_received = now
+            self._get_system_info = False
+        elif now - self._open_started > Connection.OPEN_TIMEOUT:
+            print("Connection to (%s) still opening after %.0f s, giving up" % (self._addr, Connection.OPEN_TIMEOUT))
+            opener.abandon()
+            self._opener = None
+            self.retry_later(now)
+
+    def retry_later(self, now):
+        self._state = Connection.CLOSED
+        jitter = random.uniform(1 - Connection.BACKOFF_JITTER, 1 + Connection.BACKOFF_JITTER)
+        self._next_attempt = now + self._backoff * jitter
+        self._backoff = min(self._backoff * 2, Connection.BACKOFF_MAX)
+
+    def heartbeat(self, now):
+        '''vehicle heartbeat received, the link is healthy'''
+        self._last_heartbeat = now
+        self._backoff = Connection.BACKOFF_MIN
+
+    def close(self, now=None):
+        '''close mavlink connection, only from the receive loop'''
+        if now is None:
+            now = time.time()
+        if self._state == Connection.OPEN:
+            try:
+                self._mav.close()
+            except Exception as e:
+                print("Closing (%s) failed: %s" % (self._addr, str(e)))
+        elif self._state == Connection.OPENING:
+            self._opener.abandon()
+            self._opener = None
+        self._msglist.extend(self._commands.cancel())
+        self.retry_later(now)
+
+    def clock(self, now):
+        '''time the alert delays run on, seconds'''
+        return now
+
+    def timed_out(self, now, timeout):
+        '''no vehicle heartbeat for timeout seconds since the open'''
+        return now - max(self._last_heartbeat, self._opened) > timeout
+
+    def maintain(self, now, timeout):
+        '''advance the connection state, never blocks'''
+        if self._state == Connection.CLOSED:
+            if now >= self._next_attempt:
+                self.open(now)
+        elif self._state == Connection.OPENING:
+            self.poll_open(now)
+        elif self.timed_out(now, timeout):
+            print("Connection (%s) timed out" % (self._addr,))
+            self.close(now)
+
+    @property
+    def active(self):
+        '''open and readable'''
+        return self._state == Connection.OPEN
+
+    @property
+    def wplist(self):
+        '''active property'''
+        return self._wplist
+        
+    @wplist.setter
+    def wplist(self, value):
+        if value == True or value == False:
+            self._wplist = value   
+
+class ReplayConnection(Connection):
+    '''tlog replay in place of a mavlink connection'''
+    REPLAY_PREFIX = 'replay:'
+    STATUS_INTERVAL = 0.5
+    def __init__(self, addr, speed=1.0):
+        super(ReplayConnection, self).__init__(addr)
+        self._path = addr[len(ReplayConnection.REPLAY_PREFIX):]
+        self._speed = speed
+        # controls sent by the display before the log is open
+        self._controls = []
+        self._log_clock = 0.0
+        self._last_status_send = 0
+
+    def connect(self):
+        # building the index of a long log takes a while, so it is opened
+        # off the receive loop like any other connection
+        from replay import Replay
+        return Replay(self._path, self._speed)
+
+    def poll_open(self, now):
+        super(ReplayConnection, self).poll_open(now)
+        if self.active:
+            controls = self._controls
+            self._controls = []
+            for ctrl in controls:
+                self.control(ctrl)
+
+    def timed_out(self, now, timeout):
+        # a paused or finished replay is quiet, not dead
+        return False
+
+    def clock(self, now):
+        # log time, so a "for 3 s" rule waits 3 s of flight at any speed
+        if self.active:
+            self._log_clock = self._mav.clock() / 1e6
+        return self._log_clock
+
+    def control(self, ctrl):
+        if ctrl.action == Replay_Control.SPEED:
+            # a reopened log keeps the speed
+            self._speed = ctrl.value
+        if not self.active:
+            self._controls.append(ctrl)
+            return
+        self._mav.control(ctrl)
+        self._last_status_send = 0
+
+    def post_status(self, now):
+        '''queue the replay position for the display'''
+        if not self.active or now - self._last_status_send < ReplayConnection.STATUS_INTERVAL:
+            return
+        self._last_status_send = now
+        self._msglist.append(self._mav.status())
+
+class Link(object):
+    '''mavlink connect maintain'''
+    # parameters forwarded to the display unless config.yaml names others
+    PARAM_WATCH = ['ARSPD_FBW_MIN', 'ARSPD_FBW_MAX']
+    TRAFFIC_INTERVAL = 0.5 # seconds between Traffic records
+
+    def __init__(self, addrs, child_pipe_send, child_pipe_recv=None, config=None):
+        '''config is the parsed config.yaml'''
+        if config is None:
+            config = {}
+        self._addrs = addrs
+        self._alert_rules = AlertRules.from_config(config.get('alerts'), Link.param_watch(config))
+        self._terrain = None
+        if config.get('terrain') is not None:
+            self._terrain = Terrain(str(config['terrain']['dir']), int(config['terrain'].get('tiles', 16)))
+        params = config.get('params') or {}
+        self._param_dir = str(params.get('dir', 'params')) if params.get('download', True) else None
+        self._param_watch = Link.param_watch(config)
+        self._traffic_config = config.get('traffic') or {}
+        self._replay_speed = float((config.get('replay') or {}).get('speed', 1.0))
+        self._child_pipe_send = child_pipe_send
+        self._child_pipe_recv = child_pipe_recv
+        self._conns = []
+        self._inactivity_timeout = 10
+        self._fps = 10.0
+        self._sendDelay = (1.0/self._fps)*0.9
+        self._wp_count = 0
+        self._expected_count = 0
+        self._wp_received = {}
+        self._wp_requested = {}
+        self._get_mission_item = False
+        self._current_seq = 0
+
+    @staticmethod
+    def param_watch(config):
+        '''names of the parameters forwarded to the display'''
+        params = config.get('params') or {}
+        return list(params.get('watch', Link.PARAM_WATCH))
+
+    def maintain_connections(self):
+        '''open, time out and reconnect, called from the receive loop'''
+        now = time.time()
+        for conn in self._conns:
+            conn.maintain(now, self._inactivity_timeout)
+
+    def create_connections(self):
+        for addr in self._addrs:
+            print("Creating connection (%s)" % addr)
+            if addr.startswith(ReplayConnection.REPLAY_PREFIX):
+                conn = ReplayConnection(addr, self._replay_speed)
+            else:
+                conn = Connection(addr)
+            conn._alerts = AlertEngine(self._alert_rules)
+            # replays only follow the PARAM_VALUEs recorded in the log
+            conn._params = ParamCache(None if isinstance(conn, ReplayConnection) else self._param_dir, self._param_watch)
+            cfg = self._traffic_config
+            conn._traffic = TrafficMonitor(TrafficTable(cell=float(cfg.get('cell', 500)), max_age=float(cfg.get('max_age', 20))),
+                                           float(cfg.get('range', 150)), float(cfg.get('threat_radius', 2000)),
+                                           float(cfg.get('threat_alt', 300)), int(cfg.get('nearest', 5)))
+            self._conns.append(conn)
+
+    def handle_controls(self):
+        '''apply controls received from qml process'''
+        if self._child_pipe_recv is None:
+            return
+        while self._child_pipe_recv.poll():
+            obj = self._child_pipe_recv.recv()
+            if isinstance(obj, Replay_Control):
+                for conn in self._conns:
+                    if isinstance(conn, ReplayConnection):
+                        conn.control(obj)
+            elif isinstance(obj, Command_Request):
+                self.submit_command(obj)
+
+    def command_connection(self):
+        '''first live connection, recorded vehicles take no commands'''
+        for conn in self._conns:
+            if conn.active and not isinstance(conn, ReplayConnection):
+                return conn
+        return None
+
+    def submit_command(self, req):
+        '''queue a display request as COMMAND_LONG'''
+        conn = self.command_connection()
+        if conn is None:
+            if len(self._conns) > 0:
+                self._conns[0]._msglist.append(Command_Result(req.request_id, 0, Command_Result.NO_LINK))
+            return
+        if req.action == Command_Request.ARM:
+            conn._commands.submit(req.request_id, mavutil.mavlink.MAV_CMD_COMPONENT_ARM_DISARM, (1,))
+        elif req.action == Command_Request.DISARM:
+            conn._commands.submit(req.request_id, mavutil.mavlink.MAV_CMD_COMPONENT_ARM_DISARM, (0,))
+        elif req.action == Command_Request.SET_MODE:
+            mapping = conn._mav.mode_mapping()
+            if mapping is None or req.value not in mapping:
+                conn._msglist.append(Command_Result(req.request_id, mavutil.mavlink.MAV_CMD_DO_SET_MODE, Command_Result.UNSUPPORTED))
+                return
+            conn._commands.submit(req.request_id, mavutil.mavlink.MAV_CMD_DO_SET_MODE,
+                                  (mavutil.mavlink.MAV_MODE_FLAG_CUSTOM_MODE_ENABLED, mapping[req.value]))
+        elif req.action == Command_Request.SET_CURRENT:
+            conn._commands.submit(req.request_id, mavutil.mavlink.MAV_CMD_DO_SET_MISSION_CURRENT, (req.value,))
+
+    def send_command(self, conn, pending):
+        conn._mav.mav.command_long_send(conn._mav.target_system, conn._mav.target_component,
+                                        pending.command, pending.confirmation, *pending.params)
+
+    def poll_commands(self):
+        '''send queued commands and retries without waiting for acks'''
+        now = time.time()
+        for conn in self._conns:
+            if conn.active and len(conn._commands) > 0:
+                conn._msglist.extend(conn._commands.poll(now, partial(self.send_command, conn)))
+
+    def poll_params(self):
+        now = time.time()
+        for conn in self._conns:
+            if conn.active and not isinstance(conn, ReplayConnection):
+                conn._msglist.extend(conn._params.poll(now, conn._mav))
+
+    def post_traffic(self):
+        '''latest traffic around each vehicle, at most every TRAFFIC_INTERVAL'''
+        now = time.time()
+        for conn in self._conns:
+            if conn._position is None:
+                continue
+            if len(conn._traffic.table) == 0 and conn._last_traffic_send == 0:
+                # no traffic seen yet, nothing to clear on the display
+                continue
+            if now - conn._last_traffic_send < Link.TRAFFIC_INTERVAL:
+                continue
+            conn._last_traffic_send = now
+            pos = conn._position
+            conn._msglist.append(conn._traffic.snapshot(pos.lat, pos.lon, pos.alt, now))
+
+    def post_terrain_height(self, conn, pos):
+        ground = self._terrain.elevation(pos.lat, pos.lon)
+        if math.isnan(ground):
+            return
+        agl = pos.alt - ground
+        conn._msglist.append(Terrain_Height(ground, agl, pos.relAlt - agl))
+
+    def post_terrain_profile(self, conn):
+        '''terrain along the mission legs, seq 0 is home and not part of the route'''
+        points = []
+        for seq in sorted(self._wp_received):
+            wp = self._wp_received[seq]
+            if seq == 0 or (wp.x == 0 and wp.y == 0):
+                continue
+            points.append((wp.x, wp.y))
+        distances, heights = self._terrain.route_profile(points)
+        conn._msglist.append(Terrain_Profile(distances.tolist(), heights.tolist()))
+
+    def evaluate_alerts(self, conn, first, now):
+        '''feed the records queued since first to the alert rules, at the
+        time of the sample where the record has one'''
+        clock = conn.clock(now)
+        for obj in conn._msglist[first:]:
+            t = getattr(obj, 'time', None)
+            conn._msglist.extend(conn._alerts.update_record(obj, clock if t is None else t))
+
+    def tick_alerts(self):
+        now = time.time()
+        for conn in self._conns:
+            conn._msglist.extend(conn._alerts.tick(conn.clock(now)))
+
+    def update_replays(self):
+        now = time.time()
+        for conn in self._conns:
+            if isinstance(conn, ReplayConnection):
+                conn.post_status(now)
+
+    def send_messages(self):
+        '''send msg to qml process''' 
+        for conn in self._conns:
+            if (time.time() - conn._last_msg_send) > self._sendDelay and len(conn._msglist) > 0:
+                self._child_pipe_send.send(conn._msglist)
+                conn.clearMsgList()
+                conn._last_msg_send = time.time()
+            else:
+                continue
+
+    def get_wp_list(self, conn):
+        self._wp = mavwp.MAVWPLoader()
+        conn._mav.waypoint_request_list_send()
+
+    def missing_wps_to_request(self):
+        ret = []
+        tnow = time.time()
+        next_seq = self._wp_count
+        for i in range(self._expected_count):
+            seq = next_seq+i
+            if seq+1 > self._expected_count:
+                continue
+            if seq in self._wp_requested and tnow - self._wp_requested[seq] < 2:
+                continue
+            ret.append(seq)
+        return ret
+
+    def send_wp_requests(self, conn, wps=None):
+        '''send waypoint item request'''
+        if wps is None:
+            self._wp_count = 0
+            self._wp_received = {}
+            self._wp_requested = {}
+            wps = self.missing_wps_to_request()
+        for seq in wps:
+            conn._mav.waypoint_request_send(seq)
+
+    def send_mission_ack(self, conn):
+        '''send waypoint mission ack'''
+        conn._mav.mav.mission_ack_send(conn._mav.target_system, conn._mav.target_component, mavutil.mavlink.MAV_CMD_ACK_OK) 
+
+    def wp_from_mission_item_int(self, wp):
+        '''convert a MISSION_ITEM_INT to a MISSION_ITEM'''
+        wp2 = mavutil.mavlink.MAVLink_mission_item_message(wp.target_system,
+                                                           wp.target_component,
+                                                           wp.seq,
+                                                           wp.frame,
+                                                           wp.command,
+                                                           wp.current,
+                                                           wp.autocontinue,
+                                                           wp.param1,
+                                                           wp.param2,
+                                                           wp.param3,
+                                                           wp.param4,
+                                                           wp.x*1.0e-7,
+                                                           wp.y*1.0e-7,
+                                                           wp.z)
+        # preserve srcSystem as that is used for naming waypoint file
+        wp2._header.srcSystem = wp.get_srcSystem()
+        wp2._header.srcComponent = wp.get_srcComponent()
+        return wp2
+
+    def handle_messages(self):
+        '''receive msg from mavlink''' 
+        now = time.time()
+        packet_received = False
+        for conn in self._conns:
+            if not conn.active:
+                continue
+            m = None
+            try:
+                m = conn._mav.recv_msg()
+            except Exception as e:
+                print("Exception receiving message on addr(%s): %s" % (str(conn._addr),str(e)))
+                conn.close(now)
+
+            if m is not None:
+                conn._last_packet_received = now
+                first = len(conn._msglist)
+                packet_received = True
+                if m._type == 'ATTITUDE':
+                    if now - conn._last_attitude_received > 0.1:
+                        conn._last_attitude_received = now
+                        conn._msglist.append(Attitude(m))
+                elif m._type == 'VFR_HUD':
+                    if now - conn._last_vfr_hud_received > 0.1:
+                        conn._last_vfr_hud_received = now
+                        conn._msglist.append(VFR_HUD(m))
+                elif m._type == 'GLOBAL_POSITION_INT':
+                    if now - conn._last_global_position_int > 0.1:
+                        conn._last_global_position_int = now
+                        pos = Global_Position_INT(m)
+                        conn._msglist.append(pos)
+                        conn._position = pos
+                        if self._terrain is not None:
+                            self.post_terrain_height(conn, pos)
+                elif m._type == 'NAV_CONTROLLER_OUTPUT':
+                    if now - conn._last_mav_controller_output > 0.1:
+                        conn._last_mav_controller_output = now
+                        conn._msglist.append(NAV_Controller_Output(m))
+                elif m._type == 'HEARTBEAT':
+                    flightmode = mavutil.mode_string_v10(m)
+                    if flightmode == 'AUTO':
+                        if conn.wplist == False:
+                            self.get_wp_list(conn)
+                            conn.wplist = True
+                    arm_disarm = conn._mav.motors_armed()
+                    target_system = conn._mav.target_system
+                    target_component = conn._mav.target_component
+                    if conn._get_system_info == False:
+                        for i in range(0, 3):
+                            conn._mav.mav.request_data_stream_send(target_system, target_component,
+                                                               mavutil.mavlink.MAV_DATA_STREAM_ALL, 4, 1)
+                    conn._get_system_info = True
+                    conn._msglist.append(FlightState(flightmode, arm_disarm, target_system, target_component))
+                    if m.type != mavutil.mavlink.MAV_TYPE_GCS:
+                        conn.heartbeat(now)
+                    if m.autopilot != mavutil.mavlink.MAV_AUTOPILOT_INVALID:
+                        # gimbals and companions send heartbeats too, the
+                        # parameters are the autopilot's
+                        conn._msglist.extend(conn._params.start(m.get_srcSystem(), m.get_srcComponent(), m.type, now))
+                elif m._type == 'ADSB_VEHICLE':
+                    conn._traffic.table.update(m, now)
+                elif m._type == 'PARAM_VALUE':
+                    conn._msglist.extend(conn._params.handle_value(m, now))
+                elif m._type == 'AUTOPILOT_VERSION':
+                    conn._msglist.extend(conn._params.handle_version(m, now))
+                elif m._type == 'COMMAND_ACK':
+                    conn._msglist.append(CMD_Ack(m))
+                    if len(conn._commands) > 0:
+                        conn._msglist.extend(conn._commands.handle_ack(m, now, (conn._mav.source_system, conn._mav.source_component),
+                                                                       (conn._mav.target_system, conn._mav.target_component)))
+                elif m._type in ['WAYPOINT_COUNT','MISSION_COUNT']:
+                    self._expected_count = m.count
+                    self.send_wp_requests(conn)
+                elif m._type in ['WAYPOINT', 'MISSION_ITEM', 'MISSION_ITEM_INT']:
+                    if m.get_type() == 'MISSION_ITEM_INT':
+                        if getattr(m, 'mission_type', 0) != 0:
+                            # this is not a mission item, likely fence
+                            return
+                        # our internal structure assumes MISSION_ITEM'''
+                        m = self.wp_from_mission_item_int(m)
+                    if m.seq < self._wp_count:
+                        #print("DUPLICATE %u" % m.seq)
+                        return
+                    if m.seq+1 > self._expected_count:
+                        return
+                    if m.seq + 1 == self._expected_count:
+                        self.send_mission_ack(conn)
+                        self._get_mission_item = True
+                    self._wp_received[m.seq] = m    
+                    if m.seq + 1 == self._expected_count and self._terrain is not None:
+                        self.post_terrain_profile(conn)
+                    conn._msglist.append(WaypointInfo(m)) 
+                    if self._get_mission_item == True:
+                        conn._msglist.append(Status_Notify(Status_Notify.WAYPOINT_RECEIVED))
+                elif m._type == 'MISSION_CURRENT':
+                    # if m.seq == self._current_seq:
+                    #     continue
+                    if m.seq in self._wp_received:
+                        self._current_seq = m.seq
+                        conn._msglist.append(MISSION_CURRENT(m.seq, self._wp_received[m.seq].x, self._wp_received[m.seq].y, self._wp_received[m.seq].z, self._wp_received[m.seq].command))
+                elif m._type == 'EKF_STATUS_REPORT':
+                    conn._msglist.append(EKF_STATUS(EKF_STATUS.classify(m.flags)))
+                elif m._type == 'GPS_RAW_INT':
+                    if now - conn._last_gps_raw_int > 0.1:
+                        conn._last_gps_raw_int = now
+                        conn._msglist.append(GPS_RAW_INT(m))
+                elif m._type == 'VIBRATION':
+                    conn._msglist.append(VIBRATION(m))
+                self.evaluate_alerts(conn, first, now)
+                continue
+
+        if not packet_received:
+            time.sleep(0.01)
+
+    def init(self):
+        self.create_connections()
+        
+    def loop(self):
+        self.maintain_connections()
+        self.handle_controls()
+        self.poll_commands()
+        self.poll_params()
+        self.handle_messages()
+        self.update_replays()
+        self.post_traffic()
+        self.tick_alerts()
+        self.send_messages()
+
+    def run(self):
+        self.init()
+        while True:
+            self.loop()
+
+def childProcessRun(parm, p, c, config=None):
+    parent_pipe_recv,child_pipe_send = p
+    child_pipe_recv,parent_pipe_send = c
+    parent_pipe_recv.close()
+    parent_pipe_send.close()
+    if len(parm) == 0:
+        print("Insufficient arguments")
+        sys.exit(1)
+    hub = Link(parm, child_pipe_send, child_pipe_recv, config)    
+    hub.run()
@@ -0,0 +1,309 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''Moving map underlay for the EHSI from local MBTiles files.
+
+The EHSI canvas is north up at one pixel per metre around the vehicle
+and rotated by -heading, so the map is one north up composite image of
+COMPOSITE_SIZE metres that QML rotates together with the route.  Tiles
+are read, decoded and composed on a worker thread; the GUI thread only
+swaps in a finished composite and moves it by the vehicle offset.'''
+
+import os
+import math
+import sqlite3
+import threading
+import urllib.parse
+from collections import OrderedDict
+
+from PyQt5 import QtCore, QtGui, QtQuick
+
+TILE_SIZE = 256
+EARTH_CIRCUMFERENCE = 40075016.686
+COMPOSITE_SIZE = 512 # metres and pixels, covers the 300 px EHSI at any rotation
+RECOMPOSE_DISTANCE = 40 # metres the vehicle moves before a new composite
+PREFETCH_DISTANCES = (256, 512, 1024) # metres ahead along the heading
+PREFETCH_HEADING = 15 # degrees of turn that make a running prefetch stale
+
+def world_pixel(lat, lon, zoom):
+    '''web mercator pixel of lat, lon at zoom, y grows southwards'''
+    scale = TILE_SIZE * (1 << zoom)
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = (lon + 180.0) / 360.0 * scale
+    y = (1.0 - math.log(math.tan(math.radians(lat)) + 1.0 / math.cos(math.radians(lat))) / math.pi) / 2.0 * scale
+    return (x, y)
+
+def metres_per_pixel(lat, zoom):
+    return EARTH_CIRCUMFERENCE * math.cos(math.radians(lat)) / (TILE_SIZE * (1 << zoom))
+
+def ground_distance(lat0, lon0, lat1, lon1):
+    '''metres between two nearby points, flat earth'''
+    north = math.radians(lat1 - lat0) * EARTH_CIRCUMFERENCE / (2 * math.pi)
+    east = math.radians(lon1 - lon0) * EARTH_CIRCUMFERENCE / (2 * math.pi) * math.cos(math.radians(lat1))
+    return math.hypot(north, east)
+
+def offset_position(lat, lon, bearing, distance):
+    '''lat, lon moved distance metres along bearing, flat earth'''
+    north = math.cos(math.radians(bearing)) * distance
+    east = math.sin(math.radians(bearing)) * distance
+    return (lat + north * 360.0 / EARTH_CIRCUMFERENCE,
+            lon + east * 360.0 / (EARTH_CIRCUMFERENCE * max(math.cos(math.radians(lat)), 0.01)))
+
+class MBTiles():
+    '''read only access to one MBTiles file'''
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise IOError("no such file: %s" % path)
+        # a read only URI never creates the file and never writes a journal
+        # and the path is quoted so ?, # and % in it stay part of the name
+        self._db = sqlite3.connect('file:%s?mode=ro' % urllib.parse.quote(os.path.abspath(path)), uri=True, check_same_thread=False)
+        self.path = path
+        metadata = dict(self._db.execute('SELECT name, value FROM metadata').fetchall())
+        zooms = self._db.execute('SELECT MIN(zoom_level), MAX(zoom_level) FROM tiles').fetchone()
+        self.minzoom = int(metadata.get('minzoom', zooms[0] if zooms[0] is not None else 0))
+        self.maxzoom = int(metadata.get('maxzoom', zooms[1] if zooms[1] is not None else 0))
+
+    def close(self):
+        self._db.close()
+
+    def tile(self, zoom, x, y):
+        '''encoded tile bytes or None, y counts from the north like XYZ tiles'''
+        row = self._db.execute('SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?',
+                               (zoom, x, (1 << zoom) - 1 - y)).fetchone()
+        return None if row is None else bytes(row[0])
+
+class TileCache():
+    '''decoded tiles in an LRU bounded by their size in bytes'''
+    def __init__(self, max_bytes):
+        self._max_bytes = max_bytes
+        self._tiles = OrderedDict()
+        self.bytes = 0
+
+    def __contains__(self, key):
+        return key in self._tiles
+
+    def get(self, key):
+        image = self._tiles.get(key)
+        if image is not None or key in self._tiles:
+            self._tiles.move_to_end(key)
+        return image
+
+    def put(self, key, image):
+        '''image may be None so missing tiles are not read again'''
+        if key in self._tiles:
+            self.bytes -= self._size(self._tiles.pop(key))
+        self._tiles[key] = image
+        self.bytes += self._size(image)
+        while self.bytes > self._max_bytes and len(self._tiles) > 1:
+            old_key, old = self._tiles.popitem(last=False)
+            self.bytes -= self._size(old)
+
+    @staticmethod
+    def _size(image):
+        # missing tiles still cost their key
+        return 64 if image is None else image.sizeInBytes()
+
+class MapImageProvider(QtQuick.QQuickImageProvider):
+    '''hands the current composite to QML as image://map/<serial>'''
+    def __init__(self, moving_map):
+        QtQuick.QQuickImageProvider.__init__(self, QtQuick.QQuickImageProvider.Image)
+        self._map = moving_map
+
+    def requestImage(self, id, requestedSize):
+        image = self._map.composite
+        return image, image.size()
+
+class MovingMap(QtCore.QObject):
+    '''composes the map around the vehicle, see the module docstring'''
+    changed = QtCore.pyqtSignal()
+    _composed = QtCore.pyqtSignal(object, float, float)
+
+    def __init__(self, paths, cache_mb=64, parent=None):
+        QtCore.QObject.__init__(self, parent)
+        self._sources = []
+        for path in paths:
+            try:
+                self._sources.append(MBTiles(path))
+            except (IOError, sqlite3.Error) as e:
+                print("Map (%s) unusable: %s" % (path, str(e)))
+        self._cache = TileCache(int(cache_mb * 1024 * 1024))
+        self.composite = QtGui.QImage(COMPOSITE_SIZE, COMPOSITE_SIZE, QtGui.QImage.Format_RGB32)
+        self.composite.fill(QtCore.Qt.black)
+        self._serial = 0
+        self._centre = None
+        self._position = None
+        self._offset_x = 0.0
+        self._offset_y = 0.0
+        self._composed.connect(self._swap)
+        # the worker only ever needs the latest position
+        self._request = None
+        self._running = len(self._sources) > 0
+        self._wakeup = threading.Condition()
+        self._thread = None
+        if self._running:
+            self._thread = threading.Thread(target=self._run, name='moving_map', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._wakeup:
+            self._running = False
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join()
+        for source in self._sources:
+            source.close()
+
+    def follow(self, lat, lon, heading):
+        '''new vehicle position, called on the GUI thread'''
+        if len(self._sources) == 0:
+            return
+        with self._wakeup:
+            self._request = (lat, lon, heading)
+            self._wakeup.notify()
+        self._position = (lat, lon)
+        self._move(False)
+
+    def _move(self, force):
+        if self._centre is None:
+            return
+        (lat, lon) = self._position
+        (clat, clon) = self._centre
+        x = math.radians(lon - clon) * EARTH_CIRCUMFERENCE / (2 * math.pi) * math.cos(math.radians(clat))
+        y = -math.radians(lat - clat) * EARTH_CIRCUMFERENCE / (2 * math.pi)
+        # the map only moves by whole pixels
+        if not force and abs(x - self._offset_x) < 0.5 and abs(y - self._offset_y) < 0.5:
+            return
+        self._offset_x = x
+        self._offset_y = y
+        self.changed.emit()
+
+    def _swap(self, image, lat, lon):
+        self.composite = image
+        self._centre = (lat, lon)
+        self._serial += 1
+        self._move(True)
+
+    @QtCore.pyqtProperty(bool, notify=changed)
+    def visible(self):
+        return self._centre is not None
+
+    @QtCore.pyqtProperty(str, notify=changed)
+    def source(self):
+        '''a new url per composite, so QML reloads only when it changed'''
+        return 'image://map/%u' % self._serial
+
+    @QtCore.pyqtProperty(float, notify=changed)
+    def offset_x(self):
+        '''vehicle east of the composite centre, in EHSI pixels'''
+        return self._offset_x
+
+    @QtCore.pyqtProperty(float, notify=changed)
+    def offset_y(self):
+        '''vehicle south of the composite centre, in EHSI pixels'''
+        return self._offset_y
+
+    def _zoom(self, lat):
+        '''zoom level closest to one metre per pixel the files provide'''
+        minzoom = min(s.minzoom for s in self._sources)
+        maxzoom = max(s.maxzoom for s in self._sources)
+        zoom = int(math.ceil(math.log(max(metres_per_pixel(lat, 0), 1.0), 2)))
+        return min(max(zoom, minzoom), maxzoom)
+
+    def _tile(self, zoom, x, y):
+        key = (zoom, x % (1 << zoom), y)
+        if key in self._cache:
+            return self._cache.get(key)
+        image = None
+        for source in self._sources:
+            try:
+                data = source.tile(*key)
+            except sqlite3.Error as e:
+                print("Map tile read (%s) failed: %s" % (source.path, str(e)))
+                continue
+            if data is not None:
+                image = QtGui.QImage.fromData(data)
+                if image.isNull():
+                    image = None
+                else:
+                    break
+        self._cache.put(key, image)
+        return image
+
+    def _tile_range(self, lat, lon, zoom):
+        '''tile x, y ranges and world pixel origin of a composite centred on lat, lon'''
+        span = COMPOSITE_SIZE / metres_per_pixel(lat, zoom)
+        (cx, cy) = world_pixel(lat, lon, zoom)
+        x0 = cx - span / 2
+        y0 = cy - span / 2
+        limit = (1 << zoom) - 1
+        xs = range(int(math.floor(x0 / TILE_SIZE)), int(math.floor((x0 + span) / TILE_SIZE)) + 1)
+        ys = range(max(int(math.floor(y0 / TILE_SIZE)), 0), min(int(math.floor((y0 + span) / TILE_SIZE)), limit) + 1)
+        return (xs, ys, x0, y0, span)
+
+    def _compose(self, lat, lon):
+        zoom = self._zoom(lat)
+        (xs, ys, x0, y0, span) = self._tile_range(lat, lon, zoom)
+        image = QtGui.QImage(COMPOSITE_SIZE, COMPOSITE_SIZE, QtGui.QImage.Format_RGB32)
+        image.fill(QtCore.Qt.black)
+        painter = QtGui.QPainter(image)
+        painter.setRenderHint(QtGui.QPainter.SmoothPixmapTransform)
+        painter.scale(COMPOSITE_SIZE / span, COMPOSITE_SIZE / span)
+        for x in xs:
+            for y in ys:
+                tile = self._tile(zoom, x, y)
+                if tile is not None:
+                    painter.drawImage(QtCore.QRectF(x * TILE_SIZE - x0, y * TILE_SIZE - y0, TILE_SIZE, TILE_SIZE), tile)
+        painter.end()
+        return image
+
+    def _prefetch(self, lat, lon, heading):
+        '''decode the tiles the vehicle flies into next
+
+        follow() queues a request with every position, so a newer request
+        stops the prefetch only when it needs a new composite or turned
+        far enough to look somewhere else.'''
+        zoom = self._zoom(lat)
+        for distance in PREFETCH_DISTANCES:
+            (plat, plon) = offset_position(lat, lon, heading, distance)
+            (xs, ys, x0, y0, span) = self._tile_range(plat, plon, zoom)
+            for x in xs:
+                for y in ys:
+                    if not self._running or self._stale(lat, lon, heading):
+                        return
+                    self._tile(zoom, x, y)
+
+    def _stale(self, lat, lon, heading):
+        '''whether the newest request moved or turned away from lat, lon, heading'''
+        request = self._request
+        if request is None:
+            return False
+        turn = abs((request[2] - heading + 180) % 360 - 180)
+        return turn > PREFETCH_HEADING or ground_distance(lat, lon, request[0], request[1]) > RECOMPOSE_DISTANCE
+
+    def _run(self):
+        composed = None
+        while True:
+            with self._wakeup:
+                while self._running and self._request is None:
+                    self._wakeup.wait()
+                if not self._running:
+                    return
+                (lat, lon, heading) = self._request
+                self._request = None
+            try:
+                if composed is None or ground_distance(composed[0], composed[1], lat, lon) > RECOMPOSE_DISTANCE:
+                    composed = (lat, lon)
+                    self._composed.emit(self._compose(lat, lon), lat, lon)
+                self._prefetch(lat, lon, heading)
+            except Exception as e:
+                print("Map worker: %s" % str(e))
@@ -0,0 +1,324 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import json
+import struct
+
+from pymavlink import mavutil
+
+from vehicle import Param_Value
+
+HASH_CHECK = '_HASH_CHECK'
+NO_INDEX = 65535 # param_index of values that answer a read by name
+
+def hash_bits(value):
+    '''_HASH_CHECK carries a uint32 in the bits of its float value'''
+    return struct.unpack('<I', struct.pack('<f', value))[0]
+
+def board_uid(m):
+    '''hardware id from AUTOPILOT_VERSION as hex, None if the board has none'''
+    if m.uid != 0:
+        return '%016x' % m.uid
+    uid2 = bytearray(getattr(m, 'uid2', None) or [])
+    if any(uid2):
+        return uid2.hex()
+    return None
+
+def sample_indices(count, samples):
+    '''up to samples indices spread evenly over 0 .. count-1'''
+    if count <= 0:
+        return []
+    n = min(samples, count)
+    if n == 1:
+        return [0]
+    return sorted(set(int(round(i * (count - 1) / float(n - 1))) for i in range(n)))
+
+class ParamCache():
+    '''parameters of one vehicle, downloaded once and cached on disk
+
+    The autopilot is the first component whose heartbeat names one, and
+    only its PARAM_VALUE and AUTOPILOT_VERSION are used.
+    The cache file is named after the system id, the vehicle type and the
+    board uid from AUTOPILOT_VERSION, so airframes sharing a system id do
+    not share a cache; boards without a uid fall back to the first two.
+    The download is skipped when the autopilot answers _HASH_CHECK with
+    the cached hash, or, without hash support, when the parameter count
+    and a sample of indices spread over the list all match the cache.
+    Otherwise the full list is requested and the indices still
+    missing once the stream goes quiet are read one by one.  PARAM_VALUE
+    arriving later updates the values in place, and the watched ones are
+    forwarded to the display as Param_Value records.'''
+    IDLE = 0
+    IDENTIFY = 1 # waiting for AUTOPILOT_VERSION
+    HASH = 2 # waiting for _HASH_CHECK
+    COUNT = 3 # waiting for the sampled indices and the parameter count
+    FETCH = 4
+    DONE = 5
+    REPLY_TIMEOUT = 2.0
+    IDENTIFY_RETRIES = 2 # AUTOPILOT_VERSION requests before going without a uid
+    COUNT_SAMPLES = 8 # cached indices compared without hash support
+    GAP_TIMEOUT = 1.0 # quiet time before missing indices are requested
+    GAP_BATCH = 10 # indices read per gap-filling round
+    RETRIES = 5 # rounds without progress before giving up
+    SAVE_DELAY = 5.0 # seconds incremental changes wait before being saved
+
+    def __init__(self, directory, watch):
+        self._directory = directory
+        self._watch = set(watch)
+        self._state = ParamCache.IDLE
+        self._system = None
+        self._source = None # (sysid, compid) of the autopilot
+        self._path = None
+        self._values = {}
+        self._types = {}
+        self._names = {}
+        self._count = None
+        self._hash = None
+        self._cached = None
+        self._samples = {}
+        self._sent = None
+        self._activity = None
+        self._retries = 0
+        self._dirty = None
+        self._refresh = []
+
+    @property
+    def complete(self):
+        return self._state == ParamCache.DONE
+
+    def get(self, name, default=None):
+        return self._values.get(name, default)
+
+    def _forward(self, name, value, results):
+        if name in self._watch:
+            results.append(Param_Value(name, value))
+
+    def _load(self):
+        try:
+            with open(self._path) as f:
+                data = json.load(f)
+            return (int(data['count']), data.get('hash'),
+                    dict((name, (float(v[0]), int(v[1]), int(v[2]))) for name, v in data['params'].items()))
+        except (IOError, OSError, ValueError, KeyError, TypeError, IndexError) as e:
+            if os.path.exists(self._path):
+                print("Parameter cache (%s) unusable: %s" % (self._path, str(e)))
+            return None
+
+    def save(self):
+        if self._path is None or self._count is None:
+            return
+        params = {}
+        for index, name in self._names.items():
+            params[name] = [self._values[name], self._types.get(name, 0), index]
+        data = {'count': self._count, 'hash': self._hash, 'params': params}
+        try:
+            if not os.path.isdir(self._directory):
+                os.makedirs(self._directory)
+            tmp = self._path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(data, f, sort_keys=True)
+            os.replace(tmp, self._path)
+        except (IOError, OSError) as e:
+            print("Parameter cache (%s) not saved: %s" % (self._path, str(e)))
+        self._dirty = None
+
+    def start(self, sysid, compid, vehicle_type, now):
+        '''autopilot heartbeat seen, begin the sync unless it already ran;
+        returns records'''
+        if self._source is None:
+            self._source = (sysid, compid)
+        if self._state != ParamCache.IDLE or self._directory is None:
+            return []
+        self._system = (sysid, vehicle_type)
+        self._state = ParamCache.IDENTIFY
+        self._sent = None
+        self._retries = 0
+        return []
+
+    def handle_version(self, m, now):
+        '''apply an AUTOPILOT_VERSION, returns the records to forward'''
+        if self._state != ParamCache.IDENTIFY or not self._from_autopilot(m):
+            return []
+        return self._open(board_uid(m))
+
+    def _open(self, uid):
+        '''load the cache of the identified vehicle and start checking it'''
+        name = 'sys%u-type%u' % self._system
+        if uid is not None:
+            name += '-' + uid
+        self._path = os.path.join(self._directory, name + '.json')
+        self._cached = self._load()
+        self._sent = None
+        self._retries = 0
+        results = []
+        if self._cached is None:
+            self._state = ParamCache.FETCH
+            return results
+        # the cache is good enough to show until the vehicle confirms it
+        for name, (value, ptype, index) in self._cached[2].items():
+            self._forward(name, value, results)
+        self._state = ParamCache.HASH
+        return results
+
+    def _use_cache(self, results):
+        (count, chash, params) = self._cached
+        self._count = count
+        for name, (value, ptype, index) in params.items():
+            if name not in self._values:
+                self._values[name] = value
+                self._types[name] = ptype
+                self._names[index] = name
+        self._cached = None
+        self._state = ParamCache.DONE
+        self._refresh = sorted(self._watch)
+        print("Parameters: %u from cache" % count)
+
+    def _check_samples(self):
+        '''no hash support, compare the count and a sample of indices'''
+        (count, chash, params) = self._cached
+        by_index = dict((index, (name, value)) for name, (value, ptype, index) in params.items())
+        self._samples = {}
+        for index in sample_indices(count, ParamCache.COUNT_SAMPLES):
+            if index not in by_index:
+                # a cache with holes can't be confirmed
+                self._fetch()
+                return
+            self._samples[index] = by_index[index]
+        if len(self._samples) == 0:
+            self._fetch()
+            return
+        self._state = ParamCache.COUNT
+        self._sent = None
+        self._retries = 0
+
+    def _fetch(self):
+        self._cached = None
+        self._samples = {}
+        self._state = ParamCache.FETCH
+        self._sent = None
+        self._retries = 0
+
+    def _finish(self):
+        self._state = ParamCache.DONE
+        self._refresh = []
+        print("Parameters: %u downloaded" % self._count)
+        self.save()
+
+    def poll(self, now, master):
+        '''send the requests due on master, a mavutil connection; returns
+        the records to forward'''
+        ts = master.target_system
+        tc = master.target_component
+        if self._state == ParamCache.IDENTIFY:
+            if self._sent is not None and now - self._sent < ParamCache.REPLY_TIMEOUT:
+                return []
+            if self._sent is not None:
+                self._retries += 1
+                if self._retries >= ParamCache.IDENTIFY_RETRIES:
+                    return self._open(None)
+            self._sent = now
+            # the second form is for autopilots older than REQUEST_MESSAGE
+            master.mav.command_long_send(ts, tc, mavutil.mavlink.MAV_CMD_REQUEST_MESSAGE, 0,
+                                         mavutil.mavlink.MAVLINK_MSG_ID_AUTOPILOT_VERSION, 0, 0, 0, 0, 0, 0)
+            master.mav.command_long_send(ts, tc, mavutil.mavlink.MAV_CMD_REQUEST_AUTOPILOT_CAPABILITIES, 0,
+                                         1, 0, 0, 0, 0, 0, 0)
+        elif self._state in (ParamCache.HASH, ParamCache.COUNT):
+            if self._sent is not None:
+                if now - self._sent < ParamCache.REPLY_TIMEOUT:
+                    return []
+                if self._state == ParamCache.HASH:
+                    self._check_samples()
+                    if self._state != ParamCache.COUNT:
+                        return []
+                else:
+                    self._retries += 1
+                    if self._retries > ParamCache.RETRIES:
+                        self._fetch()
+                        return []
+            self._sent = now
+            if self._state == ParamCache.HASH:
+                master.mav.param_request_read_send(ts, tc, HASH_CHECK.encode(), -1)
+            else:
+                for index in sorted(self._samples):
+                    master.mav.param_request_read_send(ts, tc, b'', index)
+        elif self._state == ParamCache.FETCH:
+            if self._sent is None:
+                self._sent = self._activity = now
+                self._retries = 0
+                master.mav.param_request_list_send(ts, tc)
+                return []
+            if now - self._activity < ParamCache.GAP_TIMEOUT:
+                return []
+            self._activity = now
+            self._retries += 1
+            if self._retries > ParamCache.RETRIES:
+                print("Parameters: download stalled at %u of %s" % (len(self._names), self._count))
+                self._state = ParamCache.DONE
+                self._refresh = []
+                return []
+            if self._count is None:
+                master.mav.param_request_list_send(ts, tc)
+                return []
+            missing = [i for i in range(self._count) if i not in self._names][:ParamCache.GAP_BATCH]
+            for index in missing:
+                master.mav.param_request_read_send(ts, tc, b'', index)
+        elif self._state == ParamCache.DONE:
+            if len(self._refresh) > 0:
+                master.mav.param_request_read_send(ts, tc, self._refresh.pop().encode(), -1)
+            if self._dirty is not None and now - self._dirty > ParamCache.SAVE_DELAY:
+                self.save()
+        return []
+
+    def _from_autopilot(self, m):
+        return (m.get_srcSystem(), m.get_srcComponent()) == self._source
+
+    def handle_value(self, m, now):
+        '''apply a PARAM_VALUE, returns the Param_Value records to forward;
+        other components' parameters are ignored'''
+        if not self._from_autopilot(m):
+            return []
+        results = []
+        name = m.param_id
+        if name == HASH_CHECK:
+            self._hash = hash_bits(m.param_value)
+            if self._state == ParamCache.HASH:
+                if self._cached[1] is not None and self._cached[1] == self._hash:
+                    self._use_cache(results)
+                else:
+                    self._fetch()
+            return results
+        value = float(m.param_value)
+        changed = self._values.get(name) != value
+        self._values[name] = value
+        self._types[name] = m.param_type
+        if m.param_count != NO_INDEX and m.param_count > 0:
+            self._count = m.param_count
+        if m.param_index != NO_INDEX and m.param_index >= 0:
+            if m.param_index not in self._names:
+                self._retries = 0
+            self._names[m.param_index] = name
+        if self._state == ParamCache.COUNT and m.param_index in self._samples:
+            if self._cached[0] != m.param_count or self._samples.pop(m.param_index) != (name, value):
+                self._fetch()
+            elif len(self._samples) == 0:
+                self._use_cache(results)
+        elif self._state == ParamCache.FETCH:
+            self._activity = now
+            if self._count is not None and len(self._names) >= self._count:
+                self._finish()
+        elif self._state == ParamCache.DONE and changed and self._dirty is None:
+            self._dirty = now
+        if changed:
+            self._forward(name, value, results)
+        return results
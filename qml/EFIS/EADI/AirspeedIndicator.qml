@@ -9,6 +9,7 @@ Item  {
 
     property double airspeed: 0
     property double bugValue: 0
+    property double trend: 0 // airspeed change expected in the next 6 s
 
     property double maximumAirspeed: 999
     property double minimumAirspeed: 0
@@ -30,6 +31,7 @@ Item  {
     readonly property double visibleRedTickmarkCount: 175 / (redTickmarkStepSize * pixelPerSpeed)
 
     property double bugY: 0
+    readonly property double trendLength: Math.min(Math.abs(trend) * pixelPerSpeed, 85)
 
     onAirspeedChanged: update()
     onBugValueChanged: update()
@@ -140,6 +142,17 @@ Item  {
         }
     }
 
+    // Trend vector
+    Rectangle {
+        id: trendVector
+        x: 59
+        y: trend > 0 ? 125 - trendLength : 125
+        width: 2
+        height: trendLength
+        color: "#ff00ff"
+        visible: trendLength >= 1
+    }
+
     CustomImage {
         id: bug
         x: 0
@@ -8,6 +8,10 @@ Item {
 
     property double altitude: 0
     property double bugValue: 0
+    property double trend: 0 // altitude change expected in the next 6 s
+    property double ground: 0 // terrain level on the tape
+    property double agl: 0
+    property bool aglVisible: false
 
     property double maximumAltitude: 999
     property double minimumAltitude: 0
@@ -23,9 +27,11 @@ Item {
     readonly property double pixelPerAltitude: 1.75
 
     property double altitudeBugDeltaY: 0
+    readonly property double trendLength: Math.min(Math.abs(trend) * pixelPerAltitude, 85)
 
     onAltitudeChanged: update()
     onBugValueChanged: update()
+    onGroundChanged: update()
 
     function update() {
 
@@ -60,8 +66,9 @@ Item {
             ctx.translate(0, altitude * pixelPerAltitude)
 
             // Ground
+            var groundY = 0.5 * 175 - ground * pixelPerAltitude
             ctx.fillStyle = "#402000"
-            ctx.fillRect(0, 0.5 * 175, 36, 0.5 * 175)
+            ctx.fillRect(0, groundY, 36, Math.max(0, 175 - altitude * pixelPerAltitude - groundY))
 
             // White tickmarks
             ctx.strokeStyle = "#ffffff"
@@ -108,6 +115,17 @@ Item {
         }
     }
 
+    // Trend vector
+    Rectangle {
+        id: trendVector
+        x: 231
+        y: trend > 0 ? 125 - trendLength : 125
+        width: 2
+        height: trendLength
+        color: "#ff00ff"
+        visible: trendLength >= 1
+    }
+
     CustomImage {
         id: alt_bug
         x: 225
@@ -161,5 +179,19 @@ Item {
         height: 12
         color : "#000000"
     }
-}
 
+    // Height above terrain
+    Text {
+        x: 225
+        y: 212
+        width: 42
+        height: 12
+        text: "AGL " + agl.toFixed(0)
+        font.family: "Courier Std"
+        font.pixelSize: 9
+        horizontalAlignment: Text.AlignHCenter
+        color: agl < 30 ? "#ffbf00" : "#ffffff"
+        visible: aglVisible
+        antialiasing: true
+    }
+}
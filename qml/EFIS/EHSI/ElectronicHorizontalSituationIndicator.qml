@@ -16,6 +16,11 @@ Item {
     property bool wp_received_flag: false
     property int cdiMode: 0 // 0->OFF, 1->TO, 2->FROM
     property int sequence: 0
+    property string mapSource: ""
+    property bool mapVisible: false
+    property double mapOffsetX: 0
+    property double mapOffsetY: 0
+    property var traffic: null
 
 
 
@@ -36,6 +41,26 @@ Item {
         source: "../../Resources/Fonts/Courier Std Bold.otf"
     }
 
+    // Moving map, north up around the vehicle like the route and
+    // turned with it; the image only reloads when mapSource changes
+    Item {
+        id: mapLayer
+        width: 300
+        height: 300
+        rotation: -heading
+        visible: mapVisible
+
+        Image {
+            x: 150 - width / 2 - mapOffsetX
+            y: 150 - height / 2 - mapOffsetY
+            width: 512
+            height: 512
+            source: mapVisible ? mapSource : ""
+            cache: false
+            smooth: true
+        }
+    }
+
     Canvas {
         id: canvas
         x: 0
@@ -89,6 +114,58 @@ Item {
         }
     }
 
+    // ADS-B contacts, north up like the route and turned with it
+    Item {
+        id: trafficLayer
+        width: 300
+        height: 300
+        rotation: -heading
+
+        Repeater {
+            model: traffic
+
+            Item {
+                x: 150 + model.x
+                y: 150 + model.y
+                property color symbolColor: model.level >= 2 ? "#ff0000" : model.level === 1 ? "#ffbf00" : "#00ffff"
+
+                // track line
+                Rectangle {
+                    x: -1
+                    y: -12
+                    width: 2
+                    height: 12
+                    color: parent.symbolColor
+                    rotation: model.heading
+                    transformOrigin: Item.Bottom
+                }
+
+                Rectangle {
+                    x: -5
+                    y: -5
+                    width: 10
+                    height: 10
+                    // a diamond on screen whatever the heading
+                    rotation: 45 + root.heading
+                    color: model.level > 0 ? parent.symbolColor : "transparent"
+                    border.color: parent.symbolColor
+                    border.width: 2
+                }
+
+                // relative altitude, kept upright
+                Text {
+                    x: 8
+                    y: -6
+                    rotation: root.heading
+                    font.family: "Courier Std"
+                    font.pixelSize: 10
+                    color: parent.symbolColor
+                    text: (model.altitude >= 0 ? "+" : "") + model.altitude.toFixed(0)
+                }
+            }
+        }
+    }
+
     CustomImage {
         id: back
         source: "../../Resources/ehsi/ehsi_back.svg"
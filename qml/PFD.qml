@@ -18,6 +18,31 @@ Window {
     // title: "Primary Flight Display"
     color: "#000000"
 
+    // the command buttons, off when nobody can press them
+    property bool controlsVisible: true
+    // ArduPlane modes offered by the mode box, the link answers
+    // UNSUPPORTED for modes the vehicle does not know
+    property var modes: ["MANUAL", "STABILIZE", "FBWA", "FBWB", "CRUISE", "AUTO", "RTL", "LOITER", "GUIDED"]
+
+    component CommandButton: Button {
+        width: 56 * container.scaleRatio
+        height: 24 * container.scaleRatio
+        font.family: "Courier Std"
+        font.pixelSize: 11 * container.scaleRatio
+        contentItem: Text {
+            text: parent.text
+            font: parent.font
+            color: "#ffffff"
+            horizontalAlignment: Text.AlignHCenter
+            verticalAlignment: Text.AlignVCenter
+        }
+        background: Rectangle {
+            color: parent.down ? "#606060" : "#303030"
+            border.color: "#ffffff"
+            radius: 3
+        }
+    }
+
     Item {
         id: container
         property double scaleRatio: Math.min(height / 320, width / 630)
@@ -57,11 +82,16 @@ Window {
 
                     asi.airspeed: pfd.airspeed
                     asi.bugValue: pfd.target_aspd
+                    asi.trend: pfd.airspeed_trend
 
                     vsi.climbRate: pfd.climbrate
                     
                     alt.bugValue: pfd.target_alt
                     alt.altitude: pfd.alt                    
+                    alt.trend: pfd.alt_trend
+                    alt.ground: pfd.ground_alt
+                    alt.agl: pfd.agl
+                    alt.aglVisible: pfd.terrain_visible
                     
                     labels.ekfstatus : pfd.ekf_healthy
                     labels.gpsFixed: pfd.gps_lock_type
@@ -88,10 +118,237 @@ Window {
                     distance: pfd.wp_dist
                     sequence: pfd.mission_seq
                     wp_received_flag: pfd.wp_received_flag
+                    mapSource: moving_map.source
+                    mapVisible: moving_map.visible
+                    mapOffsetX: moving_map.offset_x
+                    mapOffsetY: moving_map.offset_y
+                    traffic: pfd.traffic
                     labels.distanceVisible: pfd.target_alt_visible
                 }
             }
         
         }
+
+        // Alerts raised by the link process, most severe first
+        Text {
+            anchors.horizontalCenter: parent.horizontalCenter
+            anchors.top: parent.top
+            font.family: "Courier Std"
+            font.pixelSize: 14 * container.scaleRatio
+            horizontalAlignment: Text.AlignHCenter
+            color: pfd.alert_level >= 2 ? "#ff0000" : pfd.alert_level === 1 ? "#ffbf00" : "#ffffff"
+            visible: pfd.alert_level >= 0
+            text: pfd.alert_text
+        }
+
+        // Closest ADS-B threat
+        Text {
+            anchors.right: parent.right
+            anchors.top: parent.top
+            font.family: "Courier Std"
+            font.pixelSize: 12 * container.scaleRatio
+            color: pfd.traffic_level >= 2 ? "#ff0000" : "#ffbf00"
+            text: pfd.traffic_text
+        }
+
+        // Commands to the vehicle and the result of the last one; the
+        // buttons are hidden during a replay, arming needs a long press
+        Column {
+            anchors.left: parent.left
+            anchors.bottom: parent.bottom
+            spacing: 4 * container.scaleRatio
+
+            Text {
+                font.family: "Courier Std"
+                font.pixelSize: 12 * container.scaleRatio
+                color: pfd.command_result < 0 ? "#ffbf00" : pfd.command_result === 0 ? "#00ff00" : "#ff0000"
+                text: pfd.command_text
+            }
+
+            Row {
+                spacing: 4 * container.scaleRatio
+                visible: window.controlsVisible && !pfd.replay_visible
+
+                CommandButton {
+                    text: pfd.arm_disarm ? "DISARM" : "ARM"
+                    onPressAndHold: pfd.arm_disarm ? pfd.disarm() : pfd.arm()
+                }
+
+                ComboBox {
+                    id: modeBox
+                    width: 90 * container.scaleRatio
+                    height: 24 * container.scaleRatio
+                    font.family: "Courier Std"
+                    font.pixelSize: 11 * container.scaleRatio
+                    model: window.modes
+                    displayText: pfd.flightmode !== "" ? pfd.flightmode : "MODE"
+                    onActivated: pfd.set_mode(window.modes[index])
+                    contentItem: Text {
+                        text: modeBox.displayText
+                        font: modeBox.font
+                        color: "#00ff00"
+                        horizontalAlignment: Text.AlignHCenter
+                        verticalAlignment: Text.AlignVCenter
+                    }
+                    background: Rectangle {
+                        color: modeBox.down ? "#606060" : "#303030"
+                        border.color: "#ffffff"
+                        radius: 3
+                    }
+                }
+
+                CommandButton {
+                    text: "WP-"
+                    onClicked: pfd.set_mission_current(Math.max(pfd.mission_seq - 1, 1))
+                }
+
+                CommandButton {
+                    text: "WP+"
+                    onClicked: pfd.set_mission_current(pfd.mission_seq + 1)
+                }
+            }
+        }
+
+        // Terrain along the mission route, highest point in metres MSL
+        Rectangle {
+            anchors.right: parent.right
+            anchors.bottom: parent.bottom
+            width: 130 * container.scaleRatio
+            height: 40 * container.scaleRatio
+            color: "#000000"
+            border.color: "#808080"
+            visible: pfd.terrain_profile.length > 1
+
+            Canvas {
+                id: profileCanvas
+                anchors.fill: parent
+                anchors.margins: 1
+                property var profile: pfd.terrain_profile
+                onProfileChanged: requestPaint()
+                onWidthChanged: requestPaint()
+                onHeightChanged: requestPaint()
+
+                onPaint: {
+                    var ctx = getContext("2d")
+                    ctx.reset()
+                    var n = profile.length
+                    if (n < 2)
+                        return
+                    var length = profile[n - 1][0]
+                    var low = Infinity
+                    var high = -Infinity
+                    for (var i = 0; i < n; i++) {
+                        var h = profile[i][1]
+                        // nan where no tile covers the route
+                        if (h !== h)
+                            continue
+                        low = Math.min(low, h)
+                        high = Math.max(high, h)
+                    }
+                    if (length <= 0 || high < low)
+                        return
+                    var top = high + Math.max((high - low) * 0.2, 10)
+                    var bottom = low - Math.max((high - low) * 0.1, 5)
+                    ctx.fillStyle = "#7a4a00"
+                    ctx.beginPath()
+                    ctx.moveTo(0, height)
+                    for (i = 0; i < n; i++) {
+                        h = profile[i][1]
+                        if (h !== h)
+                            h = bottom
+                        ctx.lineTo(width * profile[i][0] / length, height * (top - h) / (top - bottom))
+                    }
+                    ctx.lineTo(width, height)
+                    ctx.closePath()
+                    ctx.fill()
+                    profileLabel.text = "MAX " + Math.round(high)
+                }
+            }
+
+            Text {
+                id: profileLabel
+                anchors.left: parent.left
+                anchors.top: parent.top
+                anchors.margins: 2 * container.scaleRatio
+                font.family: "Courier Std"
+                font.pixelSize: 9 * container.scaleRatio
+                color: "#ffffff"
+            }
+        }
+
+        // Frame timing percentiles, F8 toggles
+        Rectangle {
+            anchors.left: parent.left
+            anchors.top: parent.top
+            width: statsText.width
+            height: statsText.height
+            color: "#c0000000"
+            visible: frame_stats.overlay
+
+            Text {
+                id: statsText
+                font.family: "Courier Std"
+                font.pixelSize: 10 * container.scaleRatio
+                color: "#ffff00"
+                text: frame_stats.text
+            }
+        }
+
+        // Replay position, speed and pause state
+        Text {
+            anchors.horizontalCenter: parent.horizontalCenter
+            anchors.bottom: parent.bottom
+            font.family: "Courier Std"
+            font.pixelSize: 12 * container.scaleRatio
+            color: "#00ffff"
+            visible: pfd.replay_visible
+            text: "REPLAY " + window.formatTime(pfd.replay_position) + " / " + window.formatTime(pfd.replay_duration) +
+                  " " + pfd.replay_speed + "x" + (pfd.replay_paused ? " PAUSED" : "")
+        }
+    }
+
+    // F8 frame timing overlay, F9 profiles the GUI process
+    // Replay keys: space pauses, left/right scrub 10 s (60 s with shift),
+    // up/down change speed, home goes back to the start
+    Item {
+        focus: true
+        Keys.onPressed: {
+            if (event.key === Qt.Key_F8) {
+                frame_stats.toggle_overlay()
+                event.accepted = true
+                return
+            }
+            if (event.key === Qt.Key_F9) {
+                frame_stats.profile()
+                event.accepted = true
+                return
+            }
+            if (!pfd.replay_visible)
+                return
+            var step = (event.modifiers & Qt.ShiftModifier) ? 60 : 10
+            if (event.key === Qt.Key_Space)
+                pfd.replay_toggle_pause()
+            else if (event.key === Qt.Key_Left)
+                pfd.replay_skip(-step)
+            else if (event.key === Qt.Key_Right)
+                pfd.replay_skip(step)
+            else if (event.key === Qt.Key_Up)
+                pfd.replay_step_speed(1)
+            else if (event.key === Qt.Key_Down)
+                pfd.replay_step_speed(-1)
+            else if (event.key === Qt.Key_Home)
+                pfd.replay_seek(0)
+            else
+                return
+            event.accepted = true
+        }
+    }
+
+    function formatTime(seconds) {
+        var s = Math.floor(seconds)
+        var h = Math.floor(s / 3600)
+        var m = Math.floor(s / 60) % 60
+        s = s % 60
+        return h + ":" + (m < 10 ? "0" + m : m) + ":" + (s < 10 ? "0" + s : s)
     }
 }
\ No newline at end of file
@@ -0,0 +1,152 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''Fixed rate capture of the PFD window.
+
+Ticks follow the wall clock from the start, tick n is at n / rate
+seconds.  A tick takes the window contents only when the scene graph
+swapped a frame since the last one it took, and passes them on only when
+their hash differs from the last frame passed on.  Changed frames go to
+a FrameRing and to a pool of encoder threads writing frame-NNNNNN.png
+(or .jpg); unchanged ticks, ticks the timer missed and frames finding
+the pool full repeat the previous file as a hard link, so the sequence
+keeps one file per tick and plays back at the recording rate.'''
+
+import os
+import time
+import shutil
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5 import QtCore, QtGui
+
+QUEUE_DEPTH = 2 # frames waiting per encoder thread before frames are dropped
+
+class FrameRecorder(QtCore.QObject):
+    '''see the module docstring'''
+    def __init__(self, window, rate, directory=None, fmt='png', quality=-1, workers=2, ring=None, parent=None):
+        QtCore.QObject.__init__(self, parent)
+        self._window = window
+        self._rate = float(rate)
+        self._directory = directory
+        self._format = fmt
+        self._quality = quality
+        self._ring = ring
+        self._pool = None
+        self._room = None
+        if directory is not None:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='encoder')
+            self._room = threading.BoundedSemaphore(workers * QUEUE_DEPTH)
+        self._dirty = True
+        window.frameSwapped.connect(self._frame_swapped, QtCore.Qt.DirectConnection)
+        self._screen = window.screen()
+        self._start = None
+        self._tick = -1
+        self._digest = None
+        self._last = None # (future, path) of the newest encoded frame
+        self.ticks = 0
+        self.taken = 0
+        self.changed = 0
+        self.dropped = 0
+        self._timer = QtCore.QTimer(self, interval=max(int(1000 / self._rate), 1))
+        self._timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self._timer.timeout.connect(self._capture)
+
+    def _frame_swapped(self):
+        self._dirty = True
+
+    def start(self):
+        self._start = time.monotonic()
+        self._timer.start()
+        self._capture()
+
+    def close(self):
+        '''stop capturing and wait for the encoders'''
+        self._timer.stop()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        print("Recorded %u ticks: %u frames taken, %u changed, %u dropped" % (self.ticks, self.taken, self.changed, self.dropped))
+
+    def _path(self, tick):
+        return os.path.join(self._directory, 'frame-%06u.%s' % (tick, self._format))
+
+    def _capture(self):
+        now = time.monotonic()
+        tick = int((now - self._start) * self._rate)
+        if tick <= self._tick:
+            return
+        for missed in range(self._tick + 1, tick):
+            self._repeat(missed)
+        self._tick = tick
+        self.ticks = tick + 1
+        if not self._dirty:
+            self._repeat(tick)
+            return
+        self._dirty = False
+        image = self._screen.grabWindow(self._window.winId()).toImage()
+        if image.format() != QtGui.QImage.Format_RGB32:
+            image = image.convertToFormat(QtGui.QImage.Format_RGB32)
+        if self._ring is not None and (image.width(), image.height()) != (self._ring.width, self._ring.height):
+            # a scaled screen grabs device pixels
+            image = image.scaled(self._ring.width, self._ring.height, QtCore.Qt.IgnoreAspectRatio, QtCore.Qt.SmoothTransformation)
+        self.taken += 1
+        pixels = image.constBits()
+        pixels.setsize(image.sizeInBytes())
+        digest = hashlib.blake2b(pixels, digest_size=16).digest()
+        if digest == self._digest:
+            self._repeat(tick)
+            return
+        self._digest = digest
+        self.changed += 1
+        if self._ring is not None:
+            self._ring.write(pixels, time.time())
+        if self._pool is None:
+            return
+        if not self._room.acquire(blocking=False):
+            self.dropped += 1
+            self._repeat(tick)
+            return
+        path = self._path(tick)
+        future = self._pool.submit(self._encode, image, path)
+        future.add_done_callback(lambda f: self._room.release())
+        self._last = (future, path)
+
+    def _encode(self, image, path):
+        # never write through a hard link left by an earlier recording
+        if os.path.lexists(path):
+            os.remove(path)
+        if not image.save(path, None, self._quality):
+            print("Frame %s not saved" % path)
+
+    def _repeat(self, tick):
+        '''the previous file under the name of tick, once it is written'''
+        if self._pool is None or self._last is None:
+            return
+        (future, source) = self._last
+        target = self._path(tick)
+        future.add_done_callback(lambda f: self._link(source, target))
+
+    def _link(self, source, target):
+        try:
+            if os.path.lexists(target):
+                os.remove(target)
+            os.link(source, target)
+        except OSError:
+            try:
+                shutil.copyfile(source, target)
+            except (IOError, OSError) as e:
+                print("Frame %s not repeated: %s" % (target, str(e)))
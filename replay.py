@@ -0,0 +1,307 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import mmap
+import struct
+import time
+from collections import deque
+
+import numpy as np
+
+from pymavlink.dialects.v20 import ardupilotmega as mavlink
+
+from vehicle import Replay_Control, Replay_Status
+
+# one row per packet: log time in microseconds, offset of the 8 byte
+# timestamp that precedes the packet, packet length and message id
+INDEX_DTYPE = np.dtype([('time', '<u8'), ('offset', '<u8'), ('length', '<u4'), ('msgid', '<u4')])
+INDEX_MAGIC = b'MAVPFDIX'
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct('<8sIIQQQ') # magic, version, reserved, tlog size, tlog mtime_ns, rows
+INDEX_CHUNK = 65536
+
+# state messages: when playback runs ahead only the newest one of each
+# type is delivered, everything else is delivered in log order
+STATE_MSGIDS = np.array([mavlink.MAVLINK_MSG_ID_ATTITUDE,
+                         mavlink.MAVLINK_MSG_ID_VFR_HUD,
+                         mavlink.MAVLINK_MSG_ID_GLOBAL_POSITION_INT,
+                         mavlink.MAVLINK_MSG_ID_NAV_CONTROLLER_OUTPUT,
+                         mavlink.MAVLINK_MSG_ID_GPS_RAW_INT,
+                         mavlink.MAVLINK_MSG_ID_EKF_STATUS_REPORT,
+                         mavlink.MAVLINK_MSG_ID_VIBRATION,
+                         mavlink.MAVLINK_MSG_ID_SYS_STATUS,
+                         mavlink.MAVLINK_MSG_ID_RAW_IMU,
+                         mavlink.MAVLINK_MSG_ID_SCALED_PRESSURE,
+                         mavlink.MAVLINK_MSG_ID_SERVO_OUTPUT_RAW,
+                         mavlink.MAVLINK_MSG_ID_RC_CHANNELS], dtype=np.uint32)
+
+def index_path(path):
+    return path + '.idx'
+
+def scan_tlog(mm, start=0):
+    '''yield (time, offset, length, msgid) for every packet of a tlog'''
+    size = len(mm)
+    pos = start
+    last_time = 0
+    while pos + 16 <= size:
+        stx = mm[pos+8]
+        if stx == mavlink.PROTOCOL_MARKER_V1:
+            length = mm[pos+9] + 8
+            msgid = mm[pos+13]
+        elif stx == mavlink.PROTOCOL_MARKER_V2:
+            if pos + 18 > size:
+                break
+            length = mm[pos+9] + 12
+            if mm[pos+10] & mavlink.MAVLINK_IFLAG_SIGNED:
+                length += mavlink.MAVLINK_SIGNATURE_BLOCK_LEN
+            msgid = mm[pos+15] | (mm[pos+16] << 8) | (mm[pos+17] << 16)
+        else:
+            # lost sync, look for the next packet one byte further
+            pos += 1
+            continue
+        if pos + 8 + length > size:
+            break
+        # keep time monotonic so the index can be bisected
+        last_time = max(last_time, struct.unpack_from('>Q', mm, pos)[0])
+        yield (last_time, pos, length, msgid)
+        pos += 8 + length
+
+def build_index(path, mm):
+    '''scan the tlog once and store the index next to it'''
+    stat = os.stat(path)
+    tmp = index_path(path) + '.tmp'
+    rows = 0
+    with open(tmp, 'wb') as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, 0, 0, 0, 0))
+        chunk = []
+        for row in scan_tlog(mm):
+            chunk.append(row)
+            if len(chunk) == INDEX_CHUNK:
+                np.array(chunk, dtype=INDEX_DTYPE).tofile(f)
+                rows += len(chunk)
+                chunk = []
+        if len(chunk) > 0:
+            np.array(chunk, dtype=INDEX_DTYPE).tofile(f)
+            rows += len(chunk)
+        f.seek(0)
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, 0, stat.st_size, stat.st_mtime_ns, rows))
+    os.replace(tmp, index_path(path))
+
+def load_index(path):
+    '''memory map a stored index, None if missing or stale'''
+    try:
+        stat = os.stat(path)
+        with open(index_path(path), 'rb') as f:
+            header = f.read(INDEX_HEADER.size)
+    except OSError:
+        return None
+    if len(header) != INDEX_HEADER.size:
+        return None
+    magic, version, reserved, size, mtime_ns, rows = INDEX_HEADER.unpack(header)
+    if magic != INDEX_MAGIC or version != INDEX_VERSION:
+        return None
+    if size != stat.st_size or mtime_ns != stat.st_mtime_ns:
+        return None
+    if rows == 0:
+        return np.zeros(0, dtype=INDEX_DTYPE)
+    return np.memmap(index_path(path), dtype=INDEX_DTYPE, mode='r', offset=INDEX_HEADER.size, shape=(rows,))
+
+def open_index(path, mm):
+    index = load_index(path)
+    if index is not None:
+        return index
+    print("Indexing %s" % path)
+    try:
+        build_index(path, mm)
+    except OSError as e:
+        # read only log directory, keep the index in memory for this session
+        print("Index for (%s) not stored: %s" % (path, str(e)))
+        return np.array(list(scan_tlog(mm)), dtype=INDEX_DTYPE)
+    return load_index(path)
+
+class _NullSender():
+    '''swallows everything the link tries to send to a recorded vehicle'''
+    def __getattr__(self, name):
+        if name.endswith('_send'):
+            return self._drop
+        raise AttributeError(name)
+
+    def _drop(self, *args, **kwargs):
+        pass
+
+class Replay():
+    '''tlog playback that stands in for a mavlink connection
+
+    The log is memory mapped and bisected through the index, so seeking is
+    O(log n) no matter how large the file is.  The replay clock runs at
+    speed times wall time; recv_msg() returns the packets that the clock
+    has passed.'''
+    MIN_SPEED = 0.1
+    MAX_SPEED = 50.0
+
+    def __init__(self, path, speed=1.0):
+        self._path = path
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._index = open_index(path, self._mm)
+        self._times = self._index['time']
+        self._parser = mavlink.MAVLink(None)
+        self._parser.robust_parsing = True
+        self._pending = deque()
+        self._cursor = 0
+        if len(self._times) > 0:
+            self._start = int(self._times[0])
+            self._end = int(self._times[-1])
+        else:
+            self._start = self._end = 0
+        self._position = self._start
+        self._anchor = time.time()
+        self._speed = 1.0
+        self._paused = False
+        self.set_speed(speed)
+        self.mav = _NullSender()
+        self.target_system = 0
+        self.target_component = 0
+        self._base_mode = 0
+
+    def close(self):
+        self._pending.clear()
+        self._index = None
+        self._times = None
+        self._mm.close()
+        self._file.close()
+
+    def clock(self):
+        '''current log time in microseconds'''
+        if self._paused:
+            return self._position
+        position = self._position + int((time.time() - self._anchor) * self._speed * 1e6)
+        return min(position, self._end)
+
+    def _reanchor(self, position=None):
+        if position is None:
+            position = self.clock()
+        self._position = min(max(position, self._start), self._end)
+        self._anchor = time.time()
+
+    @property
+    def position(self):
+        '''seconds from the start of the log'''
+        return (self.clock() - self._start) / 1e6
+
+    @property
+    def duration(self):
+        return (self._end - self._start) / 1e6
+
+    @property
+    def speed(self):
+        return self._speed
+
+    @property
+    def paused(self):
+        return self._paused
+
+    def set_speed(self, speed):
+        self._reanchor()
+        self._speed = min(max(speed, Replay.MIN_SPEED), Replay.MAX_SPEED)
+
+    def pause(self):
+        self._reanchor()
+        self._paused = True
+
+    def resume(self):
+        self._reanchor()
+        self._paused = False
+
+    def seek(self, seconds):
+        '''jump to seconds from the start of the log'''
+        self._reanchor(self._start + int(seconds * 1e6))
+        self._cursor = int(np.searchsorted(self._times, self._position, side='left'))
+        self._pending.clear()
+
+    def skip(self, seconds):
+        self.seek(self.position + seconds)
+
+    def control(self, ctrl):
+        '''apply a Replay_Control from the display'''
+        if ctrl.action == Replay_Control.PAUSE:
+            self.pause()
+        elif ctrl.action == Replay_Control.RESUME:
+            self.resume()
+        elif ctrl.action == Replay_Control.SEEK:
+            self.seek(ctrl.value)
+        elif ctrl.action == Replay_Control.SKIP:
+            self.skip(ctrl.value)
+        elif ctrl.action == Replay_Control.SPEED:
+            self.set_speed(ctrl.value)
+
+    def status(self):
+        return Replay_Status(self.position, self.duration, self._speed, self._paused)
+
+    def _advance(self):
+        '''queue the packets the clock has passed, newest state only'''
+        end = int(np.searchsorted(self._times, self.clock(), side='right'))
+        if end <= self._cursor:
+            return
+        rows = np.arange(self._cursor, end)
+        if end - self._cursor > 1:
+            msgids = self._index['msgid'][self._cursor:end]
+            keep = ~np.isin(msgids, STATE_MSGIDS)
+            # newest row of every message id, found on the reversed slice
+            ids, last = np.unique(msgids[::-1], return_index=True)
+            last = len(rows) - 1 - last[np.isin(ids, STATE_MSGIDS)]
+            keep[last] = True
+            rows = rows[keep]
+        self._pending.extend(rows.tolist())
+        self._cursor = end
+
+    def _decode(self, row):
+        entry = self._index[row]
+        offset = int(entry['offset'])
+        try:
+            m = self._parser.decode(bytearray(self._mm[offset+8:offset+8+int(entry['length'])]))
+        except mavlink.MAVError:
+            return None
+        m._timestamp = int(entry['time']) / 1e6
+        return m
+
+    def _post(self, m):
+        if m.get_type() == 'HEARTBEAT' and m.type != mavlink.MAV_TYPE_GCS:
+            self.target_system = m.get_srcSystem()
+            self.target_component = m.get_srcComponent()
+            self._base_mode = m.base_mode
+
+    def recv_msg(self):
+        '''next message the replay clock has passed, or None'''
+        if len(self._pending) == 0:
+            self._advance()
+        while len(self._pending) > 0:
+            m = self._decode(self._pending.popleft())
+            if m is None or m.get_type() == 'BAD_DATA':
+                continue
+            if m.get_type() == 'HEARTBEAT' and m.type == mavlink.MAV_TYPE_GCS:
+                # the recording ground station, not the vehicle
+                continue
+            self._post(m)
+            return m
+        return None
+
+    def motors_armed(self):
+        return self._base_mode & mavlink.MAV_MODE_FLAG_SAFETY_ARMED
+
+    def waypoint_request_list_send(self):
+        pass
+
+    def waypoint_request_send(self, seq):
+        pass
@@ -0,0 +1,175 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import math
+import mmap
+import struct
+from collections import OrderedDict
+
+import numpy as np
+
+HGT_VOID = -32768
+EARTH_RADIUS = 6378137.0
+
+def tile_name(lat, lon):
+    '''SRTM name of the 1 degree tile whose south west corner is lat, lon'''
+    return '%s%02u%s%03u.hgt' % ('N' if lat >= 0 else 'S', abs(lat), 'E' if lon >= 0 else 'W', abs(lon))
+
+class TerrainTile():
+    '''one memory mapped HGT tile, rows run north to south'''
+    def __init__(self, path, lat, lon):
+        self._file = open(path, 'rb')
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            self.samples = int(round(math.sqrt(size / 2)))
+            if self.samples * self.samples * 2 != size or self.samples < 2:
+                raise ValueError("%s is not a square HGT tile" % path)
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        self.lat = lat
+        self.lon = lon
+        self._scale = self.samples - 1
+        self._sample = struct.Struct('>h')
+
+    def close(self):
+        try:
+            self._mm.close()
+        except BufferError:
+            # a lookup still holds a view, the map goes with it
+            pass
+        self._file.close()
+
+    def _height(self, row, col):
+        h = self._sample.unpack_from(self._mm, (row * self.samples + col) * 2)[0]
+        return float('nan') if h == HGT_VOID else float(h)
+
+    def elevation(self, lat, lon):
+        fx = (lon - self.lon) * self._scale
+        fy = (self.lat + 1 - lat) * self._scale
+        col = min(max(int(fx), 0), self._scale - 1)
+        row = min(max(int(fy), 0), self._scale - 1)
+        dx = fx - col
+        dy = fy - row
+        return (self._height(row, col) * (1 - dx) * (1 - dy) +
+                self._height(row, col + 1) * dx * (1 - dy) +
+                self._height(row + 1, col) * (1 - dx) * dy +
+                self._height(row + 1, col + 1) * dx * dy)
+
+    def elevations(self, lats, lons):
+        data = np.frombuffer(self._mm, dtype='>i2').reshape(self.samples, self.samples)
+        fx = (lons - self.lon) * self._scale
+        fy = (self.lat + 1 - lats) * self._scale
+        col = np.clip(np.floor(fx).astype(np.intp), 0, self._scale - 1)
+        row = np.clip(np.floor(fy).astype(np.intp), 0, self._scale - 1)
+        dx = fx - col
+        dy = fy - row
+        h = [data[row + r, col + c].astype(np.float64) for r, c in ((0, 0), (0, 1), (1, 0), (1, 1))]
+        for a in h:
+            a[a == HGT_VOID] = np.nan
+        ret = h[0] * (1 - dx) * (1 - dy) + h[1] * dx * (1 - dy) + h[2] * (1 - dx) * dy + h[3] * dx * dy
+        del data
+        return ret
+
+class Terrain():
+    '''SRTM/HGT terrain heights from a local directory
+
+    Tiles are memory mapped on first use and kept in an LRU of at most
+    max_tiles, so resident memory is bounded by what the OS pages in for
+    those tiles.  Heights are bilinear between the four surrounding
+    samples, nan where no tile or a void covers the point.'''
+    def __init__(self, directory, max_tiles=16):
+        self._directory = directory
+        self._max_tiles = max(1, max_tiles)
+        self._tiles = OrderedDict()
+
+    def close(self):
+        for tile in self._tiles.values():
+            if tile is not None:
+                tile.close()
+        self._tiles.clear()
+
+    def tile(self, lat, lon):
+        '''tile with south west corner lat, lon (integers), None if missing'''
+        key = (lat, lon)
+        if key in self._tiles:
+            self._tiles.move_to_end(key)
+            return self._tiles[key]
+        tile = None
+        name = tile_name(lat, lon)
+        for candidate in (name, name.lower()):
+            path = os.path.join(self._directory, candidate)
+            if os.path.exists(path):
+                try:
+                    tile = TerrainTile(path, lat, lon)
+                except (OSError, ValueError) as e:
+                    print("Terrain tile (%s) unusable: %s" % (path, str(e)))
+                break
+        # missing tiles are cached too, so they are not looked up every tick
+        self._tiles[key] = tile
+        while len(self._tiles) > self._max_tiles:
+            old_key, old = self._tiles.popitem(last=False)
+            if old is not None:
+                old.close()
+        return tile
+
+    def elevation(self, lat, lon):
+        '''terrain height above MSL in metres at one point'''
+        tile = self.tile(int(math.floor(lat)), int(math.floor(lon)))
+        if tile is None:
+            return float('nan')
+        return tile.elevation(lat, lon)
+
+    def elevations(self, lats, lons):
+        '''terrain heights for arrays of points, one pass per tile touched'''
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        ret = np.full(lats.shape, np.nan)
+        tile_lat = np.floor(lats).astype(np.int64)
+        tile_lon = np.floor(lons).astype(np.int64)
+        keys = tile_lat * 1000 + tile_lon
+        for key in np.unique(keys):
+            sel = keys == key
+            tile = self.tile(int(tile_lat[sel][0]), int(tile_lon[sel][0]))
+            if tile is not None:
+                ret[sel] = tile.elevations(lats[sel], lons[sel])
+        return ret
+
+    def route_profile(self, points, spacing=30.0):
+        '''(distance, height) arrays along the legs joining (lat, lon) points'''
+        lats = []
+        lons = []
+        dists = []
+        total = 0.0
+        for (lat0, lon0), (lat1, lon1) in zip(points[:-1], points[1:]):
+            # equirectangular is plenty for legs of a few kilometres
+            north = math.radians(lat1 - lat0) * EARTH_RADIUS
+            east = math.radians(lon1 - lon0) * EARTH_RADIUS * math.cos(math.radians((lat0 + lat1) / 2))
+            length = math.hypot(north, east)
+            n = max(1, int(math.ceil(length / spacing)))
+            f = np.arange(n) / float(n)
+            lats.append(lat0 + (lat1 - lat0) * f)
+            lons.append(lon0 + (lon1 - lon0) * f)
+            dists.append(total + length * f)
+            total += length
+        if len(points) > 0:
+            lats.append(np.array([points[-1][0]]))
+            lons.append(np.array([points[-1][1]]))
+            dists.append(np.array([total]))
+        if len(lats) == 0:
+            return (np.zeros(0), np.zeros(0))
+        lats = np.concatenate(lats)
+        lons = np.concatenate(lons)
+        return (np.concatenate(dists), self.elevations(lats, lons))
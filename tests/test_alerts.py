@@ -0,0 +1,81 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+
+from alerts import AlertRules, AlertEngine, RuleError
+from vehicle import Param_Value
+
+def engine(rules, constants=None, params=()):
+    return AlertEngine(AlertRules.from_config({'rules': rules, 'constants': constants or {}}, params))
+
+def feed(e, signal, value, now):
+    transitions = []
+    e.update(signal, value, now, transitions)
+    return [(a.name, a.active) for a in transitions]
+
+def test_raise_and_clear():
+    e = engine([{'name': 'LOW', 'when': 'airspeed < 10'}])
+    assert feed(e, 'airspeed', 12, 0.0) == []
+    assert feed(e, 'airspeed', 9, 1.0) == [('LOW', True)]
+    assert feed(e, 'airspeed', 8, 2.0) == []
+    assert feed(e, 'airspeed', 11, 3.0) == [('LOW', False)]
+
+def test_hysteresis():
+    e = engine([{'name': 'LOW', 'when': 'airspeed < 10', 'hysteresis': 2}])
+    assert feed(e, 'airspeed', 9, 0.0) == [('LOW', True)]
+    # active: clears only above 10 + 2
+    assert feed(e, 'airspeed', 11, 1.0) == []
+    assert feed(e, 'airspeed', 12.5, 2.0) == [('LOW', False)]
+    # inactive again: the plain threshold applies
+    assert feed(e, 'airspeed', 11, 3.0) == []
+
+def test_for_and_clear_delays():
+    e = engine([{'name': 'LOW', 'when': 'airspeed < 10', 'for': 2, 'clear': 1}])
+    assert feed(e, 'airspeed', 9, 0.0) == []
+    assert feed(e, 'airspeed', 9, 1.0) == []
+    # raised by the tick once the condition held for 2 s without new samples
+    assert [(a.name, a.active) for a in e.tick(2.0)] == [('LOW', True)]
+    assert feed(e, 'airspeed', 11, 3.0) == []
+    assert [(a.name, a.active) for a in e.tick(4.0)] == [('LOW', False)]
+
+def test_a_blip_shorter_than_the_delay_never_raises():
+    e = engine([{'name': 'LOW', 'when': 'airspeed < 10', 'for': 2}])
+    feed(e, 'airspeed', 9, 0.0)
+    assert feed(e, 'airspeed', 11, 1.0) == []
+    assert e.tick(5.0) == []
+
+def test_constants_params_and_offsets():
+    e = engine([{'name': 'STALL', 'when': 'airspeed < ARSPD_FBW_MIN + 3 and alt > floor'}],
+               {'floor': 5}, ['ARSPD_FBW_MIN'])
+    feed(e, 'alt', 50, 0.0)
+    # unknown parameter value: nan never alerts
+    assert feed(e, 'airspeed', 1, 0.0) == []
+    assert [(a.name, a.active) for a in e.update_record(Param_Value('ARSPD_FBW_MIN', 10.0), 1.0)] == [('STALL', True)]
+
+def test_unknown_identifier_is_rejected():
+    with pytest.raises(RuleError, match="airspd"):
+        AlertRules.from_config({'rules': [{'name': 'x', 'when': 'airspd < 10'}]})
+    with pytest.raises(RuleError, match="ARSPD_FBW_MIN"):
+        AlertRules.from_config({'rules': [{'name': 'x', 'when': 'airspeed < ARSPD_FBW_MIN'}]})
+
+def test_duplicate_names_are_rejected():
+    with pytest.raises(RuleError, match="duplicate"):
+        AlertRules.from_config({'rules': [{'name': 'x', 'when': 'airspeed < 10'},
+                                          {'name': 'x', 'when': 'alt < 10'}]})
+
+def test_bad_numbers_are_rule_errors():
+    with pytest.raises(RuleError, match="offset"):
+        AlertRules.from_config({'rules': [{'name': 'x', 'when': 'airspeed < 10 + fast'}]})
+    with pytest.raises(RuleError, match="for"):
+        AlertRules.from_config({'rules': [{'name': 'x', 'when': 'airspeed < 10', 'for': 'soon'}]})
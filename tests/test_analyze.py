@@ -0,0 +1,131 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import csv
+import sys
+
+import pytest
+
+pytest.importorskip('pymavlink')
+
+from pymavlink.dialects.v20 import ardupilotmega as mavlink
+
+import analyze
+from analyze import find_tlogs, analyze_file, StateTimer, FLIGHT_COLUMNS, MODE_COLUMNS
+from test_replay import write_tlog, START
+
+FBWA = 5
+AUTO = 10
+EKF_GOOD = 0x2f # attitude, velocities, relative horizontal and absolute vertical position
+
+def flight(mav, i):
+    '''4 s of a plane at 10 Hz, see test_analyze_file for what happens'''
+    if i % 4 == 0:
+        base_mode = mavlink.MAV_MODE_FLAG_CUSTOM_MODE_ENABLED
+        if i >= 8:
+            base_mode |= mavlink.MAV_MODE_FLAG_SAFETY_ARMED
+        m = mavlink.MAVLink_heartbeat_message(mavlink.MAV_TYPE_FIXED_WING, mavlink.MAV_AUTOPILOT_ARDUPILOTMEGA,
+                                              base_mode, FBWA if i < 20 else AUTO, mavlink.MAV_STATE_ACTIVE, 3)
+    elif i % 4 == 1:
+        level = 0.5 if 13 <= i <= 21 else 0.7 if i == 29 else 0.1
+        m = mavlink.MAVLink_vibration_message(i, level, 0.1, 0.1, 0, 0, 0)
+    elif i % 4 == 2:
+        flags = EKF_GOOD | (0x80 if 22 <= i <= 30 else 0)
+        m = mavlink.MAVLink_ekf_status_report_message(flags, 0, 0, 0, 0, 0)
+    else:
+        fix = 1 if i < 8 else 3
+        m = mavlink.MAVLink_gps_raw_int_message(i, fix, 0, 0, 0, 100, 100, 0, 0, 10)
+    return m.pack(mav)
+
+def test_state_timer():
+    timer = StateTimer()
+    timer.update(0.0, 'a')
+    timer.update(1.0, 'a')
+    timer.update(2.5, 'b')
+    timer.update(3.0, 'a')
+    timer.finish(4.0)
+    assert timer.duration('a') == pytest.approx(3.5)
+    assert timer.duration('b') == pytest.approx(0.5)
+    assert timer.entries == {'a': 2, 'b': 1}
+    assert timer.duration('c') == 0.0
+
+def test_analyze_file(tmp_path):
+    path = str(tmp_path / 'flight.tlog')
+    write_tlog(path, 40, make=flight)
+    (row, modes) = analyze_file(path)
+    expected = {'file': 'flight.tlog', 'start_time': START / 1e6, 'duration_s': 3.9, 'messages': 40,
+                # healthy from 0.2 s, const pos 2.2 - 3.4 s, healthy again to the end
+                'ekf_unhealthy_s': 0.0, 'ekf_const_pos_s': 1.2, 'ekf_healthy_s': 2.5,
+                # one exceedance of each level: 1.3 - 2.5 s and 2.9 - 3.3 s
+                'vibration_1_s': 1.2, 'vibration_2_s': 0.4, 'vibration_1_events': 1, 'vibration_2_events': 1,
+                # no fix until 1.1 s
+                'gps_no_fix_s': 0.8, 'gps_2d_s': 0.0, 'gps_3d_s': 2.8,
+                'armed_s': 3.1, 'mode_changes': 1}
+    assert set(row) == set(FLIGHT_COLUMNS)
+    for column, value in expected.items():
+        assert row[column] == pytest.approx(value), column
+    assert [(m[0], m[3]) for m in modes] == [('flight.tlog', 'FBWA'), ('flight.tlog', 'AUTO')]
+    assert [m[2] for m in modes] == pytest.approx([0.0, 2.0])
+
+def test_empty_log(tmp_path):
+    path = tmp_path / 'empty.tlog'
+    path.write_bytes(b'')
+    assert analyze_file(str(path)) == (None, [])
+
+def run_main(monkeypatch, args):
+    monkeypatch.setattr(sys, 'argv', ['analyze.py', '-j', '1'] + args)
+    analyze.main()
+
+def read_csv(path):
+    with open(path, newline='') as f:
+        return list(csv.reader(f))
+
+def test_csv_output(tmp_path, monkeypatch):
+    write_tlog(str(tmp_path / 'flight.tlog'), 40, make=flight)
+    out = str(tmp_path / 'out')
+    run_main(monkeypatch, ['-o', out, '-f', 'csv', str(tmp_path / 'flight.tlog')])
+    (row, modes) = analyze_file(str(tmp_path / 'flight.tlog'))
+    flights = read_csv(os.path.join(out, 'flights.csv'))
+    assert flights == [FLIGHT_COLUMNS, [str(row[c]) for c in FLIGHT_COLUMNS]]
+    assert read_csv(os.path.join(out, 'modes.csv')) == [MODE_COLUMNS] + [[str(v) for v in m] for m in modes]
+
+def test_parquet_matches_csv(tmp_path, monkeypatch):
+    write_tlog(str(tmp_path / 'flight.tlog'), 40, make=flight)
+    csv_out = str(tmp_path / 'csv')
+    run_main(monkeypatch, ['-o', csv_out, '-f', 'csv', str(tmp_path / 'flight.tlog')])
+    parquet_out = str(tmp_path / 'parquet')
+    run_main(monkeypatch, ['-o', parquet_out, '-f', 'parquet', str(tmp_path / 'flight.tlog')])
+    try:
+        import pyarrow.parquet
+    except ImportError:
+        # without pyarrow the parquet request falls back to the same csv
+        for name in ('flights.csv', 'modes.csv'):
+            assert read_csv(os.path.join(parquet_out, name)) == read_csv(os.path.join(csv_out, name))
+        return
+    for name, columns in (('flights', FLIGHT_COLUMNS), ('modes', MODE_COLUMNS)):
+        table = pyarrow.parquet.read_table(os.path.join(parquet_out, name + '.parquet')).to_pydict()
+        rows = read_csv(os.path.join(csv_out, name + '.csv'))
+        assert rows[0] == columns
+        assert [[str(table[c][i]) for c in columns] for i in range(len(rows) - 1)] == rows[1:]
+
+def test_find_tlogs_skips_missing_paths(tmp_path, capsys):
+    small = tmp_path / 'logs' / 'small.tlog'
+    big = tmp_path / 'big.tlog'
+    small.parent.mkdir()
+    small.write_bytes(b'x' * 10)
+    big.write_bytes(b'x' * 100)
+    (tmp_path / 'logs' / 'notes.txt').write_text('not a log')
+    missing = str(tmp_path / 'missing.tlog')
+    assert find_tlogs([str(tmp_path / 'logs'), missing, str(big)]) == [str(big), str(small)]
+    assert 'missing.tlog' in capsys.readouterr().out
@@ -0,0 +1,102 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+
+pytest.importorskip('pymavlink')
+
+from pymavlink.dialects.v20 import ardupilotmega as mavlink
+
+from commands import CommandQueue
+from vehicle import Command_Result
+
+ARM = mavlink.MAV_CMD_COMPONENT_ARM_DISARM
+SET_MODE = mavlink.MAV_CMD_DO_SET_MODE
+OURS = (255, 0)
+VEHICLE = (1, 1)
+
+def ack(command, result, src=VEHICLE, target=OURS):
+    m = mavlink.MAVLink_command_ack_message(command, result, 0, 0, target[0], target[1])
+    # packing fills in the header the source ids are read from
+    m.pack(mavlink.MAVLink(None, srcSystem=src[0], srcComponent=src[1]))
+    return m
+
+def results(rs):
+    return [(r.request_id, r.command, r.result) for r in rs]
+
+def test_accepted():
+    q = CommandQueue()
+    sent = []
+    q.submit(1, SET_MODE, (1, 10))
+    q.poll(0.0, sent.append)
+    assert len(sent) == 1 and sent[0].params == (1.0, 10.0, 0, 0, 0, 0, 0)
+    assert results(q.handle_ack(ack(SET_MODE, mavlink.MAV_RESULT_ACCEPTED), 0.1, OURS, VEHICLE)) == [(1, SET_MODE, Command_Result.ACCEPTED)]
+    assert len(q) == 0
+
+def test_retries_then_timeout():
+    q = CommandQueue()
+    confirmations = []
+    send = lambda p: confirmations.append(p.confirmation)
+    q.submit(1, SET_MODE, (1, 10))
+    q.poll(0.0, send)
+    for i in range(CommandQueue.RETRIES):
+        assert q.poll(0.5 + i, send) == []
+        q.poll(1.0 + i, send)
+    assert confirmations == list(range(CommandQueue.RETRIES + 1))
+    assert results(q.poll(10.0, send)) == [(1, SET_MODE, Command_Result.TIMEOUT)]
+
+def test_in_progress_extends_the_wait():
+    q = CommandQueue()
+    sent = []
+    q.submit(1, ARM, (1,))
+    q.poll(0.0, sent.append)
+    assert q.handle_ack(ack(ARM, mavlink.MAV_RESULT_IN_PROGRESS), 1.5, OURS, VEHICLE) == []
+    # a full timeout from the IN_PROGRESS, not from the send
+    q.poll(3.0, sent.append)
+    assert len(sent) == 1
+    q.poll(3.6, sent.append)
+    assert len(sent) == 2
+    assert results(q.handle_ack(ack(ARM, mavlink.MAV_RESULT_DENIED), 4.0, OURS, VEHICLE)) == [(1, ARM, Command_Result.DENIED)]
+
+def test_same_command_waits_and_equal_requests_join():
+    q = CommandQueue()
+    sent = []
+    q.submit(1, ARM, (1,))
+    q.submit(2, ARM, (1,))
+    q.submit(3, ARM, (0,))
+    q.poll(0.0, sent.append)
+    assert len(sent) == 1
+    assert sorted(r[0] for r in results(q.handle_ack(ack(ARM, 0), 0.1, OURS, VEHICLE))) == [1, 2]
+    q.poll(0.2, sent.append)
+    assert sent[-1].params[0] == 0.0
+
+def test_acks_for_someone_else_are_ignored():
+    q = CommandQueue()
+    q.submit(1, ARM, (1,))
+    q.poll(0.0, lambda p: None)
+    # another ground station, another vehicle, another component
+    assert q.handle_ack(ack(ARM, 0, target=(254, 0)), 0.1, OURS, VEHICLE) == []
+    assert q.handle_ack(ack(ARM, 0, src=(2, 1)), 0.1, OURS, VEHICLE) == []
+    assert q.handle_ack(ack(ARM, 0, src=(1, 100)), 0.1, OURS, VEHICLE) == []
+    assert len(q) == 1
+    # autopilots without target fields send 0
+    assert len(q.handle_ack(ack(ARM, 0, target=(0, 0)), 0.1, OURS, VEHICLE)) == 1
+
+def test_cancel():
+    q = CommandQueue()
+    q.submit(1, ARM, (1,))
+    q.submit(2, SET_MODE, (1, 10))
+    q.poll(0.0, lambda p: None)
+    q.submit(3, ARM, (0,))
+    assert sorted(r[0] for r in results(q.cancel())) == [1, 2, 3]
+    assert len(q) == 0
@@ -0,0 +1,230 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+import threading
+
+import pytest
+
+pytest.importorskip('pymavlink')
+
+from pymavlink.dialects.v20 import ardupilotmega as mavlink
+
+import link as link_module
+from link import Link, Connection
+from alerts import AlertRules, AlertEngine
+from params import ParamCache
+from traffic import TrafficTable, TrafficMonitor
+from vehicle import Command_Result, Alert
+
+TIMEOUT = 10.0
+
+class Mav():
+    '''stands in for a mavutil connection'''
+    def __init__(self, messages=()):
+        self.closed = False
+        self.messages = list(messages)
+        self.target_system = 1
+        self.target_component = 1
+        self.source_system = 255
+        self.source_component = 0
+        self.mav = self
+
+    def close(self):
+        self.closed = True
+
+    def recv_msg(self):
+        return self.messages.pop(0) if len(self.messages) > 0 else None
+
+    def motors_armed(self):
+        return 0
+
+    def request_data_stream_send(self, *args):
+        pass
+
+    def command_long_send(self, *args):
+        pass
+
+    def param_request_read_send(self, *args):
+        pass
+
+    def param_request_list_send(self, *args):
+        pass
+
+class Stub(Connection):
+    '''a connection whose open is controlled by the test'''
+    def __init__(self, fail=False, block=False):
+        Connection.__init__(self, 'stub')
+        self.fail = fail
+        self.release = threading.Event()
+        if not block:
+            self.release.set()
+        self.opened = []
+
+    def connect(self):
+        self.release.wait()
+        if self.fail:
+            raise IOError("no such port")
+        mav = Mav()
+        self.opened.append(mav)
+        return mav
+
+def settle(conn):
+    '''wait for the opener thread to finish'''
+    opener = conn._opener
+    deadline = time.time() + 5.0
+    while opener is not None and not opener.done and not opener._abandoned:
+        assert time.time() < deadline
+        time.sleep(0.001)
+
+def wait_for(condition):
+    deadline = time.time() + 5.0
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.001)
+
+def open_connection(conn, now=0.0):
+    conn.maintain(now, TIMEOUT)
+    settle(conn)
+    conn.maintain(now, TIMEOUT)
+    assert conn.active
+
+def test_failed_opens_back_off_with_jitter():
+    conn = Stub(fail=True)
+    now = 0.0
+    for backoff in (1, 2, 4, 8, 16, 30, 30):
+        conn.maintain(now, TIMEOUT)
+        assert conn._state == Connection.OPENING
+        settle(conn)
+        conn.maintain(now, TIMEOUT)
+        assert conn._state == Connection.CLOSED
+        wait = conn._next_attempt - now
+        assert backoff * 0.75 <= wait <= backoff * 1.25
+        # nothing happens before the next attempt is due
+        conn.maintain(now + wait * 0.99, TIMEOUT)
+        assert conn._state == Connection.CLOSED
+        now = conn._next_attempt
+
+def test_a_hanging_open_is_abandoned():
+    conn = Stub(block=True)
+    conn.maintain(0.0, TIMEOUT)
+    opener = conn._opener
+    conn.maintain(Connection.OPEN_TIMEOUT - 1, TIMEOUT)
+    assert conn._state == Connection.OPENING
+    conn.maintain(Connection.OPEN_TIMEOUT + 1, TIMEOUT)
+    assert conn._state == Connection.CLOSED and conn._opener is None
+    # the open finishing late is closed by the opener, not used
+    conn.release.set()
+    wait_for(lambda: len(conn.opened) == 1 and conn.opened[0].closed)
+    assert opener.result is None and not conn.active
+
+def test_close_while_opening_does_not_leak():
+    conn = Stub(block=True)
+    conn.maintain(0.0, TIMEOUT)
+    conn.close(1.0)
+    assert conn._state == Connection.CLOSED and conn._opener is None
+    conn.release.set()
+    wait_for(lambda: len(conn.opened) == 1 and conn.opened[0].closed)
+
+def test_lost_heartbeat_closes_and_reconnects():
+    conn = Stub()
+    open_connection(conn, 0.0)
+    mav = conn._mav
+    conn.heartbeat(5.0)
+    conn.maintain(5.0 + TIMEOUT - 1, TIMEOUT)
+    assert conn.active
+    conn.maintain(5.0 + TIMEOUT + 1, TIMEOUT)
+    assert not conn.active and mav.closed
+    assert conn._next_attempt > 5.0 + TIMEOUT + 1
+    conn.maintain(conn._next_attempt, TIMEOUT)
+    assert conn._state == Connection.OPENING
+    settle(conn)
+
+def test_heartbeat_resets_the_backoff():
+    conn = Stub(fail=True)
+    now = 0.0
+    for i in range(4):
+        conn.maintain(now, TIMEOUT)
+        settle(conn)
+        conn.maintain(now, TIMEOUT)
+        now = conn._next_attempt
+    assert conn._backoff == 16
+    conn.fail = False
+    open_connection(conn, now)
+    conn.heartbeat(now + 1)
+    assert conn._backoff == Connection.BACKOFF_MIN
+    conn.maintain(now + 2 + TIMEOUT, TIMEOUT)
+    assert Connection.BACKOFF_MIN * 0.75 <= conn._next_attempt - (now + 2 + TIMEOUT) <= Connection.BACKOFF_MIN * 1.25
+
+def test_pending_commands_are_cancelled_on_close():
+    conn = Stub()
+    open_connection(conn)
+    conn._commands.submit(7, mavlink.MAV_CMD_COMPONENT_ARM_DISARM, (1,))
+    conn.close(1.0)
+    assert len(conn._commands) == 0
+    results = [(r.request_id, r.result) for r in conn._msglist if isinstance(r, Command_Result)]
+    assert results == [(7, Command_Result.NO_LINK)]
+
+def heartbeat(mav_type, src):
+    m = mavlink.MAVLink_heartbeat_message(mav_type, mavlink.MAV_AUTOPILOT_ARDUPILOTMEGA, 0, 0, mavlink.MAV_STATE_ACTIVE, 3)
+    m.pack(mavlink.MAVLink(None, srcSystem=src[0], srcComponent=src[1]))
+    return m
+
+def link_with(conn):
+    link = Link([], None)
+    conn._alerts = AlertEngine(AlertRules.from_config(None))
+    conn._params = ParamCache(None, [])
+    conn._traffic = TrafficMonitor(TrafficTable())
+    link._conns = [conn]
+    return link
+
+def test_only_vehicle_heartbeats_count_as_liveness():
+    conn = Stub()
+    open_connection(conn)
+    link = link_with(conn)
+    conn._mav.messages.append(heartbeat(mavlink.MAV_TYPE_GCS, (255, 190)))
+    link.handle_messages()
+    assert conn._last_heartbeat == 0
+    conn._mav.messages.append(heartbeat(mavlink.MAV_TYPE_FIXED_WING, (1, 1)))
+    link.handle_messages()
+    assert conn._last_heartbeat > 0
+
+class Clock():
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        pass
+
+def vfr_hud(airspeed, t):
+    m = mavlink.MAVLink_vfr_hud_message(airspeed, airspeed, 0, 0, 100, 0)
+    m.pack(mavlink.MAVLink(None, srcSystem=1, srcComponent=1))
+    m._timestamp = t
+    return m
+
+def test_alert_delays_run_on_sample_time(monkeypatch):
+    conn = Stub()
+    open_connection(conn)
+    link = link_with(conn)
+    conn._alerts = AlertEngine(AlertRules.from_config({'rules': [{'name': 'LOW', 'when': 'airspeed < 10', 'for': 3}]}))
+    clock = Clock(1000.0)
+    monkeypatch.setattr(link_module, 'time', clock)
+    # four seconds of log replayed at 5x: under a second of wall time
+    for i in range(5):
+        conn._mav.messages.append(vfr_hud(5, 100.0 + i))
+        link.handle_messages()
+        clock.now += 0.2
+    assert [(a.name, a.active) for a in conn._msglist if isinstance(a, Alert)] == [('LOW', True)]
@@ -0,0 +1,93 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+import numpy as np
+import pytest
+
+import frame_ring
+from frame_ring import FrameRing, FrameReader
+
+WIDTH = 6
+HEIGHT = 4
+STRIDE = 32 # 8 bytes of row padding
+
+@pytest.fixture
+def ring(request):
+    name = 'mavpfd-test-%u-%s' % (os.getpid(), request.node.name)
+    ring = FrameRing(name, WIDTH, HEIGHT, STRIDE, slots=3)
+    reader = FrameReader(name)
+    yield (ring, reader)
+    reader.close()
+    ring.close()
+
+def pixels(value):
+    return np.full(STRIDE * HEIGHT, value, dtype=np.uint8)
+
+def test_header_and_padding(ring):
+    (ring, reader) = ring
+    assert (reader.width, reader.height, reader.stride, reader.slots) == (WIDTH, HEIGHT, STRIDE, 3)
+    assert reader.count == 0 and reader.latest() is None
+    p = pixels(0)
+    p.reshape(HEIGHT, STRIDE)[:, WIDTH * 4:] = 255
+    ring.write(p, 12.5)
+    (number, t, image) = reader.latest()
+    assert (number, t) == (1, 12.5)
+    # the row padding is cut off
+    assert image.shape == (HEIGHT, WIDTH, 4) and not image.any()
+
+def test_overwritten_frames_are_gone(ring):
+    (ring, reader) = ring
+    for i in range(1, 6):
+        ring.write(pixels(i), float(i))
+    assert reader.count == 5
+    assert reader.frame(1) is None and reader.frame(2) is None
+    for i in (3, 4, 5):
+        (t, image) = reader.frame(i)
+        assert t == float(i) and (image == i).all()
+
+def test_a_frame_being_written_is_not_read(ring):
+    (ring, reader) = ring
+    ring.write(pixels(1), 1.0)
+    # the writer zeroes the slot number before copying the pixels
+    offset = frame_ring.HEADER.size
+    frame_ring.SLOT_HEADER.pack_into(ring._shm.buf, offset, 0, 0.0)
+    assert reader.frame(1) is None
+
+def test_a_frame_overwritten_during_the_copy_is_torn(ring, monkeypatch):
+    (ring, reader) = ring
+    ring.write(pixels(1), 1.0)
+    frombuffer = np.frombuffer
+    def copy_while_writing(buf, dtype):
+        data = frombuffer(buf, dtype=dtype)
+        # the writer laps the ring while the reader copies frame 1
+        for i in range(2, 5):
+            ring.write(pixels(i), float(i))
+        return data
+    monkeypatch.setattr(frame_ring.np, 'frombuffer', copy_while_writing)
+    assert reader.frame(1) is None
+    monkeypatch.undo()
+    (number, t, image) = reader.latest()
+    assert number == 4 and (image == 4).all()
+
+def test_reader_rejects_other_segments():
+    from multiprocessing import shared_memory
+    name = 'mavpfd-test-%u-other' % os.getpid()
+    shm = shared_memory.SharedMemory(name, create=True, size=frame_ring.HEADER.size)
+    try:
+        with pytest.raises(ValueError):
+            FrameReader(name)
+    finally:
+        shm.close()
+        shm.unlink()
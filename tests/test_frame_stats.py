@@ -0,0 +1,99 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import math
+
+import pytest
+
+pytest.importorskip('PyQt5')
+
+from PyQt5 import QtCore, QtGui, QtQuick
+
+from frame_stats import FrameStats
+
+@pytest.fixture(scope='module')
+def app():
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    return QtGui.QGuiApplication.instance() or QtGui.QGuiApplication([])
+
+class Status(QtCore.QObject):
+    '''a Vehicle_Status in miniature'''
+    alt_changed = QtCore.pyqtSignal(float)
+
+    def __init__(self):
+        QtCore.QObject.__init__(self)
+        self.slot_timer = None
+
+    def set_slot_timer(self, timer):
+        self.slot_timer = timer
+
+def scene(app):
+    stats = FrameStats()
+    window = QtQuick.QQuickWindow()
+    stats.set_window(window)
+    status = Status()
+    stats.time_slots(status)
+    stats.count_signals(status)
+    source = Status()
+    calls = []
+    stats.connect_timed(source.alt_changed, 'ingest', lambda: calls.append(1))
+    return (stats, window, status, source, calls)
+
+def test_nothing_is_hooked_until_attached(app):
+    (stats, window, status, source, calls) = scene(app)
+    status.alt_changed.emit(1.0)
+    source.alt_changed.emit(1.0)
+    assert calls == [1]
+    assert status.slot_timer is None
+    assert stats._signals == 0
+    assert math.isnan(stats.percentiles('ingest')[3])
+
+def test_attach_and_detach(app):
+    (stats, window, status, source, calls) = scene(app)
+    stats.attach()
+    assert status.slot_timer == stats.add_python
+    status.alt_changed.emit(1.0)
+    status.alt_changed.emit(2.0)
+    assert stats._signals == 2
+    source.alt_changed.emit(1.0)
+    assert calls == [1]
+    assert stats._history.window('ingest', 100.0)[1].size == 1
+    stats.detach()
+    assert status.slot_timer is None
+    status.alt_changed.emit(3.0)
+    source.alt_changed.emit(1.0)
+    assert calls == [1, 1]
+    assert stats._signals == 0
+    assert stats._history.window('ingest', 100.0)[1].size == 0
+    # and once more, nothing is connected twice
+    stats.attach()
+    status.alt_changed.emit(1.0)
+    source.alt_changed.emit(1.0)
+    assert stats._signals == 1
+    assert calls == [1, 1, 1]
+    stats.close()
+
+def test_overlay_key_attaches_only_while_shown(app):
+    (stats, window, status, source, calls) = scene(app)
+    stats.toggle_overlay()
+    assert stats.attached and stats.overlay
+    stats.toggle_overlay()
+    assert not stats.attached
+    # a configured frame_stats keeps running without the overlay
+    stats.attach()
+    stats.toggle_overlay()
+    stats.toggle_overlay()
+    assert stats.attached
+    stats.close()
+    assert not stats.attached
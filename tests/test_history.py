@@ -0,0 +1,72 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+import pytest
+
+from history import History
+
+def test_trend_of_a_linear_signal():
+    h = History(('alt',), seconds=10.0, rate=20.0)
+    for i in range(100):
+        t = 1000.0 + i * 0.05
+        h.append('alt', 2.0 * (t - 1000.0), t)
+    # 2 m/s for 6 s ahead
+    assert h.trend('alt', 6.0, 3.0) == pytest.approx(12.0)
+    assert h.slope('alt') == pytest.approx(2.0)
+
+def test_trend_without_enough_samples():
+    h = History(('alt',))
+    assert h.trend('alt') == 0.0
+    h.append('alt', 5.0, 10.0)
+    assert h.trend('alt') == 0.0
+
+def test_window_across_the_wrap():
+    h = History(('v',), seconds=1.0, rate=10.0)
+    assert h.capacity == 10
+    for i in range(25):
+        h.append('v', float(i), float(i))
+    t, v = h.window('v', seconds=100.0)
+    assert list(t) == [float(i) for i in range(15, 25)]
+    assert list(v) == list(t)
+    # a window ending in the older half of the ring
+    t, v = h.window('v', seconds=2.0, now=18.0)
+    assert list(t) == [16.0, 17.0, 18.0]
+
+def test_window_matches_a_brute_force_scan():
+    rnd = np.random.RandomState(1)
+    h = History(('v',), seconds=2.0, rate=16.0)
+    times = np.cumsum(rnd.uniform(0.01, 0.2, 200))
+    for i, t in enumerate(times):
+        h.append('v', float(i), float(t))
+        kept = times[max(0, i + 1 - h.capacity):i + 1]
+        now = float(t) - rnd.uniform(0.0, 1.0)
+        seconds = rnd.uniform(0.1, 3.0)
+        expected = kept[(kept >= now - seconds) & (kept <= now)]
+        assert np.array_equal(h.window('v', seconds, now)[0], expected)
+
+def test_clock_going_backwards_drops_the_field():
+    h = History(('a', 'b'))
+    for i in range(10):
+        h.append('a', float(i), 100.0 + i)
+        h.append('b', float(i), 100.0 + i)
+    h.append('a', 50.0, 50.0)
+    assert list(h.window('a')[1]) == [50.0]
+    assert len(h.window('b')[1]) == 10
+
+def test_clear():
+    h = History(('a',))
+    h.append('a', 1.0, 1.0)
+    h.clear()
+    assert h.window('a')[0].size == 0
+    assert np.isnan(h.latest('a')[0])
@@ -0,0 +1,68 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+from multiprocessing import Pipe
+
+import pytest
+
+pytest.importorskip('pymavlink')
+
+from link import Link, ReplayConnection
+from vehicle import Replay_Control
+from test_replay import write_tlog
+
+def open_replays(link, seconds=10.0):
+    '''run the receive loop until every replay is open'''
+    deadline = time.time() + seconds
+    while not all(conn.active for conn in link._conns):
+        assert time.time() < deadline, "replay did not open"
+        link.loop()
+
+def test_configured_replay_speed(tmp_path):
+    path = str(tmp_path / 'a.tlog')
+    write_tlog(path, 20)
+    (recv, send) = Pipe(False)
+    link = Link([ReplayConnection.REPLAY_PREFIX + path], send, None, {'replay': {'file': path, 'speed': 4}})
+    link.init()
+    open_replays(link)
+    assert link._conns[0]._mav.speed == 4.0
+
+def test_controls_sent_while_opening_are_applied(tmp_path):
+    path = str(tmp_path / 'a.tlog')
+    write_tlog(path, 20)
+    (recv, send) = Pipe(False)
+    (control_recv, control_send) = Pipe(False)
+    link = Link([ReplayConnection.REPLAY_PREFIX + path], send, control_recv, {})
+    link.init()
+    # what create_scene sends at startup, before the log is open
+    control_send.send(Replay_Control(Replay_Control.SPEED, 8.0))
+    control_send.send(Replay_Control(Replay_Control.PAUSE))
+    open_replays(link)
+    replay = link._conns[0]._mav
+    assert replay.speed == 8.0 and replay.paused
+    # a reopened log keeps the speed
+    assert link._conns[0]._speed == 8.0
+
+def test_replay_alerts_tick_on_log_time(tmp_path):
+    path = str(tmp_path / 'a.tlog')
+    write_tlog(path, 20)
+    (recv, send) = Pipe(False)
+    link = Link([ReplayConnection.REPLAY_PREFIX + path], send, None, {})
+    link.init()
+    open_replays(link)
+    conn = link._conns[0]
+    conn._mav.pause()
+    assert conn.clock(time.time()) == conn._mav.clock() / 1e6
+    # the log clock, not the wall clock
+    assert abs(conn.clock(time.time()) - time.time()) > 60
@@ -0,0 +1,79 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+
+pytest.importorskip('pymavlink')
+pytest.importorskip('yaml')
+
+from pymavlink.dialects.v20 import ardupilotmega as mavlink
+
+import mavpfd
+from vehicle import Attitude, VFR_HUD, CMD_Ack, WaypointInfo, Alert
+
+def attitude(i):
+    return Attitude(mavlink.MAVLink_attitude_message(i, 0.01 * i, 0, 0, 0, 0, 0))
+
+def hud(i):
+    return VFR_HUD(mavlink.MAVLink_vfr_hud_message(20.0 + i, 20.0, 90, 50, 100.0, 0.0))
+
+def ack(i):
+    return CMD_Ack(mavlink.MAVLink_command_ack_message(i, 0))
+
+def waypoint(i):
+    return WaypointInfo(mavlink.MAVLink_mission_item_message(1, 1, i, 3, 16, 0, 1, 0, 0, 0, 0, -35.0, 149.0, 100))
+
+def alert(i):
+    return Alert('A%u' % i, Alert.WARNING, True, 'A%u' % i)
+
+def test_coalesce_keeps_the_last_state_and_every_event():
+    records = [attitude(0), ack(1), hud(0), waypoint(1), attitude(1), alert(1),
+               hud(1), ack(2), attitude(2), waypoint(2), alert(2)]
+    kept = mavpfd.coalesce(records)
+    state = [r for r in kept if isinstance(r, mavpfd.STATE_TYPES)]
+    events = [r for r in kept if not isinstance(r, mavpfd.STATE_TYPES)]
+    assert state == [records[6], records[8]]
+    assert events == [r for r in records if not isinstance(r, mavpfd.STATE_TYPES)]
+    # what is left keeps the arrival order
+    assert kept == [r for r in records if r in kept]
+
+class Clock():
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self):
+        return self.now
+
+class SlowPipe():
+    '''a pipe full of batches, each taking 20 ms to receive'''
+    def __init__(self, clock, batches):
+        self._clock = clock
+        self.batches = list(batches)
+
+    def poll(self):
+        return len(self.batches) > 0
+
+    def recv(self):
+        self._clock.now += 0.02
+        return self.batches.pop(0)
+
+def test_drain_stops_at_the_budget(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(mavpfd, 'time', clock)
+    pipe = SlowPipe(clock, [[i] for i in range(10)])
+    records = mavpfd.drain(pipe)
+    # the batch that crossed the budget is kept, the rest waits
+    count = int(mavpfd.DRAIN_BUDGET / 0.02) + 1
+    assert records == list(range(count))
+    assert len(pipe.batches) == 10 - count
+    assert mavpfd.drain(pipe) == list(range(count, min(2 * count, 10)))
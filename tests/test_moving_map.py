@@ -0,0 +1,99 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import sqlite3
+
+import pytest
+
+pytest.importorskip('PyQt5')
+
+import moving_map
+from moving_map import MBTiles, TileCache, MovingMap
+
+class Image():
+    '''stands in for a decoded QImage, only its size matters to the cache'''
+    def __init__(self, size):
+        self.size = size
+
+    def sizeInBytes(self):
+        return self.size
+
+def write_mbtiles(path):
+    db = sqlite3.connect(path)
+    db.execute('CREATE TABLE metadata (name TEXT, value TEXT)')
+    db.execute('CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)')
+    db.execute("INSERT INTO metadata VALUES ('minzoom', '3'), ('maxzoom', '4')")
+    # TMS rows count from the south
+    db.execute('INSERT INTO tiles VALUES (3, 2, 7, ?)', (b'north',))
+    db.commit()
+    db.close()
+
+@pytest.mark.parametrize('name', ['plain.mbtiles', 'a?b.mbtiles', 'a#b.mbtiles', 'a%20b.mbtiles', 'a b.mbtiles'])
+def test_mbtiles_path_is_quoted(tmp_path, name):
+    path = str(tmp_path / name)
+    write_mbtiles(path)
+    tiles = MBTiles(path)
+    assert (tiles.minzoom, tiles.maxzoom) == (3, 4)
+    assert tiles.tile(3, 2, 0) == b'north'
+    assert tiles.tile(3, 2, 1) is None
+    tiles.close()
+
+def test_mbtiles_opens_read_only(tmp_path):
+    with pytest.raises(IOError):
+        MBTiles(str(tmp_path / 'missing.mbtiles'))
+    assert not (tmp_path / 'missing.mbtiles').exists()
+
+def test_tile_cache_evicts_by_bytes():
+    cache = TileCache(300)
+    cache.put('a', Image(100))
+    cache.put('b', Image(100))
+    cache.put('c', Image(100))
+    # reading a makes b the oldest
+    cache.get('a')
+    cache.put('d', Image(100))
+    assert 'b' not in cache
+    assert all(k in cache for k in ('a', 'c', 'd'))
+    assert cache.bytes == 300
+
+def test_tile_cache_remembers_missing_tiles():
+    cache = TileCache(1000)
+    cache.put('gap', None)
+    assert 'gap' in cache
+    assert cache.get('gap') is None
+    assert cache.bytes == 64
+
+def test_tile_cache_replaces_and_keeps_one_oversized_tile():
+    cache = TileCache(100)
+    cache.put('a', Image(50))
+    cache.put('a', Image(80))
+    assert cache.bytes == 80
+    cache.put('big', Image(500))
+    assert 'a' not in cache and 'big' in cache
+    assert cache.bytes == 500
+
+def test_prefetch_survives_small_moves():
+    m = MovingMap([])
+    assert not m._stale(45.0, 7.0, 90.0)
+    # the next position a tick later along the same heading
+    m._request = moving_map.offset_position(45.0, 7.0, 90.0, 3.0) + (92.0,)
+    assert not m._stale(45.0, 7.0, 90.0)
+    # across north
+    m._request = (45.0, 7.0, 5.0)
+    assert not m._stale(45.0, 7.0, 355.0)
+
+def test_prefetch_stops_on_a_turn_or_a_jump():
+    m = MovingMap([])
+    m._request = (45.0, 7.0, 90.0 + moving_map.PREFETCH_HEADING + 1)
+    assert m._stale(45.0, 7.0, 90.0)
+    m._request = moving_map.offset_position(45.0, 7.0, 0.0, moving_map.RECOMPOSE_DISTANCE + 5) + (90.0,)
+    assert m._stale(45.0, 7.0, 90.0)
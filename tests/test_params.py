@@ -0,0 +1,200 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import struct
+
+import pytest
+
+pytest.importorskip('pymavlink')
+
+from pymavlink.dialects.v20 import ardupilotmega as mavlink
+
+import params
+from params import ParamCache
+
+SYSID = 1
+PLANE = mavlink.MAV_TYPE_FIXED_WING
+
+class Vehicle():
+    '''an autopilot answering the requests a ParamCache sends'''
+    def __init__(self, values, uid=0, hash_value=None, drop=None):
+        self.names = sorted(values)
+        # drop(index) leaves an index out of the list stream
+        self.drop = drop
+        self.values = values
+        self.uid = uid
+        self.hash_value = hash_value
+        self.requests = []
+        self.target_system = SYSID
+        self.target_component = 1
+        self.mav = self
+        self._pack = mavlink.MAVLink(None, srcSystem=SYSID, srcComponent=1)
+
+    def param_request_read_send(self, ts, tc, name, index):
+        self.requests.append(('read', name, index))
+
+    def param_request_list_send(self, ts, tc):
+        self.requests.append(('list',))
+
+    def command_long_send(self, ts, tc, command, confirmation, *args):
+        self.requests.append(('command', command))
+
+    def value(self, index):
+        name = self.names[index]
+        m = mavlink.MAVLink_param_value_message(name.encode(), self.values[name], mavlink.MAV_PARAM_TYPE_REAL32, len(self.names), index)
+        m.pack(self._pack)
+        return m
+
+    def answer(self, cache, now):
+        '''feed cache the replies to everything requested so far'''
+        requests = self.requests
+        self.requests = []
+        for request in requests:
+            if request[0] == 'command':
+                if request[1] == mavlink.MAV_CMD_REQUEST_MESSAGE and self.uid is not None:
+                    m = mavlink.MAVLink_autopilot_version_message(0, 0, 0, 0, 0, [0] * 8, [0] * 8, [0] * 8, 0, 0, self.uid)
+                    m.pack(self._pack)
+                    cache.handle_version(m, now)
+            elif request[0] == 'list':
+                for index in range(len(self.names)):
+                    if self.drop is None or not self.drop(index):
+                        cache.handle_value(self.value(index), now)
+            elif request[1] == params.HASH_CHECK.encode():
+                if self.hash_value is not None:
+                    value = struct.unpack('<f', struct.pack('<I', self.hash_value))[0]
+                    m = mavlink.MAVLink_param_value_message(params.HASH_CHECK.encode(), value, 6, len(self.names), params.NO_INDEX)
+                    m.pack(self._pack)
+                    cache.handle_value(m, now)
+            else:
+                cache.handle_value(self.value(request[2]), now)
+
+def sync(cache, vehicle, seconds=40.0):
+    '''run the cache against vehicle until it is done, returns the requests seen'''
+    seen = []
+    cache.start(SYSID, 1, PLANE, 0.0)
+    now = 0.0
+    while now < seconds and not cache.complete:
+        cache.poll(now, vehicle)
+        seen.extend(vehicle.requests)
+        vehicle.answer(cache, now)
+        now += 0.5
+    return seen
+
+def values(count):
+    return dict(('P%02u' % i, float(i)) for i in range(count))
+
+def test_sample_indices():
+    assert params.sample_indices(0, 8) == []
+    assert params.sample_indices(1, 8) == [0]
+    assert params.sample_indices(5, 8) == [0, 1, 2, 3, 4]
+    indices = params.sample_indices(700, 8)
+    assert len(indices) == 8 and indices[0] == 0 and indices[-1] == 699
+
+def test_board_uid():
+    m = mavlink.MAVLink_autopilot_version_message(0, 0, 0, 0, 0, [0] * 8, [0] * 8, [0] * 8, 0, 0, 0x1234)
+    assert params.board_uid(m) == '0000000000001234'
+    m.uid = 0
+    assert params.board_uid(m) is None
+    m.uid2 = [0] * 17 + [7]
+    assert params.board_uid(m) == '00' * 17 + '07'
+
+def test_download_is_cached_per_board(tmp_path):
+    vehicle = Vehicle(values(30), uid=0xabc)
+    cache = ParamCache(str(tmp_path), [])
+    sync(cache, vehicle)
+    assert cache.complete and cache.get('P07') == 7.0
+    assert os.listdir(str(tmp_path)) == ['sys1-type1-0000000000000abc.json']
+    # a second airframe with the same system id starts from scratch
+    other = Vehicle(values(30), uid=0xdef)
+    seen = sync(ParamCache(str(tmp_path), []), other)
+    assert ('list',) in seen
+
+def test_without_autopilot_version(tmp_path):
+    vehicle = Vehicle(values(10), uid=None)
+    cache = ParamCache(str(tmp_path), [])
+    sync(cache, vehicle)
+    assert cache.complete
+    assert os.listdir(str(tmp_path)) == ['sys1-type1.json']
+
+def test_matching_hash_skips_the_download(tmp_path):
+    vehicle = Vehicle(values(30), uid=1, hash_value=0x5a5a)
+    cache = ParamCache(str(tmp_path), [])
+    sync(cache, vehicle)
+    cache._hash = 0x5a5a
+    cache.save()
+    seen = sync(ParamCache(str(tmp_path), []), vehicle)
+    assert ('list',) not in seen
+
+def test_matching_samples_skip_the_download(tmp_path):
+    vehicle = Vehicle(values(30), uid=1)
+    sync(ParamCache(str(tmp_path), []), vehicle)
+    cache = ParamCache(str(tmp_path), ['P29'])
+    seen = sync(cache, vehicle)
+    assert ('list',) not in seen
+    reads = [r[2] for r in seen if r[0] == 'read' and r[2] != -1]
+    assert sorted(reads) == params.sample_indices(30, ParamCache.COUNT_SAMPLES)
+    assert cache.get('P15') == 15.0
+
+def test_changed_value_past_index_zero_is_downloaded(tmp_path):
+    vehicle = Vehicle(values(30), uid=1)
+    sync(ParamCache(str(tmp_path), []), vehicle)
+    # same count and same index 0, a sampled parameter changed
+    vehicle.values['P29'] = 99.0
+    cache = ParamCache(str(tmp_path), [])
+    seen = sync(cache, vehicle)
+    assert ('list',) in seen
+    assert cache.get('P29') == 99.0
+
+def test_changed_count_is_downloaded(tmp_path):
+    vehicle = Vehicle(values(30), uid=1)
+    sync(ParamCache(str(tmp_path), []), vehicle)
+    cache = ParamCache(str(tmp_path), [])
+    seen = sync(cache, Vehicle(values(31), uid=1))
+    assert ('list',) in seen
+    assert cache.get('P30') == 30.0
+
+def test_gaps_in_the_list_are_read_by_index(tmp_path):
+    vehicle = Vehicle(values(30), uid=1, drop=lambda index: index % 3 == 0)
+    cache = ParamCache(str(tmp_path), [])
+    seen = sync(cache, vehicle)
+    assert cache.complete
+    assert all(cache.get('P%02u' % i) == float(i) for i in range(30))
+    reads = sorted(r[2] for r in seen if r[0] == 'read')
+    assert reads == list(range(0, 30, 3))
+
+def test_other_components_are_ignored(tmp_path):
+    vehicle = Vehicle(values(5), uid=1)
+    cache = ParamCache(str(tmp_path), ['P01'])
+    cache.start(SYSID, 1, PLANE, 0.0)
+    gimbal = mavlink.MAVLink_param_value_message(b'P01', 42.0, mavlink.MAV_PARAM_TYPE_REAL32, 900, 1)
+    gimbal.pack(mavlink.MAVLink(None, srcSystem=SYSID, srcComponent=mavlink.MAV_COMP_ID_GIMBAL))
+    assert cache.handle_value(gimbal, 0.0) == []
+    assert cache.get('P01') is None and cache._count is None
+    records = cache.handle_value(vehicle.value(1), 0.0)
+    assert [(r.name, r.value) for r in records] == [('P01', 1.0)]
+
+def test_sync_waits_for_an_autopilot_heartbeat():
+    from test_connection import Stub, open_connection, link_with
+    conn = Stub()
+    open_connection(conn)
+    link = link_with(conn)
+    for (autopilot, mav_type, src) in ((mavlink.MAV_AUTOPILOT_INVALID, mavlink.MAV_TYPE_GIMBAL, (SYSID, mavlink.MAV_COMP_ID_GIMBAL)),
+                                       (mavlink.MAV_AUTOPILOT_ARDUPILOTMEGA, PLANE, (SYSID, 1))):
+        m = mavlink.MAVLink_heartbeat_message(mav_type, autopilot, 0, 0, mavlink.MAV_STATE_ACTIVE, 3)
+        m.pack(mavlink.MAVLink(None, srcSystem=src[0], srcComponent=src[1]))
+        conn._mav.messages.append(m)
+        link.handle_messages()
+        if autopilot == mavlink.MAV_AUTOPILOT_INVALID:
+            assert conn._params._source is None
+    assert conn._params._source == (SYSID, 1)
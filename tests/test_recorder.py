@@ -0,0 +1,139 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+import pytest
+
+pytest.importorskip('PyQt5')
+
+from PyQt5 import QtCore, QtGui
+
+import recorder
+from recorder import FrameRecorder
+
+RATE = 10.0
+
+@pytest.fixture(scope='module')
+def app():
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    return QtGui.QGuiApplication.instance() or QtGui.QGuiApplication([])
+
+class Clock():
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+class Grab():
+    def __init__(self, image):
+        self._image = image
+
+    def toImage(self):
+        return self._image
+
+class Window(QtCore.QObject):
+    '''a QQuickWindow showing whatever image the test sets'''
+    frameSwapped = QtCore.pyqtSignal()
+
+    def __init__(self):
+        QtCore.QObject.__init__(self)
+        self.image = None
+        self.grabs = 0
+
+    def screen(self):
+        return self
+
+    def winId(self):
+        return 1
+
+    def grabWindow(self, win_id):
+        self.grabs += 1
+        return Grab(self.image)
+
+    def show(self, color):
+        '''a new frame of one colour'''
+        self.image = QtGui.QImage(8, 6, QtGui.QImage.Format_RGB32)
+        self.image.fill(QtGui.QColor(color))
+        self.frameSwapped.emit()
+
+@pytest.fixture
+def scene(app, tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(recorder, 'time', clock)
+    window = Window()
+    window.show('red')
+    rec = FrameRecorder(window, RATE, str(tmp_path), workers=1)
+    rec.start()
+    return (clock, window, rec, tmp_path)
+
+def tick(clock, rec, ticks=1):
+    # a hair late, as a timer is, so rounding never lands a tick early
+    clock.now += ticks / RATE + 1e-6
+    rec._capture()
+
+def files(directory):
+    return sorted(os.listdir(str(directory)))
+
+def inode(directory, tick):
+    return os.stat(os.path.join(str(directory), 'frame-%06u.png' % tick)).st_ino
+
+def test_unchanged_frames_are_linked_not_encoded(scene):
+    (clock, window, rec, directory) = scene
+    # swapped but identical pixels
+    window.show('red')
+    tick(clock, rec)
+    # not even swapped, nothing is grabbed
+    tick(clock, rec)
+    window.show('blue')
+    tick(clock, rec)
+    rec.close()
+    assert (rec.ticks, rec.taken, rec.changed, rec.dropped) == (4, 3, 2, 0)
+    assert window.grabs == 3
+    assert files(directory) == ['frame-%06u.png' % i for i in range(4)]
+    assert inode(directory, 1) == inode(directory, 0)
+    assert inode(directory, 2) == inode(directory, 0)
+    assert inode(directory, 3) != inode(directory, 0)
+
+def test_missed_ticks_are_filled(scene):
+    (clock, window, rec, directory) = scene
+    window.show('blue')
+    # the timer came 3.5 ticks late
+    tick(clock, rec, 3.5)
+    rec.close()
+    assert rec.ticks == 4 and rec.changed == 2
+    assert files(directory) == ['frame-%06u.png' % i for i in range(4)]
+    assert inode(directory, 1) == inode(directory, 0) == inode(directory, 2)
+    assert QtGui.QImage(os.path.join(str(directory), 'frame-000003.png')).pixelColor(0, 0) == QtGui.QColor('blue')
+
+def test_a_full_pool_drops_and_repeats(scene):
+    (clock, window, rec, directory) = scene
+    # both queue places taken by encodes still running
+    rec._room.acquire()
+    rec._room.acquire()
+    window.show('blue')
+    tick(clock, rec)
+    rec._room.release()
+    rec._room.release()
+    window.show('green')
+    tick(clock, rec)
+    rec.close()
+    assert (rec.ticks, rec.changed, rec.dropped) == (3, 3, 1)
+    assert files(directory) == ['frame-%06u.png' % i for i in range(3)]
+    # the dropped frame repeats the one before it
+    assert inode(directory, 1) == inode(directory, 0)
+    assert QtGui.QImage(os.path.join(str(directory), 'frame-000002.png')).pixelColor(0, 0) == QtGui.QColor('green')
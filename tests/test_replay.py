@@ -0,0 +1,182 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import mmap
+import struct
+
+import pytest
+
+pytest.importorskip('pymavlink')
+
+from pymavlink.dialects.v20 import ardupilotmega as mavlink
+
+import replay
+
+START = 1600000000000000 # microseconds
+
+def packet(mav, i):
+    if i % 2 == 0:
+        m = mavlink.MAVLink_attitude_message(i, 0.01 * i, 0, 0, 0, 0, 0)
+    else:
+        m = mavlink.MAVLink_vfr_hud_message(20.0 + i, 20.0, 90, 50, 100.0, 0.0)
+    return m.pack(mav)
+
+def write_tlog(path, count, garbage_at=None, make=packet):
+    '''count packets 0.1 s apart from make(mav, i), optionally with junk
+    bytes before one'''
+    mav = mavlink.MAVLink(None, srcSystem=1, srcComponent=1)
+    with open(path, 'wb') as f:
+        for i in range(count):
+            if i == garbage_at:
+                f.write(b'\x00\x11\x22')
+            f.write(struct.pack('>Q', START + i * 100000))
+            f.write(make(mav, i))
+
+def numbered(mav, i):
+    '''ATTITUDE, VFR_HUD and STATUSTEXT in turn, each carrying i'''
+    if i % 3 == 0:
+        m = mavlink.MAVLink_attitude_message(i, 0, 0, 0, 0, 0, 0)
+    elif i % 3 == 1:
+        m = mavlink.MAVLink_vfr_hud_message(0, 0, i, 0, 0, 0)
+    else:
+        m = mavlink.MAVLink_statustext_message(mavlink.MAV_SEVERITY_INFO, b'm%u' % i)
+    return m.pack(mav)
+
+def number(m):
+    if m.get_type() == 'ATTITUDE':
+        return m.time_boot_ms
+    if m.get_type() == 'VFR_HUD':
+        return m.heading
+    return int(m.text[1:])
+
+class Clock():
+    '''wall clock the replay runs on, moved by the test'''
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+def drain(r):
+    ret = []
+    while True:
+        m = r.recv_msg()
+        if m is None:
+            return ret
+        ret.append(number(m))
+
+def scan(path):
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return list(replay.scan_tlog(mm))
+        finally:
+            mm.close()
+
+def test_scan_finds_every_packet(tmp_path):
+    path = str(tmp_path / 'a.tlog')
+    write_tlog(path, 20)
+    rows = scan(path)
+    assert len(rows) == 20
+    assert [r[0] for r in rows] == [START + i * 100000 for i in range(20)]
+    assert set(r[3] for r in rows) == {mavlink.MAVLINK_MSG_ID_ATTITUDE, mavlink.MAVLINK_MSG_ID_VFR_HUD}
+
+def test_scan_resyncs_after_junk(tmp_path):
+    path = str(tmp_path / 'a.tlog')
+    write_tlog(path, 10, garbage_at=4)
+    assert len(scan(path)) == 10
+
+def test_scan_ignores_a_truncated_tail(tmp_path):
+    path = str(tmp_path / 'a.tlog')
+    write_tlog(path, 10)
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 5)
+    assert len(scan(path)) == 9
+
+def test_index_is_stored_and_invalidated(tmp_path):
+    path = str(tmp_path / 'a.tlog')
+    write_tlog(path, 10)
+    assert replay.load_index(path) is None
+    r = replay.Replay(path)
+    r.close()
+    index = replay.load_index(path)
+    assert index is not None and len(index) == 10
+    # a log that grew makes the stored index stale
+    write_tlog(path, 12)
+    assert replay.load_index(path) is None
+    r = replay.Replay(path)
+    assert r.duration == pytest.approx(1.1)
+    r.close()
+    assert len(replay.load_index(path)) == 12
+
+def test_index_with_a_changed_mtime_is_stale(tmp_path):
+    path = str(tmp_path / 'a.tlog')
+    write_tlog(path, 10)
+    replay.Replay(path).close()
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+    assert replay.load_index(path) is None
+
+def test_seek_and_paused_playback(tmp_path):
+    path = str(tmp_path / 'a.tlog')
+    write_tlog(path, 20)
+    r = replay.Replay(path)
+    r.pause()
+    r.seek(0.55)
+    assert r.position == pytest.approx(0.55)
+    # the packets before the new position are skipped and a paused clock
+    # passes nothing newer
+    assert r.recv_msg() is None
+    r.seek(0.0)
+    m = r.recv_msg()
+    assert m is not None and m.get_type() == 'ATTITUDE'
+    assert m._timestamp == pytest.approx(START / 1e6)
+    r.close()
+
+def test_state_messages_coalesce_to_the_newest(tmp_path, monkeypatch):
+    path = str(tmp_path / 'a.tlog')
+    write_tlog(path, 30, make=numbered)
+    clock = Clock()
+    monkeypatch.setattr(replay, 'time', clock)
+    r = replay.Replay(path)
+    # one advance step passes packets 0 to 10: every STATUSTEXT in log
+    # order, only the newest ATTITUDE (9) and VFR_HUD (10)
+    clock.now += 1.05
+    assert drain(r) == [2, 5, 8, 9, 10]
+    # a step passing a single packet delivers it whatever its type
+    clock.now += 0.1
+    assert drain(r) == [11]
+    clock.now += 0.1
+    assert drain(r) == [12]
+    r.close()
+
+def test_seek_and_skip_land_on_the_next_record(tmp_path, monkeypatch):
+    path = str(tmp_path / 'a.tlog')
+    write_tlog(path, 30, make=numbered)
+    clock = Clock()
+    monkeypatch.setattr(replay, 'time', clock)
+    r = replay.Replay(path)
+    r.seek(0.55)
+    assert drain(r) == []
+    clock.now += 0.1
+    assert drain(r) == [6]
+    r.skip(1.0)
+    assert r.position == pytest.approx(1.65)
+    assert drain(r) == []
+    clock.now += 0.06
+    assert drain(r) == [17]
+    # backwards, the packet at the new position is the first one delivered
+    r.seek(0.3)
+    assert drain(r) == [3]
+    r.close()
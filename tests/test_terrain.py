@@ -0,0 +1,120 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import math
+
+import numpy as np
+import pytest
+
+import terrain
+
+SAMPLES = 5
+
+def write_tile(directory, lat, lon, void=None):
+    '''heights 100 * row + col + offset, linear so bilinear lookups are exact'''
+    offset = 1000 * (lat * 10 + lon)
+    data = np.fromfunction(lambda r, c: 100 * r + c + offset, (SAMPLES, SAMPLES)).astype('>i2')
+    if void is not None:
+        data[void] = terrain.HGT_VOID
+    data.tofile(str(directory / terrain.tile_name(lat, lon)))
+
+def expected(lat, lon):
+    '''the height write_tile puts at a point'''
+    tile_lat = math.floor(lat)
+    tile_lon = math.floor(lon)
+    scale = SAMPLES - 1
+    return (100 * (tile_lat + 1 - lat) * scale + (lon - tile_lon) * scale +
+            1000 * (tile_lat * 10 + tile_lon))
+
+def test_tile_name():
+    assert terrain.tile_name(45, 7) == 'N45E007.hgt'
+    assert terrain.tile_name(-34, -58) == 'S34W058.hgt'
+
+def test_rows_run_north_to_south(tmp_path):
+    write_tile(tmp_path, 1, 2)
+    t = terrain.Terrain(str(tmp_path))
+    # north west corner is the first sample, south east the last
+    offset = 1000 * (1 * 10 + 2)
+    assert t.elevation(2.0 - 1e-9, 2.0) == pytest.approx(offset, abs=1e-3)
+    assert t.elevation(1.0, 3.0 - 1e-9) == pytest.approx(offset + 100 * (SAMPLES - 1) + SAMPLES - 1, abs=1e-3)
+    assert t.elevation(1.75, 2.25) == pytest.approx(expected(1.75, 2.25))
+    t.close()
+
+def test_edges_and_corners(tmp_path):
+    write_tile(tmp_path, 1, 2)
+    t = terrain.Terrain(str(tmp_path))
+    points = [(1.0, 2.0), (1.0, 2.999999), (1.999999, 2.0), (1.999999, 2.999999),
+              (1.0, 2.5), (1.5, 2.0), (1.999999, 2.5), (1.5, 2.999999), (1.3, 2.7)]
+    for lat, lon in points:
+        assert t.elevation(lat, lon) == pytest.approx(expected(lat, lon), abs=1e-3)
+    t.close()
+
+def test_missing_tile_and_void(tmp_path):
+    write_tile(tmp_path, 1, 2, void=(0, 0))
+    t = terrain.Terrain(str(tmp_path))
+    assert math.isnan(t.elevation(5.5, 5.5))
+    # the void poisons only the cell it is a corner of
+    assert math.isnan(t.elevation(1.99, 2.01))
+    assert not math.isnan(t.elevation(1.1, 2.9))
+    t.close()
+
+def test_bad_tile_is_unusable(tmp_path):
+    (tmp_path / terrain.tile_name(1, 2)).write_bytes(b'\x00' * 7)
+    t = terrain.Terrain(str(tmp_path))
+    assert t.tile(1, 2) is None
+    assert math.isnan(t.elevation(1.5, 2.5))
+
+def test_lru_eviction(tmp_path):
+    for lon in range(4):
+        write_tile(tmp_path, 0, lon)
+    t = terrain.Terrain(str(tmp_path), max_tiles=2)
+    first = t.tile(0, 0)
+    t.tile(0, 1)
+    # touching 0, 0 makes 0, 1 the oldest
+    assert t.tile(0, 0) is first
+    t.tile(0, 2)
+    assert list(t._tiles.keys()) == [(0, 0), (0, 2)]
+    t.tile(0, 3)
+    assert list(t._tiles.keys()) == [(0, 2), (0, 3)]
+    # an evicted tile is closed, a reopened one still reads
+    assert t.elevation(0.5, 0.5) == pytest.approx(expected(0.5, 0.5))
+    t.close()
+
+def test_elevations_match_the_scalar_path(tmp_path):
+    for lat in range(2):
+        for lon in range(2):
+            write_tile(tmp_path, lat, lon, void=(2, 3) if (lat, lon) == (1, 1) else None)
+    t = terrain.Terrain(str(tmp_path))
+    rnd = np.random.RandomState(2)
+    lats = rnd.uniform(-0.5, 2.0, 300)
+    lons = rnd.uniform(0.0, 2.5, 300)
+    # exact tile edges and corners too
+    lats = np.concatenate([lats, [0.0, 1.0, 1.0, 0.5, 1.999999]])
+    lons = np.concatenate([lons, [0.0, 1.0, 0.5, 1.0, 1.999999]])
+    vector = t.elevations(lats, lons)
+    scalar = np.array([t.elevation(a, b) for a, b in zip(lats, lons)])
+    assert np.array_equal(np.isnan(vector), np.isnan(scalar))
+    ok = ~np.isnan(scalar)
+    assert np.allclose(vector[ok], scalar[ok])
+    t.close()
+
+def test_route_profile(tmp_path):
+    write_tile(tmp_path, 0, 0)
+    t = terrain.Terrain(str(tmp_path))
+    dist, height = t.route_profile([(0.5, 0.1), (0.5, 0.2)], spacing=1000.0)
+    assert dist[0] == 0.0
+    assert dist[-1] == pytest.approx(math.radians(0.1) * terrain.EARTH_RADIUS * math.cos(math.radians(0.5)))
+    assert height[0] == pytest.approx(expected(0.5, 0.1))
+    assert height[-1] == pytest.approx(expected(0.5, 0.2))
+    assert np.all(np.diff(dist) > 0)
+    t.close()
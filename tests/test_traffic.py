@@ -0,0 +1,117 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import math
+
+import numpy as np
+import pytest
+
+pytest.importorskip('pymavlink')
+
+from pymavlink.dialects.v20 import ardupilotmega as mavlink
+
+import traffic
+from traffic import TrafficTable, TrafficMonitor
+
+LAT = 45.0
+LON = 7.0
+ALL_VALID = traffic.ADSB_FLAGS_VALID_COORDS | traffic.ADSB_FLAGS_VALID_ALTITUDE | traffic.ADSB_FLAGS_VALID_HEADING
+
+def adsb(icao, north, east, alt=1000.0, flags=ALL_VALID):
+    '''an ADSB_VEHICLE north and east metres from LAT, LON'''
+    lat = LAT + math.degrees(north / traffic.EARTH_RADIUS)
+    lon = LON + math.degrees(east / (traffic.EARTH_RADIUS * math.cos(math.radians(LAT))))
+    return mavlink.MAVLink_adsb_vehicle_message(icao, int(round(lat * 1e7)), int(round(lon * 1e7)), 0,
+                                                int(alt * 1000), 9000, 0, 0, b'TEST%u' % icao, 0, 0, flags, 0)
+
+def icaos(table, rows):
+    return [int(table._icao[r]) for r in rows]
+
+def test_nearest_matches_a_brute_force_search():
+    rnd = np.random.RandomState(3)
+    table = TrafficTable(capacity=4, cell=500.0)
+    table.set_origin(LAT, LON)
+    positions = {}
+    for icao in range(1, 201):
+        (north, east) = rnd.uniform(-6000, 6000, 2)
+        table.update(adsb(icao, north, east), 0.0)
+        positions[icao] = (north, east)
+    assert len(table) == 200
+    for (north, east, count, radius) in ((0, 0, 5, 2000.0), (1234, -777, 1, 3000.0), (-5000, 5000, 10, 10000.0), (0, 0, 3, 50.0)):
+        lat = LAT + math.degrees(north / traffic.EARTH_RADIUS)
+        lon = LON + math.degrees(east / (traffic.EARTH_RADIUS * math.cos(math.radians(LAT))))
+        d = dict((icao, math.hypot(n - north, e - east)) for icao, (n, e) in positions.items())
+        expected = [icao for icao in sorted(d, key=d.get) if d[icao] < radius][:count]
+        (rows, dx, dy) = table.nearest(lat, lon, count, radius)
+        assert icaos(table, rows) == expected
+        assert list(np.hypot(dx, dy)) == pytest.approx([d[i] for i in expected], abs=0.5)
+
+def test_nearest_on_an_empty_table():
+    table = TrafficTable()
+    assert table.nearest(LAT, LON, 5, 1000.0)[0].size == 0
+    table.set_origin(LAT, LON)
+    assert table.nearest(LAT, LON, 5, 1000.0)[0].size == 0
+
+def test_update_moves_a_contact_between_cells():
+    table = TrafficTable(cell=500.0)
+    table.update(adsb(7, 0, 0), 0.0)
+    table.update(adsb(7, 0, 3000), 1.0)
+    assert len(table) == 1
+    assert icaos(table, table.within(LAT, LON, 1000.0)[0]) == []
+    assert icaos(table, table.nearest(LAT, LON, 1, 5000.0)[0]) == [7]
+    assert len(table._cells) == 1
+
+def test_contacts_without_coordinates_are_ignored():
+    table = TrafficTable()
+    table.update(adsb(1, 0, 0, flags=traffic.ADSB_FLAGS_VALID_ALTITUDE), 0.0)
+    assert len(table) == 0
+
+def test_expiry_frees_rows_for_reuse():
+    table = TrafficTable(capacity=2, max_age=20.0)
+    table.update(adsb(1, 0, 0), 0.0)
+    table.update(adsb(2, 100, 0), 10.0)
+    table.update(adsb(3, 200, 0), 15.0)
+    assert table._capacity == 4
+    table.expire(25.0)
+    assert len(table) == 2
+    assert icaos(table, table.within(LAT, LON, 1000.0)[0]) == [2, 3]
+    # heard again before max_age passed, 2 stays
+    table.update(adsb(2, 100, 0), 30.0)
+    table.expire(36.0)
+    assert sorted(table._index) == [2]
+    # a freed row is taken before the table grows
+    table.update(adsb(4, 0, 0), 40.0)
+    assert table._index[4] in (0, 2)
+    assert table._capacity == 4
+    assert int(np.count_nonzero(table._active)) == 2
+
+def test_reanchoring_keeps_the_contacts():
+    table = TrafficTable()
+    table.update(adsb(1, 0, 0), 0.0)
+    far = LAT + math.degrees(2 * traffic.REANCHOR_DISTANCE / traffic.EARTH_RADIUS)
+    table.set_origin(far, LON)
+    assert table._origin[0] == far
+    assert icaos(table, table.nearest(LAT, LON, 1, 100.0)[0]) == [1]
+
+def test_monitor_levels_and_expiry():
+    table = TrafficTable(max_age=20.0)
+    monitor = TrafficMonitor(table, display_range=150.0, threat_radius=2000.0, threat_alt=300.0, nearest=5)
+    table.update(adsb(1, 100, 0, alt=1000.0), 0.0) # close, same level
+    table.update(adsb(2, 1500, 0, alt=1000.0), 0.0) # inside the threat radius only
+    table.update(adsb(3, 500, 0, alt=2000.0), 0.0) # well above
+    record = monitor.snapshot(LAT, LON, 1000.0, 1.0)
+    assert [c[0] for c in record.contacts] == [1]
+    assert [(c[0], c[6]) for c in record.nearest] == [(1, TrafficTable.ALERT), (2, TrafficTable.THREAT)]
+    assert record.count == 3
+    record = monitor.snapshot(LAT, LON, 1000.0, 30.0)
+    assert record.count == 0 and record.nearest == []
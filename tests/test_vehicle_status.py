@@ -0,0 +1,81 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+
+pytest.importorskip('PyQt5')
+pytest.importorskip('pyproj')
+
+import history
+import vehicle_status
+from vehicle import Replay_Status
+from vehicle_status import Vehicle_Status
+
+def fly(status, start, seconds, step=0.1):
+    '''climb at 2 m/s, samples stamped with log time'''
+    t = start
+    while t < start + seconds:
+        status.set_sample_time(t)
+        status.alt = 2.0 * (t - start)
+        t += step
+
+class Clock():
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+def replay_climb(monkeypatch, speed):
+    '''climb at 2 m/s for 5 s of log, replayed at speed on a fake wall clock'''
+    clock = Clock()
+    monkeypatch.setattr(vehicle_status, 'time', clock)
+    monkeypatch.setattr(history, 'time', clock)
+    status = Vehicle_Status()
+    t = 500.0
+    while t < 505.0:
+        status.set_replay(Replay_Status(t, 600.0, speed, False))
+        status.set_sample_time(t)
+        status.alt = 2.0 * (t - 500.0)
+        t += 0.1
+        clock.now += 0.1 / speed
+    return status.alt_trend
+
+def test_trend_uses_log_time(monkeypatch):
+    # at 4x the samples arrive 4 times faster on the wall clock, the
+    # trend must still be 2 m/s over TREND_SECONDS
+    trend = replay_climb(monkeypatch, 1.0)
+    assert trend == pytest.approx(2.0 * Vehicle_Status.TREND_SECONDS)
+    assert replay_climb(monkeypatch, 4.0) == pytest.approx(trend)
+
+def test_replay_seek_clears_history():
+    status = Vehicle_Status()
+    status.set_replay(Replay_Status(10.0, 100.0, 1.0, False))
+    fly(status, 500.0, 5.0)
+    assert status.history.window('alt')[0].size > 0
+    status.set_replay(Replay_Status(80.0, 100.0, 1.0, False))
+    assert status.history.window('alt')[0].size == 0
+
+def test_replay_speed_change_clears_history():
+    status = Vehicle_Status()
+    status.set_replay(Replay_Status(10.0, 100.0, 1.0, False))
+    fly(status, 500.0, 1.0)
+    status.set_replay(Replay_Status(10.0, 100.0, 4.0, False))
+    assert status.history.window('alt')[0].size == 0
+
+def test_steady_replay_keeps_history():
+    status = Vehicle_Status()
+    status.set_replay(Replay_Status(10.0, 100.0, 1.0, True))
+    fly(status, 500.0, 1.0)
+    status.set_replay(Replay_Status(10.0, 100.0, 1.0, True))
+    assert status.history.window('alt')[0].size > 0
@@ -0,0 +1,241 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import math
+
+import numpy as np
+
+from vehicle import Traffic
+
+EARTH_RADIUS = 6378137.0
+ADSB_FLAGS_VALID_COORDS = 1
+ADSB_FLAGS_VALID_ALTITUDE = 2
+ADSB_FLAGS_VALID_HEADING = 4
+REANCHOR_DISTANCE = 50000.0 # metres from the origin before the plane is rebuilt
+
+class TrafficTable():
+    '''ADS-B contacts of one connection
+
+    Contacts live in preallocated column arrays, one row per ICAO address,
+    and in a hashed grid of square cells on a local plane in metres (x east,
+    y south like the EHSI).  An ADSB_VEHICLE costs a dict lookup, a few
+    array writes and at most one cell move however many contacts are
+    tracked; expiry and queries run at the publish rate instead.'''
+    THREAT = 1
+    ALERT = 2
+
+    # per contact columns: name, dtype, value of a free row
+    COLUMNS = (('_icao', np.uint32, 0),
+               ('_lat', np.float64, np.nan),
+               ('_lon', np.float64, np.nan),
+               ('_x', np.float64, np.nan),
+               ('_y', np.float64, np.nan),
+               ('_alt', np.float64, np.nan),
+               ('_heading', np.float64, np.nan),
+               ('_time', np.float64, -np.inf),
+               ('_active', np.bool_, False))
+
+    def __init__(self, capacity=256, cell=500.0, max_age=20.0):
+        self._cell = float(cell)
+        self._max_age = max_age
+        self._index = {} # ICAO -> row
+        self._cells = {} # (cx, cy) -> set of rows
+        self._cells_row = {} # row -> (cx, cy)
+        self._origin = None
+        self._capacity = 0
+        for name, dtype, fill in TrafficTable.COLUMNS:
+            setattr(self, name, np.zeros(0, dtype=dtype))
+        self._callsign = []
+        self._free = []
+        self._grow(capacity)
+
+    def _grow(self, capacity):
+        for name, dtype, fill in TrafficTable.COLUMNS:
+            column = np.full(capacity, fill, dtype=dtype)
+            column[:self._capacity] = getattr(self, name)
+            setattr(self, name, column)
+        self._callsign.extend([''] * (capacity - self._capacity))
+        # a stack, the lowest free row is reused first
+        self._free.extend(range(capacity - 1, self._capacity - 1, -1))
+        self._capacity = capacity
+
+    def __len__(self):
+        return len(self._index)
+
+    def _local(self, lat, lon):
+        (lat0, lon0, coslat) = self._origin
+        return (math.radians(lon - lon0) * EARTH_RADIUS * coslat, -math.radians(lat - lat0) * EARTH_RADIUS)
+
+    def _cell_key(self, x, y):
+        return (int(math.floor(x / self._cell)), int(math.floor(y / self._cell)))
+
+    def _place(self, row, x, y):
+        key = self._cell_key(x, y)
+        self._x[row] = x
+        self._y[row] = y
+        old = self._cells_row.get(row)
+        if old == key:
+            return
+        if old is not None:
+            self._cells[old].discard(row)
+            if len(self._cells[old]) == 0:
+                del self._cells[old]
+        self._cells.setdefault(key, set()).add(row)
+        self._cells_row[row] = key
+
+    def set_origin(self, lat, lon):
+        '''anchor the local plane, rebuilding the grid when it moved far'''
+        if self._origin is not None:
+            (x, y) = self._local(lat, lon)
+            if math.hypot(x, y) < REANCHOR_DISTANCE:
+                return
+        self._origin = (lat, lon, math.cos(math.radians(lat)))
+        self._cells = {}
+        self._cells_row = {}
+        for row in self._index.values():
+            self._place(row, *self._local(self._lat[row], self._lon[row]))
+
+    def update(self, m, now):
+        '''apply one ADSB_VEHICLE'''
+        if not m.flags & ADSB_FLAGS_VALID_COORDS:
+            return
+        lat = m.lat * 1.0e-7
+        lon = m.lon * 1.0e-7
+        if self._origin is None:
+            self.set_origin(lat, lon)
+        row = self._index.get(m.ICAO_address)
+        if row is None:
+            if len(self._free) == 0:
+                self._grow(self._capacity * 2)
+            row = self._free.pop()
+            self._index[m.ICAO_address] = row
+            self._icao[row] = m.ICAO_address
+            self._active[row] = True
+            self._alt[row] = np.nan
+            self._heading[row] = np.nan
+        self._lat[row] = lat
+        self._lon[row] = lon
+        if m.flags & ADSB_FLAGS_VALID_ALTITUDE:
+            self._alt[row] = m.altitude * 0.001
+        if m.flags & ADSB_FLAGS_VALID_HEADING:
+            self._heading[row] = m.heading * 0.01
+        self._time[row] = now
+        self._callsign[row] = m.callsign
+        self._place(row, *self._local(lat, lon))
+
+    def _remove(self, row):
+        del self._index[int(self._icao[row])]
+        key = self._cells_row.pop(row)
+        self._cells[key].discard(row)
+        if len(self._cells[key]) == 0:
+            del self._cells[key]
+        self._active[row] = False
+        self._free.append(row)
+
+    def expire(self, now):
+        '''forget contacts not heard for max_age seconds'''
+        for row in np.flatnonzero(self._active & (self._time < now - self._max_age)):
+            self._remove(int(row))
+
+    def _rows_in_cells(self, cx0, cy0, cx1, cy1):
+        rows = []
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                cell = self._cells.get((cx, cy))
+                if cell is not None:
+                    rows.extend(cell)
+        return rows
+
+    def within(self, lat, lon, radius):
+        '''rows and their x, y offsets from lat, lon closer than radius metres'''
+        if self._origin is None:
+            return (np.zeros(0, np.intp), np.zeros(0), np.zeros(0))
+        (x, y) = self._local(lat, lon)
+        (cx0, cy0) = self._cell_key(x - radius, y - radius)
+        (cx1, cy1) = self._cell_key(x + radius, y + radius)
+        rows = np.array(self._rows_in_cells(cx0, cy0, cx1, cy1), dtype=np.intp)
+        dx = self._x[rows] - x
+        dy = self._y[rows] - y
+        sel = dx * dx + dy * dy < radius * radius
+        return (rows[sel], dx[sel], dy[sel])
+
+    def nearest(self, lat, lon, count, radius):
+        '''up to count rows closest to lat, lon within radius, closest first
+
+        Rings of cells are searched outwards until count candidates are
+        closer than anything the next ring could hold.'''
+        if self._origin is None or count <= 0:
+            return (np.zeros(0, np.intp), np.zeros(0), np.zeros(0))
+        (x, y) = self._local(lat, lon)
+        (cx, cy) = self._cell_key(x, y)
+        rings = int(math.ceil(radius / self._cell)) + 1
+        rows = []
+        for ring in range(rings + 1):
+            if ring == 0:
+                rows.extend(self._cells.get((cx, cy), ()))
+            else:
+                for i in range(-ring, ring + 1):
+                    for key in ((cx + i, cy - ring), (cx + i, cy + ring)):
+                        rows.extend(self._cells.get(key, ()))
+                for i in range(-ring + 1, ring):
+                    for key in ((cx - ring, cy + i), (cx + ring, cy + i)):
+                        rows.extend(self._cells.get(key, ()))
+            if len(rows) >= count:
+                r = np.array(rows, dtype=np.intp)
+                d = np.hypot(self._x[r] - x, self._y[r] - y)
+                # everything outside the searched rings is further than ring cells
+                if np.sort(d)[count - 1] <= ring * self._cell:
+                    break
+        r = np.array(rows, dtype=np.intp)
+        dx = self._x[r] - x
+        dy = self._y[r] - y
+        d = np.hypot(dx, dy)
+        order = np.argsort(d)
+        order = order[d[order] < radius][:count]
+        return (r[order], dx[order], dy[order])
+
+    def contacts(self, rows, dx, dy, alt):
+        '''(icao, callsign, x, y, relative altitude, heading) tuples'''
+        rel = self._alt[rows] - alt
+        return [(int(self._icao[row]), self._callsign[row], float(x), float(y), float(r), float(h))
+                for row, x, y, r, h in zip(rows, dx, dy, rel, self._heading[rows])]
+
+class TrafficMonitor():
+    '''what the display gets from a TrafficTable'''
+    def __init__(self, table, display_range=150.0, threat_radius=2000.0, threat_alt=300.0, nearest=5):
+        self.table = table
+        self._range = display_range
+        self._threat_radius = threat_radius
+        self._threat_alt = threat_alt
+        self._nearest = nearest
+
+    def level(self, x, y, rel_alt):
+        '''TrafficTable.THREAT inside the threat cylinder, ALERT in half of it, else 0'''
+        if math.isnan(rel_alt):
+            rel_alt = 0.0
+        d = math.hypot(x, y)
+        if d < self._threat_radius / 2 and abs(rel_alt) < self._threat_alt / 2:
+            return TrafficTable.ALERT
+        if d < self._threat_radius and abs(rel_alt) < self._threat_alt:
+            return TrafficTable.THREAT
+        return 0
+
+    def snapshot(self, lat, lon, alt, now):
+        '''expire old contacts and build the Traffic record around lat, lon'''
+        self.table.set_origin(lat, lon)
+        self.table.expire(now)
+        shown = [c + (self.level(c[2], c[3], c[4]),)
+                 for c in self.table.contacts(*self.table.within(lat, lon, self._range), alt=alt)]
+        nearest = [c + (self.level(c[2], c[3], c[4]),)
+                   for c in self.table.contacts(*self.table.nearest(lat, lon, self._nearest, self._threat_radius), alt=alt)]
+        return Traffic(shown, [c for c in nearest if c[6] > 0], len(self.table))
@@ -0,0 +1,65 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import math
+
+from PyQt5 import QtCore
+
+class TrafficModel(QtCore.QAbstractListModel):
+    '''contacts of the latest Traffic record as a QML list model
+
+    A new record overwrites the rows in place: one dataChanged for the
+    rows both records have, one insert or remove for the difference, so
+    delegates are reused instead of recreated.'''
+    ROLES = ('icao', 'callsign', 'x', 'y', 'altitude', 'heading', 'level')
+
+    def __init__(self, parent=None):
+        QtCore.QAbstractListModel.__init__(self, parent)
+        self._rows = []
+        self._roles = dict((QtCore.Qt.UserRole + 1 + i, name.encode()) for i, name in enumerate(TrafficModel.ROLES))
+
+    def roleNames(self):
+        return self._roles
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._rows):
+            return None
+        i = role - QtCore.Qt.UserRole - 1
+        if i < 0 or i >= len(TrafficModel.ROLES):
+            return None
+        value = self._rows[index.row()][i]
+        if isinstance(value, float) and math.isnan(value):
+            # unknown altitude or heading
+            return 0.0
+        return value
+
+    def set_contacts(self, contacts):
+        old = len(self._rows)
+        new = len(contacts)
+        if new < old:
+            self.beginRemoveRows(QtCore.QModelIndex(), new, old - 1)
+            self._rows = self._rows[:new]
+            self.endRemoveRows()
+        for i in range(min(old, new)):
+            self._rows[i] = contacts[i]
+        if min(old, new) > 0:
+            self.dataChanged.emit(self.index(0), self.index(min(old, new) - 1))
+        if new > old:
+            self.beginInsertRows(QtCore.QModelIndex(), old, new - 1)
+            self._rows.extend(contacts[old:])
+            self.endInsertRows()
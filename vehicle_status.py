@@ -0,0 +1,757 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import math
+import time
+
+from PyQt5 import QtCore
+import pyproj
+
+from history import History
+from traffic_model import TrafficModel
+from vehicle import Replay_Control, Command_Request, Command_Result
+
+class Vehicle_Status(QtCore.QObject):
+    pitch_changed = QtCore.pyqtSignal(float)
+    roll_changed = QtCore.pyqtSignal(float)
+    yaw_changed = QtCore.pyqtSignal(int)
+    altitude_changed = QtCore.pyqtSignal(float)
+    altitude_bug_changed = QtCore.pyqtSignal(float)
+    alt_changed = QtCore.pyqtSignal(float)
+    climbrate_changed = QtCore.pyqtSignal(float)
+    airspeed_changed = QtCore.pyqtSignal(float)
+    nav_pitch_changed = QtCore.pyqtSignal(float)
+    nav_roll_changed = QtCore.pyqtSignal(float)
+    nav_yaw_changed = QtCore.pyqtSignal(int)
+    flightmode_changed = QtCore.pyqtSignal(str)
+    arm_disarm_changed = QtCore.pyqtSignal(int)
+    target_alt_changed = QtCore.pyqtSignal(float)
+    target_aspd_changed = QtCore.pyqtSignal(float)
+    target_alt_visible_changed = QtCore.pyqtSignal(bool)
+    ekf_healthy_changed = QtCore.pyqtSignal(int)
+    gps_visible_changed = QtCore.pyqtSignal(int)
+    gps_lock_type_changed = QtCore.pyqtSignal(int)
+    ils_visible_changed = QtCore.pyqtSignal(bool)
+    xtrack_error_changed = QtCore.pyqtSignal(int)
+    alt_error_changed = QtCore.pyqtSignal(int)
+    mission_cmd_changed = QtCore.pyqtSignal(int)
+    vibration_level_changed = QtCore.pyqtSignal(int)
+    wp_dist_changed = QtCore.pyqtSignal(int)
+    lat_changed = QtCore.pyqtSignal(int)
+    lon_changed = QtCore.pyqtSignal(int)
+    waypoint_received_changed = QtCore.pyqtSignal(bool)
+    mission_seq_changed = QtCore.pyqtSignal(int)
+    airspeed_trend_changed = QtCore.pyqtSignal(float)
+    alt_trend_changed = QtCore.pyqtSignal(float)
+    replay_changed = QtCore.pyqtSignal()
+    alerts_changed = QtCore.pyqtSignal()
+    command_finished = QtCore.pyqtSignal(int, int, int) # request id, command, result
+    command_text_changed = QtCore.pyqtSignal(str)
+    terrain_changed = QtCore.pyqtSignal()
+    terrain_profile_changed = QtCore.pyqtSignal()
+    params_changed = QtCore.pyqtSignal()
+    traffic_changed = QtCore.pyqtSignal()
+
+    COMMAND_RESULTS = {Command_Result.ACCEPTED: 'ACCEPTED',
+                       Command_Result.TEMPORARILY_REJECTED: 'REJECTED',
+                       Command_Result.DENIED: 'DENIED',
+                       Command_Result.UNSUPPORTED: 'UNSUPPORTED',
+                       Command_Result.FAILED: 'FAILED',
+                       Command_Result.TIMEOUT: 'NO ACK',
+                       Command_Result.NO_LINK: 'NO LINK'}
+
+    HISTORY_FIELDS = ('airspeed', 'alt', 'climbrate', 'pitch', 'roll', 'yaw')
+    TREND_SECONDS = 6.0 # trend vectors show the value expected 6 s ahead
+    TREND_WINDOW = 3.0 # seconds of history used for the trend slope
+    REPLAY_JUMP = 2.0 # seconds a replay position may miss the expected one before it counts as a seek
+
+    def __init__(self, parent=None):
+        super(Vehicle_Status, self).__init__(parent)
+        self._pitch = 0.0
+        self._roll = 0.0
+        self._yaw = 0
+        self._alt = 0.0
+        self._climbrate = 0.0
+        self._airspeed = 0.0
+        self._nav_pitch = 0.0
+        self._nav_roll = 0.0
+        self._nav_yaw = 0
+        self._flightmode = ''
+        self._arm_disarm = 0
+        self._target_alt = 0.0
+        self._target_aspd = 0.0
+        self._target_system = 0.0
+        self._target_component = 0.0
+        self._target_alt_visible = False
+        self._ekf_healthy = 2
+        self._gps_visible = 0
+        self._gps_lock_type = 0
+        self._gps_lock_type_str = ''
+        self._ils_visible = False
+        self._alt_error = 0
+        self._xtrack_error = 0
+        self._mission_cmd = 0
+        self._mission_seq = 0
+        self._vibration_level = 0
+        self._wp_dist = 0
+        self._lat = 0
+        self._lon = 0
+        self._wp_received = {}
+        self._wp_received_qml = {}
+        self._wp_received_flag = False
+        self._airspeed_trend = 0.0
+        self._alt_trend = 0.0
+        self._history = History(Vehicle_Status.HISTORY_FIELDS)
+        self._sample_time = None
+        self._control_pipe = None
+        self._replay_visible = False
+        self._replay_position = 0.0
+        self._replay_duration = 0.0
+        self._replay_speed = 1.0
+        self._replay_paused = False
+        self._replay_wall = None
+        self._alerts = {}
+        self._alert_text = ''
+        self._alert_level = -1
+        self._request_id = 0
+        self._requests = {}
+        self._command_text = ''
+        self._command_result = Command_Result.ACCEPTED
+        self._terrain_visible = False
+        self._agl = 0.0
+        self._ground_alt = 0.0
+        self._terrain_profile = []
+        self._slot_timer = None
+        self._params = {}
+        self._traffic = TrafficModel(self)
+        self._traffic_text = ''
+        self._traffic_level = 0
+
+    @property
+    def history(self):
+        return self._history
+
+    def set_sample_time(self, t):
+        '''time of the record being applied, log time during a replay;
+        None stamps history samples with the wall clock'''
+        self._sample_time = t
+
+    def set_control_pipe(self, pipe):
+        '''pipe used to send controls to the link process'''
+        self._control_pipe = pipe
+
+    def set_slot_timer(self, timer):
+        '''timer(name, seconds) is told how long the heavy QML slots took'''
+        self._slot_timer = timer
+
+    def send_control(self, obj):
+        if self._control_pipe is not None:
+            self._control_pipe.send(obj)
+
+    @QtCore.pyqtProperty(float, notify=pitch_changed)
+    def pitch(self):
+        return self._pitch
+    
+    @pitch.setter
+    def pitch(self, value):
+        self._pitch = value * 180 / math.pi
+        self._history.append('pitch', self._pitch, self._sample_time)
+        self.pitch_changed.emit(self._pitch)
+
+    @QtCore.pyqtProperty(float, notify=pitch_changed)
+    def roll(self):
+        return self._roll
+    
+    @roll.setter
+    def roll(self, value):
+        self._roll = value * 180 / math.pi
+        self._history.append('roll', self._roll, self._sample_time)
+        self.roll_changed.emit(self._roll)
+
+    @QtCore.pyqtProperty(int, notify=yaw_changed)
+    def yaw(self):
+        return self._yaw
+    
+    @yaw.setter
+    def yaw(self, value):
+        self._yaw = value
+        self._history.append('yaw', self._yaw, self._sample_time)
+        self.yaw_changed.emit(self._yaw)
+
+    @QtCore.pyqtProperty(float, notify=alt_changed)
+    def alt(self):
+        return self._alt
+    
+    @alt.setter
+    def alt(self, value):
+        if value == -0:
+            value = 0
+        self._alt = value
+        self._history.append('alt', self._alt, self._sample_time)
+        self.alt_changed.emit(self._alt)
+        self.alt_trend = self._history.trend('alt', Vehicle_Status.TREND_SECONDS, Vehicle_Status.TREND_WINDOW)
+
+    @QtCore.pyqtProperty(float, notify=climbrate_changed)
+    def climbrate(self):
+        return self._climbrate
+
+    @climbrate.setter
+    def climbrate(self, value):
+        if value > 6.8:
+            self._climbrate = 6.8
+        elif value < -6.8:
+            self._climbrate = -6.8
+        else:
+            self._climbrate = value
+        self._history.append('climbrate', value, self._sample_time)
+        self.climbrate_changed.emit(self._climbrate)
+
+    @QtCore.pyqtProperty(float, notify=airspeed_changed)
+    def airspeed(self):
+        return self._airspeed
+    
+    @airspeed.setter
+    def airspeed(self, value):
+        self._airspeed = value
+        self._history.append('airspeed', self._airspeed, self._sample_time)
+        self.airspeed_changed.emit(self._airspeed)
+        self.airspeed_trend = self._history.trend('airspeed', Vehicle_Status.TREND_SECONDS, Vehicle_Status.TREND_WINDOW)
+
+    @QtCore.pyqtProperty(float, notify=airspeed_trend_changed)
+    def airspeed_trend(self):
+        return self._airspeed_trend
+
+    @airspeed_trend.setter
+    def airspeed_trend(self, value):
+        if self._airspeed_trend == value:
+            return
+        self._airspeed_trend = value
+        self.airspeed_trend_changed.emit(self._airspeed_trend)
+
+    @QtCore.pyqtProperty(float, notify=alt_trend_changed)
+    def alt_trend(self):
+        return self._alt_trend
+
+    @alt_trend.setter
+    def alt_trend(self, value):
+        if self._alt_trend == value:
+            return
+        self._alt_trend = value
+        self.alt_trend_changed.emit(self._alt_trend)
+
+    @QtCore.pyqtProperty(float, notify=nav_pitch_changed)
+    def nav_pitch(self):
+        return self._nav_pitch
+
+    @nav_pitch.setter
+    def nav_pitch(self, value):
+        self._nav_pitch = value
+        self.nav_pitch_changed.emit(self._nav_pitch)
+
+    @QtCore.pyqtProperty(float, notify=nav_roll_changed)
+    def nav_roll(self):
+        return self._nav_roll
+
+    @nav_roll.setter
+    def nav_roll(self, value):
+        self._nav_roll = value
+        self.nav_roll_changed.emit(self._nav_roll)
+
+    @QtCore.pyqtProperty(int, notify=nav_yaw_changed)
+    def nav_yaw(self):
+        return self._nav_yaw
+
+    @nav_yaw.setter
+    def nav_yaw(self, value):
+        self._nav_yaw = value
+        self.nav_yaw_changed.emit(self._nav_yaw)
+
+    @QtCore.pyqtProperty(str, notify=flightmode_changed)
+    def flightmode(self):
+        return self._flightmode
+
+    @flightmode.setter
+    def flightmode(self, value):
+        if self._flightmode == value:
+            return
+        self._flightmode = value
+        self.flightmode_changed.emit(self._flightmode)
+
+    @QtCore.pyqtProperty(int, notify=arm_disarm_changed)
+    def arm_disarm(self):
+        return self._arm_disarm
+
+    @arm_disarm.setter
+    def arm_disarm(self, value):
+        if self._arm_disarm == value:
+            return
+        if value > 0:
+            value = 1
+        self._arm_disarm = value
+        self.arm_disarm_changed.emit(self._arm_disarm)
+    
+    @QtCore.pyqtProperty(float, notify=target_alt_changed)
+    def target_alt(self):
+        return self._target_alt
+
+    @target_alt.setter
+    def target_alt(self, value):
+        if self._flightmode == 'AUTO':
+            self._target_alt = value
+        else:
+            self._target_alt = self._alt + value
+        self.target_alt_changed.emit(self._target_alt)
+
+    @QtCore.pyqtProperty(float, notify=target_aspd_changed)
+    def target_aspd(self):
+        return self._target_aspd
+
+    @target_aspd.setter
+    def target_aspd(self, value):
+        self._target_aspd = self._airspeed + (value / 100)
+        self.target_aspd_changed.emit(self._target_aspd)
+
+    @QtCore.pyqtProperty(int)
+    def target_system(self):
+        return self._target_system
+
+    @target_system.setter
+    def target_system(self, value):
+        if self._target_system == value:
+            return
+        self._target_system = value
+
+    @QtCore.pyqtProperty(int)
+    def target_component(self):
+        return self._target_component
+
+    @target_component.setter
+    def target_component(self, value):
+        if self._target_component == value:
+            return
+        self._target_component = value
+    
+    @QtCore.pyqtProperty(float, notify=target_alt_visible_changed)
+    def target_alt_visible(self):
+        return self._target_alt_visible
+
+    @target_alt_visible.setter
+    def target_alt_visible(self, value):
+        if self._target_alt_visible == value:
+            return
+        self._target_alt_visible = value
+        self.target_alt_visible_changed.emit(self._target_alt_visible)
+
+    @QtCore.pyqtProperty(int, notify=ekf_healthy_changed)
+    def ekf_healthy(self):
+        return self._ekf_healthy
+
+    @ekf_healthy.setter
+    def ekf_healthy(self, value):
+        if self._ekf_healthy == value:
+            return
+        self._ekf_healthy = value
+        self.ekf_healthy_changed.emit(self._ekf_healthy)
+
+    @QtCore.pyqtProperty(int, notify=gps_visible_changed)
+    def gps_visible(self):
+        return self._gps_visible
+
+    @gps_visible.setter
+    def gps_visible(self, value):
+        if self._gps_visible == value:
+            return
+        self._gps_visible = value
+        self.gps_visible_changed.emit(self._gps_visible)
+
+    @QtCore.pyqtProperty(int, notify=gps_lock_type_changed)
+    def gps_lock_type(self):
+        return self._gps_lock_type
+
+    @gps_lock_type.setter
+    def gps_lock_type(self, value):
+        if self._gps_lock_type == value:
+            return
+        self._gps_lock_type = value
+        self.gps_lock_type_changed.emit(self._gps_lock_type)
+
+    @QtCore.pyqtProperty(bool, notify=ils_visible_changed)
+    def ils_visible(self):
+        return self._ils_visible
+
+    @ils_visible.setter
+    def ils_visible(self, value): 
+        self._ils_visible = value       
+        self.ils_visible_changed.emit(self._ils_visible)
+
+    @QtCore.pyqtProperty(int, notify=xtrack_error_changed)
+    def xtrack_error(self):
+        return self._xtrack_error
+
+    @xtrack_error.setter
+    def xtrack_error(self, value):
+        if self._ils_visible == True: 
+            self._xtrack_error = value       
+            self.xtrack_error_changed.emit(self._xtrack_error)
+
+    @QtCore.pyqtProperty(int, notify=alt_error_changed)
+    def alt_error(self):
+        return self._alt_error
+
+    @alt_error.setter
+    def alt_error(self, value):
+        if self._ils_visible == True: 
+            self._alt_error = value       
+            self.alt_error_changed.emit(self._alt_error)
+
+    @QtCore.pyqtProperty(int, notify=mission_cmd_changed)
+    def mission_cmd(self):
+        return self._mission_cmd
+
+    @mission_cmd.setter
+    def mission_cmd(self, value):
+        self._mission_cmd = value       
+        self.mission_cmd_changed.emit(self._mission_cmd)
+
+    @QtCore.pyqtProperty(int, notify=mission_seq_changed)
+    def mission_seq(self):
+        return self._mission_seq
+
+    @mission_seq.setter
+    def mission_seq(self, value):
+        self._mission_seq = value       
+        self.mission_seq_changed.emit(self._mission_seq)
+
+    @QtCore.pyqtProperty(int, notify=vibration_level_changed)
+    def vibration_level(self):
+        return self._vibration_level
+
+    @vibration_level.setter
+    def vibration_level(self, value):
+        if self._vibration_level == value:
+            return
+        self._vibration_level = value       
+        self.vibration_level_changed.emit(self._vibration_level)
+
+    @QtCore.pyqtProperty(int, notify=wp_dist_changed)
+    def wp_dist(self):
+        return self._wp_dist
+
+    @wp_dist.setter
+    def wp_dist(self, value):
+        if self._wp_dist == value:
+            return
+        self._wp_dist = value       
+        self.wp_dist_changed.emit(self._wp_dist)
+
+    @QtCore.pyqtProperty(int, notify=lat_changed)
+    def lat(self):
+        return self._lat
+
+    @lat.setter
+    def lat(self, value):
+        if self._lat == value:
+            return
+        self._lat = value       
+        self.lat_changed.emit(self._lat)
+
+    @QtCore.pyqtProperty(int, notify=lon_changed)
+    def lon(self):
+        return self._lon
+
+    @lon.setter
+    def lon(self, value):
+        if self._lon == value:
+            return
+        self._lon = value 
+        self.lon_changed.emit(self._lon)   
+
+    @QtCore.pyqtProperty(bool, notify=waypoint_received_changed)
+    def wp_received_flag(self):
+        return self._wp_received_flag
+
+    @wp_received_flag.setter
+    def wp_received_flag(self, value):
+        if self._wp_received_flag == value:
+            return
+        self._wp_received_flag = value
+        self.waypoint_received_changed.emit(self._wp_received_flag)
+
+    @QtCore.pyqtSlot(result=QtCore.QVariant)
+    def wp_received(self):
+        if self._slot_timer is None:
+            return self.wp_points()
+        start = time.perf_counter()
+        ret = self.wp_points()
+        self._slot_timer('wp_received', time.perf_counter() - start)
+        return ret
+
+    def wp_points(self):
+        '''waypoints as "x:y" EHSI pixels around the vehicle, north up'''
+        WP_RADIUS_SCALE = 1
+        wp_element_dict = {}
+        QML_X = 0
+        QML_Y = 0
+        geodesic = pyproj.Geod(ellps='WGS84')
+        for key in self._wp_received:
+            if key == 0:
+                continue
+            fwd_azimuth,back_azimuth,distance = geodesic.inv(self._lon, self._lat, self._wp_received[key].lon, self._wp_received[key].lat)
+            wp_element = (fwd_azimuth, distance)
+            wp_element_dict[key-1] = wp_element
+        for key in range(len(wp_element_dict)): # calculate the x,y point
+            (fwd_azimuth, distance) = wp_element_dict[key]
+            if fwd_azimuth < 0: #LEFT
+                fwd_azimuth = -fwd_azimuth
+                if fwd_azimuth < 90:
+                    QML_X = -(math.sin(math.radians(fwd_azimuth)) * distance / WP_RADIUS_SCALE)
+                    QML_Y = -(math.cos(math.radians(fwd_azimuth)) * distance / WP_RADIUS_SCALE)
+                elif fwd_azimuth > 90 and fwd_azimuth < 180:
+                    fwd_azimuth = 180 - fwd_azimuth
+                    QML_X = -(math.sin(math.radians(fwd_azimuth)) * distance / WP_RADIUS_SCALE)
+                    QML_Y = (math.cos(math.radians(fwd_azimuth)) * distance / WP_RADIUS_SCALE)
+                elif fwd_azimuth == 90:
+                    QML_X = - (distance / WP_RADIUS_SCALE)
+                    QML_Y = 0
+                elif fwd_azimuth == 180:
+                    QML_X = 0
+                    QML_Y = (distance / WP_RADIUS_SCALE)
+            elif fwd_azimuth == 0:
+                QML_X = 0
+                QML_Y = - (distance / WP_RADIUS_SCALE)
+            elif fwd_azimuth > 0: #RIGHT
+                if fwd_azimuth < 90:
+                    QML_X = (math.sin(math.radians(fwd_azimuth)) * distance / WP_RADIUS_SCALE)
+                    QML_Y = -(math.cos(math.radians(fwd_azimuth)) * distance / WP_RADIUS_SCALE)
+                elif fwd_azimuth > 90 and fwd_azimuth < 180:
+                    fwd_azimuth = 180 - fwd_azimuth
+                    QML_X = (math.sin(math.radians(fwd_azimuth)) * distance / WP_RADIUS_SCALE)
+                    QML_Y = (math.cos(math.radians(fwd_azimuth)) * distance / WP_RADIUS_SCALE)
+                elif fwd_azimuth == 90:
+                    QML_X = (distance / WP_RADIUS_SCALE)
+                    QML_Y = 0
+                elif fwd_azimuth == 180:
+                    QML_X = 0
+                    QML_Y = (distance / WP_RADIUS_SCALE)
+            QML_VALUE = str(QML_X) + ":" + str(QML_Y)
+            self._wp_received_qml[str(key)] = QML_VALUE
+        return self._wp_received_qml
+
+    def set_alert(self, alert):
+        '''apply an alert transition from the link process'''
+        if alert.active:
+            self._alerts[alert.name] = alert
+        elif alert.name in self._alerts:
+            del self._alerts[alert.name]
+        else:
+            return
+        active = sorted(self._alerts.values(), key=lambda a: -a.level)
+        self._alert_text = '\n'.join(a.text for a in active)
+        self._alert_level = active[0].level if len(active) > 0 else -1
+        self.alerts_changed.emit()
+
+    @QtCore.pyqtProperty(str, notify=alerts_changed)
+    def alert_text(self):
+        return self._alert_text
+
+    @QtCore.pyqtProperty(int, notify=alerts_changed)
+    def alert_level(self):
+        return self._alert_level
+
+    def request(self, action, value, name):
+        '''send a command request, the result arrives later as command_finished'''
+        self._request_id += 1
+        self._requests[self._request_id] = name
+        self._command_result = -1
+        self.command_text = name + ' ...'
+        self.send_control(Command_Request(self._request_id, action, value))
+        return self._request_id
+
+    def set_command_result(self, result):
+        name = self._requests.pop(result.request_id, '')
+        text = Vehicle_Status.COMMAND_RESULTS.get(result.result, 'RESULT %d' % result.result)
+        self._command_result = result.result
+        self.command_text = (name + ' ' + text).strip()
+        self.command_finished.emit(result.request_id, result.command, result.result)
+
+    @QtCore.pyqtProperty(str, notify=command_text_changed)
+    def command_text(self):
+        return self._command_text
+
+    @command_text.setter
+    def command_text(self, value):
+        if self._command_text == value:
+            return
+        self._command_text = value
+        self.command_text_changed.emit(self._command_text)
+
+    @QtCore.pyqtProperty(int, notify=command_text_changed)
+    def command_result(self):
+        '''result of the last command, -1 while it is pending'''
+        return self._command_result
+
+    @QtCore.pyqtSlot(result=int)
+    def arm(self):
+        return self.request(Command_Request.ARM, None, 'ARM')
+
+    @QtCore.pyqtSlot(result=int)
+    def disarm(self):
+        return self.request(Command_Request.DISARM, None, 'DISARM')
+
+    @QtCore.pyqtSlot(str, result=int)
+    def set_mode(self, mode):
+        return self.request(Command_Request.SET_MODE, mode, mode)
+
+    @QtCore.pyqtSlot(int, result=int)
+    def set_mission_current(self, seq):
+        return self.request(Command_Request.SET_CURRENT, seq, 'WP %d' % seq)
+
+    def set_terrain(self, terrain):
+        self._terrain_visible = True
+        self._agl = terrain.agl
+        self._ground_alt = terrain.ground_rel
+        self.terrain_changed.emit()
+
+    @QtCore.pyqtProperty(bool, notify=terrain_changed)
+    def terrain_visible(self):
+        return self._terrain_visible
+
+    @QtCore.pyqtProperty(float, notify=terrain_changed)
+    def agl(self):
+        return self._agl
+
+    @QtCore.pyqtProperty(float, notify=terrain_changed)
+    def ground_alt(self):
+        '''ground level on the altitude tape, relative to home'''
+        return self._ground_alt
+
+    def set_terrain_profile(self, profile):
+        self._terrain_profile = [[d, h] for d, h in zip(profile.distances, profile.heights)]
+        self.terrain_profile_changed.emit()
+
+    @QtCore.pyqtProperty('QVariantList', notify=terrain_profile_changed)
+    def terrain_profile(self):
+        '''[distance, height above MSL] pairs along the mission route'''
+        return self._terrain_profile
+
+    def set_param(self, param):
+        '''watched autopilot parameter from the link process'''
+        if self._params.get(param.name) == param.value:
+            return
+        self._params[param.name] = param.value
+        self.params_changed.emit()
+
+    @QtCore.pyqtSlot(str, result=float)
+    def param(self, name):
+        '''value of a watched parameter, nan until it is known'''
+        return self._params.get(name, float('nan'))
+
+    @QtCore.pyqtProperty(float, notify=params_changed)
+    def airspeed_min(self):
+        '''ARSPD_FBW_MIN, 0 while unknown'''
+        return self._params.get('ARSPD_FBW_MIN', 0.0)
+
+    @QtCore.pyqtProperty(float, notify=params_changed)
+    def airspeed_max(self):
+        '''ARSPD_FBW_MAX, 0 while unknown'''
+        return self._params.get('ARSPD_FBW_MAX', 0.0)
+
+    def set_traffic(self, traffic):
+        '''latest ADS-B picture from the link process'''
+        self._traffic.set_contacts(traffic.contacts)
+        text = ''
+        level = 0
+        if len(traffic.nearest) > 0:
+            (icao, callsign, x, y, rel_alt, heading, level) = traffic.nearest[0]
+            text = 'TFC %s %.1f KM' % (callsign.strip() or '%06X' % icao, math.hypot(x, y) / 1000)
+            if not math.isnan(rel_alt):
+                text += ' %+.0f M' % rel_alt
+        if text == self._traffic_text and level == self._traffic_level:
+            return
+        self._traffic_text = text
+        self._traffic_level = level
+        self.traffic_changed.emit()
+
+    @QtCore.pyqtProperty(QtCore.QObject, constant=True)
+    def traffic(self):
+        '''contacts inside the EHSI range as a list model'''
+        return self._traffic
+
+    @QtCore.pyqtProperty(str, notify=traffic_changed)
+    def traffic_text(self):
+        '''closest threat, empty without one'''
+        return self._traffic_text
+
+    @QtCore.pyqtProperty(int, notify=traffic_changed)
+    def traffic_level(self):
+        return self._traffic_level
+
+    def set_replay(self, status):
+        now = time.time()
+        if self._replay_wall is not None:
+            expected = self._replay_position
+            if not self._replay_paused:
+                expected += (now - self._replay_wall) * self._replay_speed
+            if status.speed != self._replay_speed or abs(status.position - expected) > Vehicle_Status.REPLAY_JUMP:
+                # trends across a seek or a speed change mean nothing
+                self._history.clear()
+        self._replay_wall = now
+        self._replay_visible = True
+        self._replay_position = status.position
+        self._replay_duration = status.duration
+        self._replay_speed = status.speed
+        self._replay_paused = status.paused
+        self.replay_changed.emit()
+
+    @QtCore.pyqtProperty(bool, notify=replay_changed)
+    def replay_visible(self):
+        return self._replay_visible
+
+    @QtCore.pyqtProperty(float, notify=replay_changed)
+    def replay_position(self):
+        return self._replay_position
+
+    @QtCore.pyqtProperty(float, notify=replay_changed)
+    def replay_duration(self):
+        return self._replay_duration
+
+    @QtCore.pyqtProperty(float, notify=replay_changed)
+    def replay_speed(self):
+        return self._replay_speed
+
+    @QtCore.pyqtProperty(bool, notify=replay_changed)
+    def replay_paused(self):
+        return self._replay_paused
+
+    @QtCore.pyqtSlot()
+    def replay_toggle_pause(self):
+        if self._replay_paused:
+            self.send_control(Replay_Control(Replay_Control.RESUME))
+        else:
+            self.send_control(Replay_Control(Replay_Control.PAUSE))
+
+    @QtCore.pyqtSlot(float)
+    def replay_skip(self, seconds):
+        self.send_control(Replay_Control(Replay_Control.SKIP, seconds))
+
+    @QtCore.pyqtSlot(float)
+    def replay_seek(self, seconds):
+        self.send_control(Replay_Control(Replay_Control.SEEK, seconds))
+
+    @QtCore.pyqtSlot(int)
+    def replay_step_speed(self, step):
+        '''move step entries up or down Replay_Control.SPEEDS'''
+        speeds = Replay_Control.SPEEDS
+        current = min(range(len(speeds)), key=lambda i: abs(speeds[i] - self._replay_speed))
+        target = min(max(current + step, 0), len(speeds) - 1)
+        self.send_control(Replay_Control(Replay_Control.SPEED, speeds[target]))